@@ -0,0 +1,702 @@
+"""Indexed SQLite article store."""
+
+import importlib.util
+import sqlite3
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import orjson
+
+from article_store import Article, ArticleStore, FsyncPolicy
+from metrics import get_metrics
+
+if TYPE_CHECKING:
+    from record_compression import RecordCodec
+
+DATE_FORMATS: tuple[str, ...] = (
+    "%d %b %Y",
+    "%d %B %Y",
+    "%b %d, %Y",
+    "%B %d, %Y",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+)
+_COLUMNS: tuple[str, ...] = (
+    "url",
+    "title",
+    "published_date",
+    "authors",
+    "language",
+    "article_content",
+)
+_DISTINCT: dict[str, str] = {
+    "language": "SELECT DISTINCT language FROM articles "
+    "WHERE language IS NOT NULL ORDER BY language",
+    "authors": "SELECT DISTINCT authors FROM articles "
+    "WHERE authors IS NOT NULL ORDER BY authors",
+    "tags": "SELECT DISTINCT tag FROM article_tags ORDER BY tag",
+}
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    published_date TEXT,
+    published_on TEXT,
+    authors TEXT,
+    language TEXT,
+    article_content TEXT,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_language ON articles (language);
+CREATE INDEX IF NOT EXISTS articles_authors ON articles (authors);
+CREATE INDEX IF NOT EXISTS articles_published_on ON articles (published_on);
+CREATE TABLE IF NOT EXISTS article_tags (
+    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, article_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS article_tags_article ON article_tags (article_id);
+CREATE TABLE IF NOT EXISTS migrations (source TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS dictionaries (
+    number INTEGER PRIMARY KEY,
+    dictionary_id INTEGER NOT NULL UNIQUE,
+    dictionary BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generation (number INTEGER NOT NULL);
+INSERT INTO generation (number)
+    SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM generation);
+CREATE TRIGGER IF NOT EXISTS articles_generation AFTER INSERT ON articles BEGIN
+    UPDATE generation SET number = number + 1;
+END;
+CREATE TABLE IF NOT EXISTS merged_urls (
+    url TEXT PRIMARY KEY,
+    kept_url TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS merged_urls_generation AFTER INSERT ON merged_urls
+BEGIN
+    UPDATE generation SET number = number + 1;
+END;
+"""
+# Full-text index over the plain content column, or, once the articles are
+# compressed, over the ``articles_text`` view. {view}, {content}, {old} and
+# {new} are filled in by ``_fts_schema``.
+_FTS_SCHEMA: str = """
+DROP TRIGGER IF EXISTS articles_fts_insert;
+DROP TRIGGER IF EXISTS articles_fts_delete;
+DROP TRIGGER IF EXISTS articles_fts_update;
+DROP TABLE IF EXISTS articles_fts;
+DROP VIEW IF EXISTS articles_text;
+{view}
+CREATE VIRTUAL TABLE articles_fts USING fts5 (
+    title, article_content, content = '{content}', content_rowid = 'id'
+);
+CREATE TRIGGER articles_fts_insert AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, article_content)
+    VALUES (new.id, new.title, {new});
+END;
+CREATE TRIGGER articles_fts_delete AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, article_content)
+    VALUES ('delete', old.id, old.title, {old});
+END;
+CREATE TRIGGER articles_fts_update AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, article_content)
+    VALUES ('delete', old.id, old.title, {old});
+    INSERT INTO articles_fts (rowid, title, article_content)
+    VALUES (new.id, new.title, {new});
+END;
+INSERT INTO articles_fts (articles_fts) VALUES ('rebuild');
+"""
+_TEXT_VIEW: str = """
+CREATE VIEW articles_text AS
+    SELECT id, title, article_text(article_content) AS article_content
+    FROM articles;
+"""
+
+
+def _fts_schema(*, compressed: bool) -> str:
+    """Build the full-text index, plain or over compressed content.
+
+    Returns:
+        str: Script replacing the index, its triggers and view.
+
+    """
+    if not compressed:
+        return _FTS_SCHEMA.format(
+            view="",
+            content="articles",
+            old="old.article_content",
+            new="new.article_content",
+        )
+    return _FTS_SCHEMA.format(
+        view=_TEXT_VIEW,
+        content="articles_text",
+        old="article_text(old.article_content)",
+        new="article_text(new.article_content)",
+    )
+
+
+def parse_published_date(published_date: str) -> str | None:
+    """Normalize a published date as shown on a page.
+
+    A leading weekday and a trailing ``- time`` are ignored.
+
+    Returns:
+        str | None: ISO date, None if the date is not recognized.
+
+    """
+    date: str = published_date.partition(" - ")[0].strip()
+    weekday, _, rest = date.partition(", ")
+    if weekday.isalpha() and rest:
+        date = rest
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date, date_format).date().isoformat()  # noqa: DTZ007
+        except ValueError:
+            continue
+    return None
+
+
+class ArticleDatabase:
+    """SQLite article store.
+
+    Articles are rows keyed by url, with indexes on language, authors,
+    published date and tags and an FTS5 index over title and content.
+    Opening the store costs nothing however many articles it holds, and
+    membership, lookups and queries are answered from the indexes. Storing
+    an article whose url is already stored replaces it. The urls of
+    articles merged into a near-duplicate are kept in a table of their own,
+    so they still count as scraped. The store may be handed between
+    threads, but not used by two at once.
+
+    Once ``compress`` has trained a zstd dictionary on the stored articles,
+    every article's content and record are stored as zstd frames of their
+    own, compressed with that dictionary, and decompressed as they are
+    read, so reading one article only inflates that article. The full-text
+    index then reads the content through the ``articles_text`` view, which
+    decompresses it with the ``article_text`` SQL function the store
+    registers on its connection; until then it reads the plain column.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "backup.sqlite3",
+        fsync: FsyncPolicy | str = FsyncPolicy.ALWAYS,
+        fsync_interval: int = 16,
+    ) -> None:
+        """Initialize article database.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite database holding the articles.
+        fsync : FsyncPolicy | str
+            ``always`` commits every append durably, ``interval`` commits
+            every ``fsync_interval`` appends and ``never`` leaves syncing to
+            the OS.
+        fsync_interval : int
+            Appends between commits for the ``interval`` policy.
+
+        """
+        self.path: Path = Path(path)
+        self.fsync: FsyncPolicy = FsyncPolicy(fsync)
+        self.fsync_interval: int = max(1, fsync_interval)
+        self._unsynced: int = 0
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            self.path, timeout=30.0, check_same_thread=False
+        )
+        self.connection.create_function(
+            "article_text", 1, self.__text, deterministic=True
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.execute(
+            "PRAGMA synchronous="
+            + ("OFF" if self.fsync == FsyncPolicy.NEVER else "FULL")
+        )
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+        self.codec: RecordCodec | None = self.__load_codec()
+        with self.connection:
+            self.__migrate_fts()
+
+    def __migrate_fts(self) -> None:
+        """Point the full-text index at the content as it is stored.
+
+        The index and its triggers read the content column directly, so
+        other SQLite clients can write to and search the store, until
+        ``compress`` trains a dictionary. From then on they read it through
+        the ``articles_text`` view and ``article_text`` function, which
+        decompress it. An index of the other kind is rebuilt.
+        """
+        compressed: bool = (
+            self.connection.execute("SELECT 1 FROM dictionaries LIMIT 1").fetchone()
+            is not None
+        )
+        fts: tuple[str] | None = self.connection.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'articles_fts'"
+        ).fetchone()
+        content: str = "articles_text" if compressed else "articles"
+        if fts is None or f"content = '{content}'" not in fts[0]:
+            self.connection.executescript(_fts_schema(compressed=compressed))
+
+    def __load_codec(self, level: int = 9) -> "RecordCodec | None":
+        """Load the zstd dictionaries the articles are compressed with.
+
+        Returns:
+            RecordCodec | None: Codec of the latest dictionary, None if the
+            articles are not compressed.
+
+        Raises:
+            ValueError: If the articles are compressed but zstandard is not
+                installed.
+
+        """
+        dictionaries: list[tuple[int, bytes]] = self.connection.execute(
+            "SELECT dictionary_id, dictionary FROM dictionaries ORDER BY number"
+        ).fetchall()
+        if not dictionaries:
+            return None
+        if importlib.util.find_spec("zstandard") is None:
+            message: str = (
+                f"{self.path} is compressed, reading it needs zstandard, "
+                "install it with the compression extra."
+            )
+            raise ValueError(message)
+        from record_compression import RecordCodec  # noqa: PLC0415
+
+        return RecordCodec(dict(dictionaries), current=dictionaries[-1][0], level=level)
+
+    def __text(self, value: str | bytes | None) -> str | None:
+        """Read an article content column, decompressing it if need be."""
+        if not isinstance(value, bytes):
+            return value
+        return (self.codec.decompress(value) if self.codec else value).decode()
+
+    def __article(self, row: tuple[str | bytes | None, bytes]) -> Article:
+        """Rebuild an article from its content and record columns."""
+        article_content, record = row
+        article: Article = orjson.loads(
+            self.codec.decompress(record) if self.codec else record
+        )
+        article["article_content"] = self.__text(article_content) or ""
+        return article
+
+    def __select(self, where: str = "", parameters: tuple = ()) -> list[Article]:
+        """Read the articles matching a condition, in storage order.
+
+        Returns:
+            list[Article]: Matching articles.
+
+        """
+        rows: list[tuple[str, bytes]] = self.connection.execute(
+            f"SELECT article_content, record FROM articles {where} ORDER BY id",  # noqa: S608
+            parameters,
+        ).fetchall()
+        return [self.__article(row) for row in rows]
+
+    def __iter__(self) -> Iterator[Article]:
+        """Iterate over stored articles.
+
+        Yields:
+            Article: Stored article.
+
+        """
+        cursor: sqlite3.Cursor = self.connection.execute(
+            "SELECT article_content, record FROM articles ORDER BY id"
+        )
+        for row in cursor:
+            yield self.__article(row)
+
+    def __contains__(self, url: str) -> bool:
+        """Check whether an article with this url is stored."""
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM articles WHERE url = ?", (url,)
+            ).fetchone()
+            is not None
+        )
+
+    def urls(self) -> Iterator[str]:
+        """Iterate over stored urls without reading the articles.
+
+        Yields:
+            str: Stored url.
+
+        """
+        for (url,) in self.connection.execute("SELECT url FROM articles"):
+            yield url
+
+    def merged_urls(self) -> Iterator[str]:
+        """Iterate over the urls whose article was merged into another.
+
+        Yields:
+            str: Url of a merged near-duplicate.
+
+        """
+        for (url,) in self.connection.execute("SELECT url FROM merged_urls"):
+            yield url
+
+    def add_merged(self, url: str, kept_url: str) -> None:
+        """Remember an url whose article was merged into the one of ``kept_url``.
+
+        It is committed with the next article stored or removed.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO merged_urls (url, kept_url) VALUES (?, ?)",
+            (url, kept_url),
+        )
+
+    def generation(self) -> int:
+        """Count the urls ever inserted, which changes whenever a url is added.
+
+        Returns:
+            int: Store generation.
+
+        """
+        return self.connection.execute("SELECT number FROM generation").fetchone()[0]
+
+    def __len__(self) -> int:
+        """Count stored articles."""
+        return self.connection.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def distinct(self, field: str) -> list[str]:
+        """List the distinct values of an indexed field, from its index.
+
+        Returns:
+            list[str]: Sorted values of ``language``, ``authors`` or ``tags``.
+
+        Raises:
+            ValueError: If the field is not indexed.
+
+        """
+        if field not in _DISTINCT:
+            message: str = f"Cannot list {field}, expected one of {sorted(_DISTINCT)}."
+            raise ValueError(message)
+        return [value for (value,) in self.connection.execute(_DISTINCT[field])]
+
+    def load(self) -> list[Article]:
+        """Load every stored article.
+
+        Returns:
+            list[Article]: Stored articles.
+
+        """
+        return list(self)
+
+    def latest(self, key: Callable[[Article], str]) -> dict[str, Article]:
+        """Load the most recently stored article for every key.
+
+        Returns:
+            dict[str, Article]: Latest article keyed by ``key``.
+
+        """
+        return {key(article): article for article in self}
+
+    def get(self, url: str) -> Article | None:
+        """Read the article stored for an url.
+
+        Returns:
+            Article | None: Article, None if it is not stored.
+
+        """
+        articles: list[Article] = self.__select("WHERE url = ?", (url,))
+        return articles[0] if articles else None
+
+    def by_author(self, authors: str) -> list[Article]:
+        """Find the articles of an author.
+
+        Returns:
+            list[Article]: Articles whose authors field is ``authors``.
+
+        """
+        return self.__select("WHERE authors = ?", (authors,))
+
+    def by_language(self, language: str) -> list[Article]:
+        """Find the articles written in a language.
+
+        Returns:
+            list[Article]: Articles in ``language``.
+
+        """
+        return self.__select("WHERE language = ?", (language,))
+
+    def by_tag(self, tag: str) -> list[Article]:
+        """Find the articles carrying a tag.
+
+        Returns:
+            list[Article]: Articles tagged ``tag``.
+
+        """
+        return self.__select(
+            "WHERE id IN (SELECT article_id FROM article_tags WHERE tag = ?)", (tag,)
+        )
+
+    def published_between(self, start: str, end: str) -> list[Article]:
+        """Find the articles published in a date range.
+
+        Returns:
+            list[Article]: Articles published from ``start`` to ``end``
+            inclusive, both ISO dates.
+
+        """
+        return self.__select("WHERE published_on BETWEEN ? AND ?", (start, end))
+
+    def search(self, query: str, limit: int = 20) -> list[Article]:
+        """Full-text search over titles and content.
+
+        Returns:
+            list[Article]: Best matching articles first.
+
+        """
+        rows: list[tuple[str, bytes]] = self.connection.execute(
+            "SELECT articles.article_content, articles.record FROM articles_fts "
+            "JOIN articles ON articles.id = articles_fts.rowid "
+            "WHERE articles_fts MATCH ? ORDER BY rank LIMIT ?",
+            (query, limit),
+        ).fetchall()
+        return [self.__article(row) for row in rows]
+
+    def append(self, article: Article) -> None:
+        """Store an article, replacing any article with the same url."""
+        with get_metrics().stage("store"):
+            self.__insert(article)
+            self._unsynced += 1
+            if (
+                self.fsync != FsyncPolicy.INTERVAL
+                or self._unsynced >= self.fsync_interval
+            ):
+                self.sync()
+
+    def replace(self, url: str, article: Article) -> None:
+        """Store an article in place of the article stored for another url."""
+        with get_metrics().stage("store"):
+            self.connection.execute("DELETE FROM articles WHERE url = ?", (url,))
+            self.__insert(article)
+            self.sync()
+
+    def __insert(self, article: Article) -> None:
+        """Write an article and its tags without committing."""
+        record: Article = {
+            name: value for name, value in article.items() if name != "article_content"
+        }
+        values: list[str | bytes | None] = [
+            value if isinstance(value := article.get(column), str) else None
+            for column in _COLUMNS
+        ]
+        published_on: str | None = parse_published_date(str(values[2] or ""))
+        serialized: bytes = orjson.dumps(record)
+        if self.codec is not None:
+            serialized = self.codec.compress(serialized)
+            if values[5]:
+                values[5] = self.codec.compress(str(values[5]).encode())
+        article_id: int = self.connection.execute(
+            """
+            INSERT INTO articles (
+                url, title, published_date, authors, language, article_content,
+                published_on, record
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                title = excluded.title,
+                published_date = excluded.published_date,
+                authors = excluded.authors,
+                language = excluded.language,
+                article_content = excluded.article_content,
+                published_on = excluded.published_on,
+                record = excluded.record
+            RETURNING id
+            """,
+            (*values, published_on, serialized),
+        ).fetchone()[0]
+        tags: str | list[str] = article.get("tags") or []
+        self.connection.execute(
+            "DELETE FROM article_tags WHERE article_id = ?", (article_id,)
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO article_tags (article_id, tag) VALUES (?, ?)",
+            ((article_id, tag) for tag in ([tags] if isinstance(tags, str) else tags)),
+        )
+
+    def remove(self, url: str) -> bool:
+        """Remove the article stored for an url.
+
+        Returns:
+            bool: True if an article was removed.
+
+        """
+        removed: bool = (
+            self.connection.execute(
+                "DELETE FROM articles WHERE url = ?", (url,)
+            ).rowcount
+            > 0
+        )
+        self.sync()
+        return removed
+
+    @contextmanager
+    def snapshot(self) -> Iterator[None]:
+        """Read the store as of one moment, whatever others write meanwhile.
+
+        Yields:
+            None: Reads made inside the block see the same snapshot.
+
+        """
+        if self.connection.in_transaction:
+            yield
+            return
+        self.connection.execute("BEGIN")
+        try:
+            yield
+        finally:
+            self.connection.rollback()
+
+    def sync(self) -> None:
+        """Commit the articles stored so far."""
+        self.connection.commit()
+        self._unsynced = 0
+
+    def close(self) -> None:
+        """Commit outstanding articles; the store reopens on the next append."""
+        self.sync()
+
+    def compress(
+        self,
+        *,
+        dictionary_size: int = 1 << 17,
+        samples: int = 2000,
+        level: int = 9,
+        batch_size: int = 512,
+    ) -> int:
+        """Train a zstd dictionary on the stored articles and compress them all.
+
+        The dictionary is trained on the content and record of up to
+        ``samples`` random articles, every article is rewritten compressed
+        with it, and the database is vacuumed to give the space back. Run
+        again once the corpus has grown to retrain; articles compressed
+        with an earlier dictionary stay readable.
+
+        Returns:
+            int: Number of articles compressed.
+
+        Raises:
+            ValueError: If zstandard is not installed, or there are too few
+                articles to train on.
+
+        """
+        if importlib.util.find_spec("zstandard") is None:
+            message: str = (
+                "Compressing needs zstandard, install it with the compression extra."
+            )
+            raise ValueError(message)
+        from record_compression import dictionary_id, train_dictionary  # noqa: PLC0415
+
+        self.sync()
+        sampled: list[Article] = [
+            self.__article(row)
+            for row in self.connection.execute(
+                "SELECT article_content, record FROM articles "
+                "ORDER BY random() LIMIT ?",
+                (samples,),
+            )
+        ]
+        dictionary: bytes = train_dictionary(
+            (
+                part
+                for article in sampled
+                for part in (
+                    str(article.pop("article_content")).encode(),
+                    orjson.dumps(article),
+                )
+                if part
+            ),
+            dictionary_size,
+        )
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO dictionaries (dictionary_id, dictionary) "
+                "VALUES (?, ?)",
+                (dictionary_id(dictionary), dictionary),
+            )
+        self.codec = self.__load_codec(level)
+        with self.connection:
+            self.__migrate_fts()
+        compressed: int = 0
+        last_id: int = 0
+        while rows := self.connection.execute(
+            "SELECT id, article_content, record FROM articles "
+            "WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall():
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE articles SET article_content = ?, record = ? WHERE id = ?",
+                    (
+                        (*self.__compressed(article_content, record), article_id)
+                        for article_id, article_content, record in rows
+                    ),
+                )
+            compressed += len(rows)
+            last_id = rows[-1][0]
+        self.connection.execute("VACUUM")
+        return compressed
+
+    def __compressed(
+        self, article_content: str | bytes | None, record: bytes
+    ) -> tuple[str | bytes | None, bytes]:
+        """Compress a stored article's columns with the latest dictionary.
+
+        Returns:
+            tuple[str | bytes | None, bytes]: Content and record columns.
+
+        """
+        if self.codec is None:
+            return article_content, record
+        content: str | None = self.__text(article_content)
+        return (
+            self.codec.compress(content.encode()) if content else None,
+            self.codec.compress(self.codec.decompress(record)),
+        )
+
+    def migrate_from(self, legacy_path: str | Path) -> int:
+        """Import articles from a JSON list or JSON Lines store, once.
+
+        Every source is only imported the first time it is seen, so an
+        interrupted migration is rolled back and retried on the next start.
+
+        Returns:
+            int: Number of articles migrated, 0 if the source was already
+            imported or does not exist.
+
+        Raises:
+            ValueError: If a JSON list source cannot be decoded.
+
+        """
+        legacy: Path = Path(legacy_path)
+        if not legacy.is_file() or (
+            self.connection.execute(
+                "SELECT 1 FROM migrations WHERE source = ?", (str(legacy.resolve()),)
+            ).fetchone()
+        ):
+            return 0
+        articles: list[Article]
+        if legacy.suffix == ".jsonl":
+            articles = ArticleStore(legacy).load()
+        else:
+            try:
+                articles = orjson.loads(legacy.read_bytes() or b"[]")
+            except orjson.JSONDecodeError as e:
+                message: str = f"Cannot migrate {legacy}: {e}"
+                raise ValueError(message) from e
+        self.sync()
+        with self.connection:
+            for article in articles:
+                self.__insert(article)
+            self.connection.execute(
+                "INSERT INTO migrations (source) VALUES (?)", (str(legacy.resolve()),)
+            )
+        return len(articles)
@@ -0,0 +1,183 @@
+"""Append-only article store."""
+
+import os
+from collections.abc import Callable, Iterator
+from enum import StrEnum
+from pathlib import Path
+
+import orjson
+
+type Article = dict[str, str | list[str]]
+
+
+class FsyncPolicy(StrEnum):
+    """When appended articles are forced to stable storage."""
+
+    ALWAYS = "always"
+    INTERVAL = "interval"
+    NEVER = "never"
+
+
+class ArticleStore:
+    """JSON Lines article store.
+
+    Every article is one line, appended with ``O_APPEND`` writes (a single
+    one unless the OS writes only part of it), so storing an article costs
+    the size of that article rather than the size of the whole database. A
+    crash can at worst leave a torn final line, which is dropped and
+    truncated away the next time the store is read.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "backup.jsonl",
+        fsync: FsyncPolicy | str = FsyncPolicy.ALWAYS,
+        fsync_interval: int = 16,
+    ) -> None:
+        """Initialize article store.
+
+        Parameters
+        ----------
+        path : str | Path
+            JSON Lines file holding the articles.
+        fsync : FsyncPolicy | str
+            ``always`` fsyncs after every append, ``interval`` after every
+            ``fsync_interval`` appends and ``never`` leaves it to the OS.
+        fsync_interval : int
+            Appends between fsyncs for the ``interval`` policy.
+
+        """
+        self.path: Path = Path(path)
+        self.fsync: FsyncPolicy = FsyncPolicy(fsync)
+        self.fsync_interval: int = max(1, fsync_interval)
+        self._unsynced: int = 0
+        self._fd: int | None = None
+        self._urls: set[str] | None = None
+
+    def __iter__(self) -> Iterator[Article]:
+        """Iterate over stored articles.
+
+        Yields:
+            Article: Stored article.
+
+        """
+        if not self.path.exists():
+            return
+        good_bytes: int = 0
+        with self.path.open("rb") as store_file:
+            for line in store_file:
+                if not line.endswith(b"\n"):
+                    self._truncate(good_bytes)
+                    return
+                good_bytes += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    print(f"Skipped corrupt record at byte {good_bytes - len(line)}.")
+
+    def __contains__(self, url: str) -> bool:
+        """Check whether an article with this url is stored."""
+        if self._urls is None:
+            self._urls = {
+                stored
+                for article in self
+                if isinstance(stored := article.get("url"), str)
+            }
+        return url in self._urls
+
+    def load(self) -> list[Article]:
+        """Load every stored article.
+
+        Returns:
+            list[Article]: Stored articles.
+
+        """
+        return list(self)
+
+    def latest(self, key: Callable[[Article], str]) -> dict[str, Article]:
+        """Load the most recent version of every article.
+
+        Refreshed articles are appended rather than rewritten, so a later
+        record supersedes every earlier one with the same key.
+
+        Returns:
+            dict[str, Article]: Latest article keyed by ``key``.
+
+        """
+        return {key(article): article for article in self}
+
+    def _truncate(self, size: int) -> None:
+        """Drop a torn final record left by an interrupted append."""
+        print(f"Dropped incomplete record at the end of {self.path}.")
+        with self.path.open("rb+") as store_file:
+            store_file.truncate(size)
+
+    def append(self, article: Article) -> None:
+        """Append an article to the store."""
+        if self._fd is None:
+            self._fd = os.open(
+                self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+        line: memoryview = memoryview(orjson.dumps(article) + b"\n")
+        while line:
+            line = line[os.write(self._fd, line) :]
+        url: str | list[str] | None = article.get("url")
+        if self._urls is not None and isinstance(url, str):
+            self._urls.add(url)
+        self._unsynced += 1
+        if self.fsync is FsyncPolicy.ALWAYS or (
+            self.fsync is FsyncPolicy.INTERVAL
+            and self._unsynced >= self.fsync_interval
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush appended articles to stable storage."""
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = 0
+
+    def close(self) -> None:
+        """Sync and close the store."""
+        if self._fd is not None:
+            if self.fsync is not FsyncPolicy.NEVER:
+                self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def migrate_from(self, legacy_path: str | Path) -> int:
+        """Convert a legacy ``backup.json`` array into this store.
+
+        Migration runs once: it is skipped if the store already exists or
+        the legacy file is missing. The store is written to a temporary file
+        and moved into place, so an interrupted migration leaves no store
+        behind and is simply retried on the next start.
+
+        Returns:
+            int: Number of articles migrated.
+
+        Raises:
+            ValueError: If the legacy file exists but cannot be decoded.
+
+        """
+        legacy: Path = Path(legacy_path)
+        if self.path.exists() or not legacy.is_file():
+            return 0
+        raw: bytes = legacy.read_bytes()
+        if not raw.strip():
+            return 0
+        try:
+            articles: list[Article] = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            message: str = f"Could not migrate {legacy}: {e}"
+            raise ValueError(message) from e
+        partial: Path = self.path.with_name(f"{self.path.name}.partial")
+        with partial.open("wb") as store_file:
+            for article in articles:
+                store_file.write(orjson.dumps(article) + b"\n")
+            store_file.flush()
+            os.fsync(store_file.fileno())
+        partial.replace(self.path)
+        return len(articles)
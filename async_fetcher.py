@@ -0,0 +1,114 @@
+"""Concurrent article fetcher."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass, field
+
+import httpx
+
+from transport import Transport, get_transport
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a single fetch."""
+
+    url: str
+    status: int = 0
+    text: str = ""
+    content: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+    error: Exception | None = None
+
+
+class AsyncFetcher:
+    """Fetch many urls concurrently under the transport's rate limit."""
+
+    def __init__(
+        self,
+        transport: Transport | None = None,
+        concurrency: int = 4,
+    ) -> None:
+        """Initialize async fetcher.
+
+        Parameters
+        ----------
+        transport : Transport | None
+            Transport providing the http client, the shared one by default.
+        concurrency : int
+            Maximum number of requests in flight.
+
+        """
+        self.transport: Transport = transport or get_transport()
+        self.concurrency: int = max(1, concurrency)
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> FetchResult:
+        """Fetch one url.
+
+        Returns:
+            FetchResult: Response body, or the error that prevented it.
+
+        """
+        with self.transport.metrics.stage("rate_limit_wait"):
+            await self.transport.rate_limiter.acquire_async()
+        started: float = time.perf_counter()
+        try:
+            response: httpx.Response = await client.get(url)
+        except httpx.HTTPError as e:
+            self.transport.record(None, time.perf_counter() - started)
+            return FetchResult(url=url, error=e)
+        self.transport.record(
+            response.status_code,
+            time.perf_counter() - started,
+            response.headers.get("Retry-After"),
+            len(response.content),
+        )
+        return FetchResult(
+            url=url,
+            status=response.status_code,
+            text=response.text,
+            content=response.content,
+            headers=dict(response.headers),
+        )
+
+    async def _worker(
+        self,
+        client: httpx.AsyncClient,
+        pending: asyncio.Queue[str],
+        results: asyncio.Queue[FetchResult],
+    ) -> None:
+        """Fetch urls from the pending queue until it is drained."""
+        while True:
+            try:
+                url: str = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await results.put(await self.fetch(client, url))
+
+    async def fetch_all(self, urls: Iterable[str]) -> AsyncIterator[FetchResult]:
+        """Fetch all urls, yielding results in completion order.
+
+        Yields:
+            FetchResult: Result of each fetch.
+
+        """
+        pending: asyncio.Queue[str] = asyncio.Queue()
+        for url in urls:
+            pending.put_nowait(url)
+        total: int = pending.qsize()
+        results: asyncio.Queue[FetchResult] = asyncio.Queue(
+            maxsize=self.concurrency * 2
+        )
+        async with self.transport.async_client(self.concurrency) as client:
+            workers: list[asyncio.Task[None]] = [
+                asyncio.create_task(self._worker(client, pending, results))
+                for _ in range(min(self.concurrency, total))
+            ]
+            try:
+                for _ in range(total):
+                    yield await results.get()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,58 @@
+"""Shared fixtures and regression thresholds of the benchmarks.
+
+A benchmark marked ``threshold(seconds)`` fails when its mean exceeds
+the threshold, which catches gross slowdowns on any machine. Finer
+regressions are caught against a saved run::
+
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+import pytest
+from fake_archive import FakeArchive
+
+from rate_limiter import TokenBucket
+from transport import Transport
+
+if TYPE_CHECKING:
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Register the threshold marker."""
+    config.addinivalue_line(
+        "markers", "threshold(seconds): fail if the mean run takes longer"
+    )
+
+
+@pytest.fixture(autouse=True)
+def _check_threshold(request: pytest.FixtureRequest) -> Iterator[None]:
+    """Fail a benchmark whose mean is over its threshold."""
+    marker: pytest.Mark | None = request.node.get_closest_marker("threshold")
+    if marker is None or "benchmark" not in request.fixturenames:
+        yield
+        return
+    benchmark: BenchmarkFixture = request.getfixturevalue("benchmark")
+    yield
+    if benchmark.disabled or benchmark.stats is None:
+        return
+    mean: float = benchmark.stats.stats.mean
+    threshold: float = marker.args[0]
+    if mean > threshold:
+        pytest.fail(f"Mean {mean:.6f}s is over the {threshold}s threshold.")
+
+
+@pytest.fixture
+def transport() -> Transport:
+    """Transport without a meaningful rate limit."""
+    return Transport(rate_limiter=TokenBucket(rate=10_000, capacity=1_000))
+
+
+@pytest.fixture(scope="session")
+def fake_archive() -> Iterator[FakeArchive]:
+    """Serve a fake archive of 100 articles for the whole session."""
+    with FakeArchive(articles=100) as archive:
+        yield archive
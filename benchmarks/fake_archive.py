@@ -0,0 +1,144 @@
+"""Local stand-in for the Wayback Machine."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import Self
+from urllib.parse import parse_qs, urlsplit
+
+import orjson
+from pages import TIMESTAMP, main_article, main_listing
+
+_PAGE_SIZE: int = 10
+
+
+class FakeArchive:
+    """Serve replay pages, listing pages and a CDX index from a thread.
+
+    Replay urls look like the archive's, ``/web/<timestamp>/<original>``,
+    and every article page is built once up front so the server adds as
+    little as possible to what is measured.
+    """
+
+    def __init__(self, articles: int = 100, port: int = 0) -> None:
+        """Initialize fake archive."""
+        self.slugs: list[str] = [f"article-{index}" for index in range(articles)]
+        self.pages: dict[str, bytes] = {
+            f"/web/{TIMESTAMP}/http://bodhicommons.org/{slug}": main_article(
+                slug, paragraphs=20
+            ).encode()
+            for slug in self.slugs
+        }
+        self.requests: int = 0
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(
+            ("127.0.0.1", port), self.__handler()
+        )
+        self.url: str = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def article_urls(self) -> list[str]:
+        """Replay urls of every article."""
+        return [f"{self.url}{path}" for path in self.pages]
+
+    @property
+    def listing_pages(self) -> range:
+        """Numbers of the listing pages."""
+        return range((len(self.slugs) + _PAGE_SIZE - 1) // _PAGE_SIZE)
+
+    def listing_url(self) -> str:
+        """Template of the listing page urls, as a site layout expects it.
+
+        Returns:
+            str: Url with ``{timestamp}`` and ``{page}`` placeholders.
+
+        """
+        return f"{self.url}/web/{{timestamp}}/http://bodhicommons.org?page={{page}}"
+
+    def __cdx(self, query: dict[str, list[str]]) -> bytes:
+        """Answer a CDX query, paged with resume keys like the real index."""
+        limit: int = int(query.get("limit", ["5000"])[0])
+        start: int = int(query.get("resumeKey", ["0"])[0])
+        rows: list[list[str]] = [
+            ["urlkey", "timestamp", "original", "mimetype", "statuscode"],
+            *(
+                [
+                    f"org,bodhicommons)/{slug}",
+                    TIMESTAMP,
+                    f"http://bodhicommons.org/{slug}",
+                    "text/html",
+                    "200",
+                ]
+                for slug in sorted(self.slugs)[start : start + limit]
+            ),
+        ]
+        if start + limit < len(self.slugs):
+            rows += [[], [str(start + limit)]]
+        return orjson.dumps(rows)
+
+    def respond(self, path: str, query: dict[str, list[str]]) -> bytes | None:
+        """Find the body served for a path.
+
+        Returns:
+            bytes | None: Response body, None for a 404.
+
+        """
+        if path == "/cdx/search/cdx":
+            return self.__cdx(query)
+        if path in self.pages:
+            return self.pages[path]
+        if "page" in query:
+            page: int = int(query["page"][0])
+            slugs: list[str] = self.slugs[page * _PAGE_SIZE : (page + 1) * _PAGE_SIZE]
+            return main_listing(
+                [f"/web/{TIMESTAMP}/http://bodhicommons.org/{slug}" for slug in slugs]
+            ).encode()
+        return None
+
+    def __handler(self) -> type[BaseHTTPRequestHandler]:
+        """Build the request handler class bound to this archive.
+
+        Returns:
+            type[BaseHTTPRequestHandler]: Handler class.
+
+        """
+        archive: FakeArchive = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = 1 << 16
+
+            def do_GET(self) -> None:
+                archive.requests += 1
+                url = urlsplit(self.path)
+                body: bytes | None = archive.respond(url.path, parse_qs(url.query))
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, *_: object) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> Self:
+        """Start serving.
+
+        Returns:
+            FakeArchive: This archive.
+
+        """
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,165 @@
+"""Replay pages for the benchmarks.
+
+Pages recorded from the archive with ``record.py`` are used when they
+exist; otherwise pages of the same shape are synthesized, Wayback toolbar
+and all, so the benchmarks run offline.
+"""
+
+import random
+from pathlib import Path
+
+RECORDINGS: Path = Path(__file__).parent / "recordings"
+TIMESTAMP: str = "20230331041108"
+BETA_TIMESTAMP: str = "20160320002127"
+
+_WORDS: tuple[str, ...] = (
+    "കേരളം",
+    "ജനാധിപത്യം",
+    "സമൂഹം",
+    "ചരിത്രം",
+    "രാഷ്ട്രീയം",
+    "സംസ്കാരം",
+    "പരിസ്ഥിതി",
+    "വിദ്യാഭ്യാസം",
+    "the",
+    "commons",
+    "public",
+    "knowledge",
+)
+_TOOLBAR: str = (
+    '<script src="//archive.org/includes/analytics.js"></script>'
+    '<script>window.RufflePlayer=window.RufflePlayer||{};'
+    + "var __wm = {};" * 200
+    + "</script>"
+    '<style type="text/css">'
+    + "#wm-ipp-base{min-height:65px;padding:0;margin:0;border:none;}" * 50
+    + "</style>"
+    '<div id="wm-ipp-base" lang="en" style="display:none;direction:ltr;">'
+    + '<div id="wm-ipp"><table><tr><td><a href="#">Wayback</a></td></tr></table>'
+    "</div></div>"
+)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    """Make up a sentence."""
+    return " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+
+
+def _paragraphs(rng: random.Random, count: int) -> str:
+    """Make up article paragraphs."""
+    return "".join(
+        f"<p>{' '.join(_sentence(rng, 14) for _ in range(5))}</p>"
+        for _ in range(count)
+    )
+
+
+def _recorded(name: str) -> str | None:
+    """Read a recorded page, if there is one."""
+    path: Path = RECORDINGS / name
+    return path.read_text(encoding="utf-8") if path.is_file() else None
+
+
+def main_article(slug: str = "article", paragraphs: int = 30, seed: int = 0) -> str:
+    """Build a main site article page.
+
+    Returns:
+        str: Html of the page.
+
+    """
+    recorded: str | None = _recorded("main_article.html")
+    if recorded is not None and slug == "article":
+        return recorded
+    rng: random.Random = random.Random(f"{slug}{seed}")  # noqa: S311
+    navigation: str = "".join(
+        f'<li><a href="/web/{TIMESTAMP}/http://bodhicommons.org/section-{index}">'
+        f"{_sentence(rng, 2)}</a></li>"
+        for index in range(40)
+    )
+    tags: str = "".join(f"<a>{rng.choice(_WORDS)}</a> " for _ in range(4))
+    images: str = "".join(
+        f'<img src="/web/{TIMESTAMP}im_/http://bodhicommons.org/sites/default/'
+        f'files/{slug}-{index}.jpg">'
+        for index in range(3)
+    )
+    return (
+        f"<html><head><title>{_sentence(rng, 6)} | Bodhi Commons</title>"
+        f"{_TOOLBAR}</head><body>"
+        f'<div class="layout-container"><header><ul>{navigation}</ul></header>'
+        '<main><article><span class="authored-at is-pulled-right">'
+        "Sat, 01/04/2023 - 10:30</span>"
+        f'<span class="author-name">-{_sentence(rng, 2)}</span>'
+        '<div class="clearfix text-formatted field field--name-body '
+        'field--type-text-with-summary field--label-hidden field__item">'
+        f"{_paragraphs(rng, paragraphs)}{images}</div>"
+        '<div class="field field--name-field-tags '
+        'field--type-entity-reference field--label-above">'
+        f"<div>Tags</div>{tags}</div>"
+        f"</article></main><footer><ul>{navigation}</ul></footer></div>"
+        "</body></html>"
+    )
+
+
+def beta_article(slug: str = "article", paragraphs: int = 30, seed: int = 0) -> str:
+    """Build a beta site article page, metadata table and all.
+
+    Returns:
+        str: Html of the page.
+
+    """
+    recorded: str | None = _recorded("beta_article.html")
+    if recorded is not None and slug == "article":
+        return recorded
+    rng: random.Random = random.Random(f"beta{slug}{seed}")  # noqa: S311
+    tags: str = "".join(f"<a>{rng.choice(_WORDS)}</a>" for _ in range(4))
+    return (
+        f"<html><head><title>{_sentence(rng, 6)} | Bodhi Commons</title>"
+        f'{_TOOLBAR}</head><body><div class="panel-pane">'
+        '<span class="field-content"><table><tr>'
+        f"<td>-{_sentence(rng, 2)}</td><td>20 March 2016</td><td>{tags}</td>"
+        "<td>Views</td><td>Share</td></tr></table>"
+        f"{_paragraphs(rng, paragraphs)}"
+        f'<img src="/web/{BETA_TIMESTAMP}im_/http://beta.bodhicommons.org/'
+        f'sites/default/files/{slug}.jpg"></span></div></body></html>'
+    )
+
+
+def main_listing(article_urls: list[str]) -> str:
+    """Build a main site front page listing articles.
+
+    Returns:
+        str: Html of the page.
+
+    """
+    rows: str = "".join(
+        f'<div class="views-row"><h2><a href="{url}">{url}</a></h2></div>'
+        for url in article_urls
+    )
+    return (
+        f"<html><head><title>Bodhi Commons</title>{_TOOLBAR}</head><body>"
+        f'<div id="block-lenin-content"><div class="view-content">{rows}</div>'
+        "</div></body></html>"
+    )
+
+
+def article_record(index: int, paragraphs: int = 3) -> dict[str, str | list[str]]:
+    """Make up a stored article.
+
+    Returns:
+        dict[str, str | list[str]]: Article like the scrapers store them.
+
+    """
+    rng: random.Random = random.Random(index)  # noqa: S311
+    return {
+        "url": f"https://web.archive.org/web/{TIMESTAMP}/http://bodhicommons.org/a-{index}",
+        "title": _sentence(rng, 6),
+        "published_date": "Sat, 01/04/2023 - 10:30",
+        "authors": f"Author {index % 500}",
+        "language": "ml",
+        "tags": [rng.choice(_WORDS) for _ in range(3)],
+        "images": [f"/web/{TIMESTAMP}im_/http://bodhicommons.org/{index}.jpg"],
+        "categories": [],
+        "article_content": " ".join(_sentence(rng, 14) for _ in range(paragraphs * 5)),
+        "snapshot_timestamp": TIMESTAMP,
+        "etag": "",
+        "last_modified": "",
+    }
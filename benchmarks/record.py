@@ -0,0 +1,31 @@
+"""Record real archive pages for the benchmarks to replay.
+
+Usage: python benchmarks/record.py MAIN_ARTICLE_URL BETA_ARTICLE_URL
+"""
+
+import sys
+
+from pages import RECORDINGS
+
+from response_cache import header_charset
+from transport import get_transport
+
+
+def record(url: str, name: str) -> None:
+    """Fetch a replay url and keep its html under ``recordings``."""
+    response = get_transport().get(url)
+    response.raise_for_status()
+    RECORDINGS.mkdir(exist_ok=True)
+    (RECORDINGS / name).write_text(
+        response.content.decode(
+            header_charset(response.headers) or "utf-8", errors="replace"
+        ),
+        encoding="utf-8",
+    )
+    print(f"Recorded {url} as {name}.")
+
+
+if __name__ == "__main__":
+    main_url, beta_url = sys.argv[1:3]
+    record(main_url, "main_article.html")
+    record(beta_url, "beta_article.html")
@@ -0,0 +1,129 @@
+"""Parsing benchmarks for both site layouts."""
+
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from pages import article_record, beta_article, main_article
+from pytest_benchmark.fixture import BenchmarkFixture
+
+import content_scraper_2
+import content_scraper_beta
+from extraction import BETA_LAYOUT, MAIN_LAYOUT, LayoutSpec, iter_chunks
+from language import LanguageDetector
+from layouts import BETA_SITE, MAIN_SITE, SiteLayout
+
+MAIN_PAGE: str = main_article()
+BETA_PAGE: str = beta_article()
+SNAPSHOTS: dict[str, tuple[Callable[[], Any], str]] = {
+    "main": (content_scraper_2.PageSnapShot, MAIN_PAGE),
+    "beta": (content_scraper_beta.PageSnapShot, BETA_PAGE),
+}
+EXTRACTORS: tuple[str, ...] = (
+    "get_page_title",
+    "get_page_authors",
+    "get_page_images",
+    "get_page_tags",
+    "get_published_date",
+)
+
+
+def _snapshot(layout: str) -> Any:  # noqa: ANN401
+    """Make a page snapshot holding a page of a layout.
+
+    Returns:
+        Any: Snapshot of the layout's scraper.
+
+    """
+    snapshot_class, page = SNAPSHOTS[layout]
+    snapshot = snapshot_class()
+    snapshot.request = page
+    return snapshot
+
+
+@pytest.mark.threshold(0.1)
+@pytest.mark.parametrize("layout", ["main", "beta"])
+def test_make_soup(benchmark: BenchmarkFixture, layout: str) -> None:
+    """Build the BeautifulSoup tree of a page."""
+    benchmark(_snapshot(layout).make_soup)
+
+
+@pytest.mark.threshold(0.01)
+@pytest.mark.parametrize("extractor", EXTRACTORS)
+@pytest.mark.parametrize("layout", ["main", "beta"])
+def test_extractor(benchmark: BenchmarkFixture, layout: str, extractor: str) -> None:
+    """Read one field off an already parsed page."""
+    snapshot = _snapshot(layout)
+    snapshot.make_soup()
+    benchmark(getattr(snapshot, extractor))
+
+
+@pytest.mark.threshold(0.05)
+@pytest.mark.parametrize("layout", ["main", "beta"])
+def test_fetch_content(benchmark: BenchmarkFixture, layout: str) -> None:
+    """Read a whole article off a page with the compiled layout spec."""
+    snapshot = _snapshot(layout)
+    article: dict[str, Any] = benchmark(snapshot.fetch_content, article_url="url")
+    assert article["article_content"]
+
+
+@pytest.mark.threshold(0.02)
+@pytest.mark.parametrize(
+    ("spec", "page"),
+    [(MAIN_LAYOUT, MAIN_PAGE), (BETA_LAYOUT, BETA_PAGE)],
+    ids=["main", "beta"],
+)
+def test_extract(benchmark: BenchmarkFixture, spec: LayoutSpec, page: str) -> None:
+    """Extract every field in one pass over a page."""
+    fields: dict[str, Any] = benchmark(spec.extract, page)
+    assert fields["article_content"]
+
+
+@pytest.mark.threshold(0.02)
+@pytest.mark.parametrize(
+    ("spec", "page"),
+    [(MAIN_LAYOUT, MAIN_PAGE), (BETA_LAYOUT, BETA_PAGE)],
+    ids=["main", "beta"],
+)
+def test_extract_stream(
+    benchmark: BenchmarkFixture, spec: LayoutSpec, page: str
+) -> None:
+    """Extract every field while the page is parsed in chunks."""
+    content: bytes = page.encode()
+    fields: dict[str, Any] = benchmark(
+        lambda: spec.extract_stream(iter_chunks(content, 1 << 14), "utf-8")
+    )
+    assert fields["article_content"]
+
+
+@pytest.mark.threshold(0.05)
+@pytest.mark.parametrize(
+    ("layout", "page"),
+    [(MAIN_SITE, MAIN_PAGE), (BETA_SITE, BETA_PAGE)],
+    ids=["main", "beta"],
+)
+def test_layout_parse(
+    benchmark: BenchmarkFixture, layout: SiteLayout, page: str
+) -> None:
+    """Parse a page into an article record, language detection included."""
+    article: dict[str, Any] = benchmark(layout.parse, "url", page)
+    assert article["language"]
+
+
+@pytest.mark.threshold(1.0)
+@pytest.mark.parametrize("script", ["malayalam", "latin"])
+def test_detect_languages(benchmark: BenchmarkFixture, script: str) -> None:
+    """Detect the languages of a batch of articles, none of them cached."""
+    records = [article_record(index) for index in range(64)]
+    articles: list[tuple[str, str]] = [
+        (str(record["title"]), str(record["article_content"])) for record in records
+    ]
+    if script == "latin":
+        articles = [
+            (f"The public commons {index}", "knowledge of the commons " * 80)
+            for index, _ in enumerate(articles)
+        ]
+    detector: LanguageDetector = LanguageDetector(cache_size=0)
+    detector.detect("warm up", "the profiles")
+    languages: list[str] = benchmark(detector.detect_many, articles)
+    assert all(languages)
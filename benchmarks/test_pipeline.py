@@ -0,0 +1,104 @@
+"""Fetch and end-to-end benchmarks against a fake archive."""
+
+import dataclasses
+import itertools
+from pathlib import Path
+
+import pytest
+from fake_archive import FakeArchive
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from cdx_discovery import CdxDiscovery
+from layouts import MAIN_SITE, SiteLayout
+from pipeline import DiscoveryMethod, Pipeline
+from response_cache import ResponseCache
+from transport import Transport
+
+
+@pytest.mark.threshold(0.05)
+def test_fetch(
+    benchmark: BenchmarkFixture, fake_archive: FakeArchive, transport: Transport
+) -> None:
+    """Fetch article pages over a kept-alive connection."""
+    urls = itertools.cycle(fake_archive.article_urls)
+    response = benchmark(lambda: transport.get(next(urls)))
+    assert response.ok
+
+
+@pytest.mark.threshold(0.01)
+def test_cache_round_trip(
+    benchmark: BenchmarkFixture, fake_archive: FakeArchive, tmp_path: Path
+) -> None:
+    """Cache a page as a WARC record and read it back."""
+    cache: ResponseCache = ResponseCache(tmp_path / "cache")
+    page: bytes = next(iter(fake_archive.pages.values()))
+    urls = (f"https://web.archive.org/web/1/http://a/{index}" for index in itertools.count())
+
+    def round_trip() -> None:
+        url: str = next(urls)
+        cache.put(url, 200, {"content-type": "text/html"}, page)
+        cache.get(url)
+
+    benchmark(round_trip)
+
+
+@pytest.mark.threshold(0.5)
+def test_cdx_discovery(
+    benchmark: BenchmarkFixture, fake_archive: FakeArchive, transport: Transport
+) -> None:
+    """Resolve the best capture of every article, page by page."""
+
+    def resolve() -> int:
+        discovery: CdxDiscovery = CdxDiscovery(
+            page_size=25,
+            state_file=None,
+            endpoint=f"{fake_archive.url}/cdx/search/cdx",
+            transport=transport,
+        )
+        return sum(1 for _ in discovery.iter_resolved())
+
+    assert benchmark(resolve) == len(fake_archive.slugs)
+
+
+@pytest.mark.threshold(20.0)
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_end_to_end(
+    benchmark: BenchmarkFixture,
+    fake_archive: FakeArchive,
+    transport: Transport,
+    tmp_path: Path,
+    parse_workers: int,
+) -> None:
+    """Discover, fetch, parse and store every article of the archive."""
+    layout: SiteLayout = dataclasses.replace(
+        MAIN_SITE,
+        listing_url=fake_archive.listing_url(),
+        listing_pages=fake_archive.listing_pages,
+    )
+    runs = itertools.count()
+
+    def setup() -> tuple[tuple[Pipeline], dict[str, object]]:
+        directory: Path = tmp_path / str(next(runs))
+        directory.mkdir()
+        pipeline: Pipeline = Pipeline(
+            layout,
+            db_name=str(directory / "articles.sqlite3"),
+            retry_queue_name=str(directory / "queue.sqlite3"),
+            cache_directory=str(directory / "cache"),
+            fetch_workers=4,
+            parse_workers=parse_workers,
+            transport=transport,
+        )
+        return (pipeline,), {}
+
+    def run(pipeline: Pipeline) -> int:
+        pipeline.run(DiscoveryMethod.LISTING)
+        return pipeline.stored
+
+    stored: int = benchmark.pedantic(run, setup=setup, rounds=3)
+    assert stored == len(fake_archive.slugs)
+    if benchmark.stats is None:
+        return
+    benchmark.extra_info["articles_per_second"] = (
+        stored / benchmark.stats.stats.mean
+    )
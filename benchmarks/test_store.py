@@ -0,0 +1,227 @@
+"""Article store benchmarks at 1k, 10k and 100k records."""
+
+import itertools
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+
+import orjson
+import pytest
+from pages import article_record
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from article_db import ArticleDatabase
+from article_store import ArticleStore, FsyncPolicy
+from dedup import NearDuplicateIndex
+
+SIZES: tuple[int, ...] = (1_000, 10_000, 100_000)
+
+
+@pytest.fixture(scope="session")
+def populated(tmp_path_factory: pytest.TempPathFactory) -> Callable[[int], Path]:
+    """Build, once per size, an article database and JSON Lines store.
+
+    Returns:
+        Callable[[int], Path]: Directory holding ``articles.sqlite3`` and
+        ``articles.jsonl`` with that many articles.
+
+    """
+    built: dict[int, Path] = {}
+
+    def build(size: int) -> Path:
+        if size in built:
+            return built[size]
+        directory: Path = tmp_path_factory.mktemp(f"store-{size}")
+        store: ArticleDatabase = ArticleDatabase(
+            directory / "articles.sqlite3",
+            fsync=FsyncPolicy.INTERVAL,
+            fsync_interval=1_000,
+        )
+        with (directory / "articles.jsonl").open("wb") as jsonl:
+            for index in range(size):
+                article: dict[str, str | list[str]] = article_record(index)
+                store.append(article)
+                jsonl.write(orjson.dumps(article) + b"\n")
+        store.close()
+        store.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        store.connection.close()
+        built[size] = directory
+        return directory
+
+    return build
+
+
+def _copy(directory: Path, tmp_path: Path, name: str) -> Path:
+    """Copy a populated store so a benchmark can write to it.
+
+    Returns:
+        Path: Copy of the store.
+
+    """
+    return Path(shutil.copy(directory / name, tmp_path / name))
+
+
+@pytest.mark.threshold(0.05)
+@pytest.mark.parametrize("size", SIZES)
+def test_database_append(
+    benchmark: BenchmarkFixture,
+    populated: Callable[[int], Path],
+    tmp_path: Path,
+    size: int,
+) -> None:
+    """Store one more article, committing it durably."""
+    store: ArticleDatabase = ArticleDatabase(
+        _copy(populated(size), tmp_path, "articles.sqlite3")
+    )
+    indexes = itertools.count(size)
+    benchmark(lambda: store.append(article_record(next(indexes))))
+
+
+@pytest.mark.threshold(30.0)
+@pytest.mark.parametrize("size", SIZES)
+def test_database_load(
+    benchmark: BenchmarkFixture, populated: Callable[[int], Path], size: int
+) -> None:
+    """Load every stored article."""
+    store: ArticleDatabase = ArticleDatabase(populated(size) / "articles.sqlite3")
+    articles: list[dict[str, str | list[str]]] = benchmark.pedantic(
+        store.load, rounds=3, iterations=1
+    )
+    assert len(articles) == size
+
+
+@pytest.mark.threshold(0.01)
+@pytest.mark.parametrize("size", SIZES)
+def test_database_lookup(
+    benchmark: BenchmarkFixture, populated: Callable[[int], Path], size: int
+) -> None:
+    """Look one article up by url and check membership of another."""
+    store: ArticleDatabase = ArticleDatabase(populated(size) / "articles.sqlite3")
+    url: str = str(article_record(size // 2)["url"])
+    benchmark(lambda: (store.get(url), "missing" in store))
+
+
+@pytest.mark.threshold(2.0)
+@pytest.mark.parametrize("size", SIZES)
+def test_database_search(
+    benchmark: BenchmarkFixture, populated: Callable[[int], Path], size: int
+) -> None:
+    """Run a full-text query and an author query."""
+    store: ArticleDatabase = ArticleDatabase(populated(size) / "articles.sqlite3")
+    benchmark(lambda: (store.search("കേരളം"), store.by_author("Author 7")))
+
+
+@pytest.mark.threshold(0.05)
+@pytest.mark.parametrize("size", SIZES)
+def test_jsonl_append(
+    benchmark: BenchmarkFixture,
+    populated: Callable[[int], Path],
+    tmp_path: Path,
+    size: int,
+) -> None:
+    """Append one more article to a JSON Lines store."""
+    store: ArticleStore = ArticleStore(
+        _copy(populated(size), tmp_path, "articles.jsonl")
+    )
+    indexes = itertools.count(size)
+    benchmark(lambda: store.append(article_record(next(indexes))))
+
+
+@pytest.mark.threshold(30.0)
+@pytest.mark.parametrize("size", SIZES)
+def test_jsonl_load(
+    benchmark: BenchmarkFixture, populated: Callable[[int], Path], size: int
+) -> None:
+    """Load every article of a JSON Lines store."""
+    store: ArticleStore = ArticleStore(populated(size) / "articles.jsonl")
+    articles: list[dict[str, str | list[str]]] = benchmark.pedantic(
+        store.load, rounds=3, iterations=1
+    )
+    assert len(articles) == size
+
+
+@pytest.mark.threshold(30.0)
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+@pytest.mark.parametrize("size", SIZES[:2])
+def test_export(
+    benchmark: BenchmarkFixture,
+    populated: Callable[[int], Path],
+    tmp_path: Path,
+    size: int,
+    export_format: str,
+) -> None:
+    """Export every stored article to partitioned columnar files."""
+    pytest.importorskip("pyarrow")
+    from export import CorpusExporter  # noqa: PLC0415
+
+    exporter: CorpusExporter = CorpusExporter(
+        ArticleDatabase(populated(size) / "articles.sqlite3"),
+        tmp_path / "export",
+        export_format=export_format,
+    )
+    exported: int = benchmark.pedantic(exporter.export, rounds=3, iterations=1)
+    assert exported == size
+
+
+@pytest.mark.threshold(30.0)
+@pytest.mark.parametrize("size", SIZES[:2])
+def test_near_duplicates(benchmark: BenchmarkFixture, size: int) -> None:
+    """Index the content of every article, looking up near-duplicates."""
+    contents: list[str] = [
+        str(article_record(index)["article_content"]) for index in range(size)
+    ]
+
+    def index_all() -> NearDuplicateIndex:
+        index: NearDuplicateIndex = NearDuplicateIndex()
+        for key, content in enumerate(contents):
+            index.add(str(key), content)
+        return index
+
+    index: NearDuplicateIndex = benchmark.pedantic(index_all, rounds=3, iterations=1)
+    assert len(index) == size
+
+
+def _compressed(directory: Path, tmp_path: Path) -> ArticleDatabase:
+    """Copy a populated database and compress it.
+
+    Returns:
+        ArticleDatabase: Compressed copy.
+
+    """
+    pytest.importorskip("zstandard")
+    store: ArticleDatabase = ArticleDatabase(
+        _copy(directory, tmp_path, "articles.sqlite3")
+    )
+    store.compress()
+    return store
+
+
+@pytest.mark.threshold(30.0)
+@pytest.mark.parametrize("size", SIZES[:2])
+def test_compressed_load(
+    benchmark: BenchmarkFixture,
+    populated: Callable[[int], Path],
+    tmp_path: Path,
+    size: int,
+) -> None:
+    """Load every article of a compressed database."""
+    store: ArticleDatabase = _compressed(populated(size), tmp_path)
+    articles: list[dict[str, str | list[str]]] = benchmark.pedantic(
+        store.load, rounds=3, iterations=1
+    )
+    assert len(articles) == size
+
+
+@pytest.mark.threshold(0.01)
+@pytest.mark.parametrize("size", SIZES[:2])
+def test_compressed_lookup(
+    benchmark: BenchmarkFixture,
+    populated: Callable[[int], Path],
+    tmp_path: Path,
+    size: int,
+) -> None:
+    """Look one article up by url in a compressed database."""
+    store: ArticleDatabase = _compressed(populated(size), tmp_path)
+    url: str = str(article_record(size // 2)["url"])
+    article: dict[str, str | list[str]] | None = benchmark(store.get, url)
+    assert article == article_record(size // 2)
@@ -1,13 +1,15 @@
 """URL scraper."""
 
-import time
+import sys
 from pathlib import Path
 
-import requests
 import requests.exceptions
 from bs4 import BeautifulSoup as bs
 from bs4 import NavigableString, Tag
 
+from cdx_discovery import BETA_ARTICLE_PATTERN, CdxDiscovery
+from transport import Transport, get_transport
+
 
 class BodhiSnapShot:
     """IA snapshot."""
@@ -18,9 +20,7 @@ class BodhiSnapShot:
         time_stamp: str = "20160320002127",
     ) -> None:
         """Initialize bodhi snapshot."""
-        self.headers: dict[str, str] = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:130.0) Gecko/20100101 Firefox/130.0"
-        }
+        self.transport: Transport = get_transport()
         self.url: str = url
         self.time_stamp: str = time_stamp
         self.output_format: str = "json"
@@ -31,11 +31,7 @@ class BodhiSnapShot:
 
     def fire_request(self) -> None:
         """Fire request."""
-        self.request: str = requests.get(
-            self.web_archive_url,
-            headers=self.headers,
-            timeout=10,
-        ).text
+        self.request: str = self.transport.get(self.web_archive_url).text
 
     def make_soup(self) -> None:
         """Make soup."""
@@ -67,7 +63,8 @@ class BodhiSnapShot:
         self.article_list = self.main_block.find_all("h2")
 
     def get_article_urls(self) -> None:
-        """Get article urls."""
+        """Get the article urls of the current page."""
+        self.article_urls.clear()
         for article in self.article_list:
             a_ = article.find("a")
             if a_ is not None:
@@ -95,9 +92,28 @@ class BodhiSnapShot:
             print(e)
         except TypeError:
             print("Failed to find main block.")
-        time.sleep(10)
+        print(self.transport.report())
+
+    def scrape_urls_from_cdx(self) -> None:
+        """Discover article urls from the CDX index instead of listing pages."""
+        discovery: CdxDiscovery = CdxDiscovery(
+            url="beta.bodhicommons.org/article/",
+            article_pattern=BETA_ARTICLE_PATTERN,
+            before=self.time_stamp,
+            state_file="cdx_beta_state.json",
+            transport=self.transport,
+        )
+        try:
+            total_urls: int = discovery.write_urls("page_cdx_beta_urls.txt")
+            print(f"Found {total_urls} articles in the CDX index.")
+        except requests.exceptions.RequestException as e:
+            print(e)
+        print(self.transport.report())
 
 
 if __name__ == "__main__":
     bodhi_snapshot = BodhiSnapShot()
-    bodhi_snapshot.scrape_urls()
+    if "--cdx" in sys.argv:
+        bodhi_snapshot.scrape_urls_from_cdx()
+    else:
+        bodhi_snapshot.scrape_urls()
@@ -0,0 +1,252 @@
+"""Article url discovery through the Wayback CDX index."""
+
+import re
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import orjson
+
+from transport import Transport, get_transport
+from wayback import CDX_ENDPOINT, archive_url
+
+CDX_FIELDS: tuple[str, ...] = (
+    "urlkey",
+    "timestamp",
+    "original",
+    "mimetype",
+    "statuscode",
+)
+# Main site articles are listed as /<slug>, whose words are joined by
+# hyphens or underscores unlike single word pages such as /about, as
+# /article/<slug> or /node/<number>, with or without /index.php.
+MAIN_ARTICLE_PATTERN: re.Pattern[str] = re.compile(
+    r"^(?:/index\.php)?(?:/article/[^/]+|/node/\d+|/(?=[\w%-]*[-_])[\w%-]+)$"
+)
+BETA_ARTICLE_PATTERN: re.Pattern[str] = re.compile(r"^/article/[^/]+$")
+
+
+@dataclass(frozen=True)
+class Capture:
+    """One row of the CDX index."""
+
+    urlkey: str
+    timestamp: str
+    original: str
+    mimetype: str
+    statuscode: str
+
+    @property
+    def archive_url(self) -> str:
+        """Replay url of this capture."""
+        return archive_url(self.original, self.timestamp)
+
+
+class CdxDiscovery:
+    """Discover article urls and their best snapshot from the CDX index."""
+
+    def __init__(
+        self,
+        url: str = "bodhicommons.org/",
+        article_pattern: re.Pattern[str] = MAIN_ARTICLE_PATTERN,
+        before: str | None = None,
+        page_size: int = 5000,
+        state_file: str | None = "cdx_state.json",
+        endpoint: str = CDX_ENDPOINT,
+        transport: Transport | None = None,
+    ) -> None:
+        """Initialize CDX discovery.
+
+        Parameters
+        ----------
+        url : str
+            Url prefix to list captures for.
+        article_pattern : re.Pattern[str]
+            Pattern an original url path must match to count as an article.
+        before : str | None
+            Latest acceptable capture timestamp, defaults to no limit.
+        page_size : int
+            Rows requested per CDX page.
+        state_file : str | None
+            File the resume key and best captures are kept in between pages,
+            so an interrupted lookup continues where it stopped. It is
+            removed once the index has been read to its end.
+        endpoint : str
+            CDX server endpoint.
+        transport : Transport | None
+            Transport used for the lookups, the shared one by default.
+
+        """
+        self.url: str = url
+        self.article_pattern: re.Pattern[str] = article_pattern
+        self.before: str | None = before
+        self.page_size: int = page_size
+        self.state_file: Path | None = Path(state_file) if state_file else None
+        self.endpoint: str = endpoint
+        self.transport: Transport = transport or get_transport()
+        self.resume_key: str = ""
+        self.best_captures: dict[str, Capture] = {}
+        self.__load_state()
+
+    def __load_state(self) -> None:
+        """Load resume state left by an interrupted lookup.
+
+        A state file that cannot be read, say because it was cut short, is
+        ignored and the lookup starts over.
+        """
+        if self.state_file is None or not self.state_file.is_file():
+            return
+        try:
+            state = orjson.loads(self.state_file.read_bytes())
+            resume_key: str = str(state["resume_key"])
+            best_captures: dict[str, Capture] = {
+                urlkey: Capture(**capture)
+                for urlkey, capture in state["captures"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Ignoring the unreadable CDX state in {self.state_file}: {e}")
+            return
+        self.resume_key = resume_key
+        self.best_captures = best_captures
+
+    def __save_state(self) -> None:
+        """Persist the resume key and best captures found so far."""
+        if self.state_file is None:
+            return
+        partial: Path = self.state_file.with_name(f"{self.state_file.name}.partial")
+        partial.write_bytes(
+            orjson.dumps(
+                {
+                    "resume_key": self.resume_key,
+                    "captures": {
+                        urlkey: asdict(capture)
+                        for urlkey, capture in self.best_captures.items()
+                    },
+                }
+            )
+        )
+        partial.replace(self.state_file)
+
+    def __clear_state(self) -> None:
+        """Remove the state of a finished lookup, so the next one starts over."""
+        if self.state_file is not None:
+            self.state_file.unlink(missing_ok=True)
+
+    def fetch_page(self) -> list[Capture]:
+        """Fetch the next page of captures.
+
+        Returns:
+            list[Capture]: Captures on the page, empty once exhausted.
+
+        """
+        params: dict[str, str | list[str]] = {
+            "url": self.url,
+            "matchType": "prefix",
+            "output": "json",
+            "fl": ",".join(CDX_FIELDS),
+            "filter": ["statuscode:200", "mimetype:text/html"],
+            "limit": str(self.page_size),
+            "showResumeKey": "true",
+        }
+        if self.resume_key:
+            params["resumeKey"] = self.resume_key
+        response = self.transport.get(self.endpoint, params=params)
+        response.raise_for_status()
+        rows: list[list[str]] = orjson.loads(response.content or b"[]")
+        self.resume_key = ""
+        captures: list[Capture] = []
+        for index, row in enumerate(rows[1:], start=1):
+            if not row:
+                resume_row: list[list[str]] = rows[index + 1 : index + 2]
+                self.resume_key = resume_row[0][0] if resume_row else ""
+                break
+            captures.append(Capture(**dict(zip(CDX_FIELDS, row, strict=True))))
+        return captures
+
+    def is_article(self, capture: Capture) -> bool:
+        """Check whether a capture is an article page.
+
+        Returns:
+            bool: True for article pages.
+
+        """
+        original = urlsplit(capture.original)
+        return not original.query and bool(
+            self.article_pattern.match(original.path)
+        )
+
+    def __keep_best(self, capture: Capture) -> None:
+        """Keep a capture if it is the best one of its article so far."""
+        if not self.is_article(capture) or (
+            self.before and capture.timestamp > self.before
+        ):
+            return
+        best: Capture | None = self.best_captures.get(capture.urlkey)
+        if best is None or capture.timestamp > best.timestamp:
+            self.best_captures[capture.urlkey] = capture
+
+    def iter_resolved(self) -> Iterator[Capture]:
+        """Resolve the best capture of every article, page by page.
+
+        Rows arrive sorted by urlkey, so once a page is read every urlkey
+        on it but the last one is final and its best capture is yielded
+        right away instead of after the whole index has been read.
+
+        Yields:
+            Capture: Best capture of an article.
+
+        """
+        emitted: set[str] = set()
+        complete: bool = False
+        while not complete:
+            captures: list[Capture] = self.fetch_page()
+            for capture in captures:
+                self.__keep_best(capture)
+            self.__save_state()
+            complete = not self.resume_key
+            open_urlkey: str | None = (
+                captures[-1].urlkey if captures and not complete else None
+            )
+            final: list[str] = [
+                urlkey
+                for urlkey in self.best_captures
+                if urlkey not in emitted and urlkey != open_urlkey
+            ]
+            emitted.update(final)
+            for urlkey in final:
+                yield self.best_captures[urlkey]
+        for urlkey, capture in self.best_captures.items():
+            if urlkey not in emitted:
+                yield capture
+        self.__clear_state()
+
+    def resolve(self) -> dict[str, Capture]:
+        """Resolve the best capture of every article in one pass.
+
+        The best capture is the latest one no later than ``before``. Rows
+        arrive grouped by urlkey, so the index is collapsed by urlkey as
+        it streams in.
+
+        Returns:
+            dict[str, Capture]: Best capture keyed by urlkey.
+
+        """
+        for _ in self.iter_resolved():
+            pass
+        return self.best_captures
+
+    def write_urls(self, path: str | Path) -> int:
+        """Write the replay url of every article's best capture.
+
+        Returns:
+            int: Number of urls written.
+
+        """
+        best_captures: dict[str, Capture] = self.resolve()
+        with Path(path).open("w", encoding="utf-8") as url_file:
+            url_file.writelines(
+                f"{best_captures[urlkey].archive_url}\n"
+                for urlkey in sorted(best_captures)
+            )
+        return len(best_captures)
@@ -0,0 +1,366 @@
+"""Command line interface of the recovery pipeline."""
+
+import argparse
+import importlib.util
+import sys
+from collections.abc import Sequence
+
+import orjson
+
+from article_db import ArticleDatabase
+from dedup import Deduplicator, NearDuplicateIndex
+from layouts import Article, SiteLayout, available_layouts, get_layout
+from metrics import Metrics, get_metrics
+from pipeline import DiscoveryMethod, Pipeline
+from response_cache import ResponseCache
+from retry_queue import FailureKind, RetryQueue
+
+
+def build_parser() -> argparse.ArgumentParser:  # noqa: PLR0915
+    """Build the argument parser of every subcommand.
+
+    Returns:
+        argparse.ArgumentParser: Argument parser.
+
+    """
+    common: argparse.ArgumentParser = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--layout", choices=available_layouts(), default="main", help="site layout"
+    )
+    common.add_argument("--db", help="article database, the layout's by default")
+    common.add_argument(
+        "--retry-queue", help="retry queue database, the layout's by default"
+    )
+    workers: argparse.ArgumentParser = argparse.ArgumentParser(add_help=False)
+    workers.add_argument("--cache-directory", default="cache")
+    workers.add_argument("--fetch-workers", type=int, default=4)
+    workers.add_argument("--parse-workers", type=int, default=0)
+    workers.add_argument("--queue-size", type=int, default=64)
+    workers.add_argument(
+        "--language-batch",
+        type=int,
+        default=64,
+        help="articles whose languages are detected together, 0 to detect "
+        "each while parsing",
+    )
+    workers.add_argument(
+        "--fallback-concurrency",
+        type=int,
+        default=3,
+        help="other captures of a missing or unparsable article tried at "
+        "once, 0 to not try any",
+    )
+    workers.add_argument(
+        "--raw",
+        action="store_true",
+        help="fetch the original bytes of each capture, without the archive's "
+        "toolbar",
+    )
+    workers.add_argument(
+        "--async-fetch",
+        action="store_true",
+        help="fetch on coroutines sharing one async client instead of threads",
+    )
+    workers.add_argument(
+        "--streaming",
+        action="store_true",
+        help="parse pages chunk by chunk, keeping only the regions read from",
+    )
+    workers.add_argument(
+        "--dedup",
+        action="store_true",
+        help="merge articles nearly duplicating a stored one into it",
+    )
+    workers.add_argument(
+        "--metrics-file", help="keep Prometheus metrics of the run in this file"
+    )
+    workers.add_argument(
+        "--metrics-port", type=int, help="serve Prometheus metrics on this port"
+    )
+    workers.add_argument(
+        "--profile",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="run a stage (fetch, parse, language_detection, store, ...) "
+        "under cProfile",
+    )
+    workers.add_argument("--profile-directory", default="profiles")
+    discovery: argparse.ArgumentParser = argparse.ArgumentParser(add_help=False)
+    discovery.add_argument(
+        "--method",
+        choices=list(DiscoveryMethod),
+        default=DiscoveryMethod.CDX,
+        help="discover urls from the CDX index or from listing pages",
+    )
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Recover Bodhi Commons articles from the archive."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "discover",
+        parents=[common, workers, discovery],
+        help="queue the article urls of a layout",
+    )
+    commands.add_parser(
+        "fetch",
+        parents=[common, workers],
+        help="fetch queued articles into the response cache",
+    )
+    commands.add_parser(
+        "parse",
+        parents=[common, workers],
+        help="parse cached articles into the article database",
+    )
+    commands.add_parser(
+        "run",
+        parents=[common, workers, discovery],
+        help="discover, fetch, parse and store in one streaming run",
+    )
+    work: argparse.ArgumentParser = commands.add_parser(
+        "work",
+        parents=[common, workers],
+        help="fetch, parse and store queued urls alongside other workers",
+    )
+    work.add_argument(
+        "--worker-id", help="name of this worker, its host and process by default"
+    )
+    work.add_argument(
+        "--lease",
+        type=float,
+        default=300.0,
+        help="seconds a claimed url stays leased without a heartbeat",
+    )
+    store: argparse.ArgumentParser = commands.add_parser(
+        "store", parents=[common], help="query the article database"
+    )
+    query = store.add_mutually_exclusive_group()
+    query.add_argument("--url")
+    query.add_argument("--author")
+    query.add_argument("--language")
+    query.add_argument("--tag")
+    query.add_argument("--search", help="full-text query over titles and content")
+    store.add_argument("--limit", type=int, default=20)
+    store.add_argument(
+        "--compress",
+        action="store_true",
+        help="train a zstd dictionary on the stored articles and compress them",
+    )
+    retry_queue: argparse.ArgumentParser = commands.add_parser(
+        "queue", parents=[common], help="inspect the retry queue"
+    )
+    retry_queue.add_argument(
+        "--dead", action="store_true", help="list the urls given up on"
+    )
+    retry_queue.add_argument(
+        "--requeue",
+        choices=[*FailureKind, "all"],
+        nargs="?",
+        const="all",
+        help="give dead urls, or those of one kind of failure, new attempts",
+    )
+    dedup: argparse.ArgumentParser = commands.add_parser(
+        "dedup",
+        parents=[common],
+        help="merge near-duplicate articles, within the database and from others",
+    )
+    dedup.add_argument(
+        "--merge-from",
+        action="append",
+        default=[],
+        metavar="DB",
+        help="article database merged in, e.g. the beta site's; repeatable",
+    )
+    dedup.add_argument(
+        "--threshold",
+        type=float,
+        default=0.8,
+        help="estimated similarity from which two articles are near-duplicates",
+    )
+    export: argparse.ArgumentParser = commands.add_parser(
+        "export",
+        parents=[common],
+        help="export the article database to Parquet or Arrow files",
+    )
+    export.add_argument("directory", nargs="?", default="export")
+    export.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    export.add_argument(
+        "--partition-by",
+        default="language",
+        help="column the files are partitioned by, empty for none",
+    )
+    export.add_argument(
+        "--html-cache",
+        metavar="CACHE_DIRECTORY",
+        help="copy the pages out of this response cache next to the export",
+    )
+    return parser
+
+
+def _pipeline(arguments: argparse.Namespace, layout: SiteLayout) -> Pipeline:
+    """Build a pipeline from the command line, with its metrics exported.
+
+    Returns:
+        Pipeline: Pipeline of the chosen layout.
+
+    """
+    metrics: Metrics = get_metrics()
+    metrics.profile(*arguments.profile)
+    if arguments.metrics_file:
+        metrics.write_every(arguments.metrics_file)
+    if arguments.metrics_port:
+        metrics.serve(arguments.metrics_port)
+    return Pipeline(
+        layout,
+        db_name=arguments.db,
+        retry_queue_name=arguments.retry_queue,
+        cache_directory=arguments.cache_directory or None,
+        fetch_workers=arguments.fetch_workers,
+        parse_workers=arguments.parse_workers,
+        queue_size=arguments.queue_size,
+        language_batch=arguments.language_batch,
+        fallback_concurrency=arguments.fallback_concurrency,
+        raw=arguments.raw,
+        dedup=arguments.dedup,
+        async_fetch=arguments.async_fetch,
+        streaming=arguments.streaming,
+    )
+
+
+def _query(arguments: argparse.Namespace, store: ArticleDatabase) -> list[Article]:
+    """Run the query asked for on the command line.
+
+    Returns:
+        list[Article]: Matching articles.
+
+    """
+    if arguments.url:
+        article: Article | None = store.get(arguments.url)
+        return [article] if article else []
+    if arguments.author:
+        return store.by_author(arguments.author)
+    if arguments.language:
+        return store.by_language(arguments.language)
+    if arguments.tag:
+        return store.by_tag(arguments.tag)
+    return store.search(arguments.search, limit=arguments.limit)
+
+
+def _store(arguments: argparse.Namespace, layout: SiteLayout) -> int:
+    """Print matching articles as JSON Lines, or count the stored ones.
+
+    Returns:
+        int: Exit status.
+
+    """
+    store: ArticleDatabase = ArticleDatabase(arguments.db or layout.db_name)
+    if arguments.compress:
+        try:
+            print(f"Compressed {store.compress()} articles.")
+        except ValueError as e:
+            print(e)
+            return 1
+    if not any(
+        (arguments.url, arguments.author, arguments.language, arguments.tag)
+    ) and not arguments.search:
+        print(f"{len(store)} articles stored.")
+        return 0
+    for article in _query(arguments, store)[: arguments.limit]:
+        sys.stdout.buffer.write(orjson.dumps(article) + b"\n")
+    sys.stdout.flush()
+    return 0
+
+
+def _queue(arguments: argparse.Namespace, layout: SiteLayout) -> None:
+    """Report on the retry queue, requeueing dead urls if asked to."""
+    retry_queue: RetryQueue = RetryQueue(
+        arguments.retry_queue or layout.retry_queue_name
+    )
+    if arguments.requeue:
+        requeued: int = retry_queue.requeue_dead(
+            None if arguments.requeue == "all" else FailureKind(arguments.requeue)
+        )
+        print(f"Requeued {requeued} urls.")
+    if arguments.dead:
+        for url, failure, attempts, error in retry_queue.dead_letters():
+            print(f"{url}\t{failure}\t{attempts}\t{error}")
+    print(retry_queue.report())
+    retry_queue.close()
+
+
+def _dedup(arguments: argparse.Namespace, layout: SiteLayout) -> None:
+    """Merge the near-duplicates of the article database and of others into it."""
+    Deduplicator(
+        ArticleDatabase(arguments.db or layout.db_name),
+        [ArticleDatabase(source) for source in arguments.merge_from],
+        index=NearDuplicateIndex(threshold=arguments.threshold),
+    ).run()
+
+
+def _export(arguments: argparse.Namespace, layout: SiteLayout) -> int:
+    """Export the article database, if pyarrow is installed.
+
+    Returns:
+        int: Exit status.
+
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        print("Exporting needs pyarrow, install it with the export extra.")
+        return 1
+    from export import CorpusExporter  # noqa: PLC0415
+
+    CorpusExporter(
+        ArticleDatabase(arguments.db or layout.db_name),
+        arguments.directory,
+        export_format=arguments.format,
+        partition_by=arguments.partition_by or None,
+        cache=ResponseCache(arguments.html_cache) if arguments.html_cache else None,
+    ).export()
+    return 0
+
+
+def _run(arguments: argparse.Namespace, layout: SiteLayout) -> None:
+    """Run the pipeline stages of a command, then export its metrics."""
+    pipeline: Pipeline = _pipeline(arguments, layout)
+    match arguments.command:
+        case "discover":
+            pipeline.run(arguments.method, fetch=False, parse=False)
+        case "fetch":
+            pipeline.run(parse=False)
+        case "parse":
+            pipeline.run(fetch=False)
+        case "run":
+            pipeline.run(arguments.method)
+        case "work":
+            pipeline.run(worker=arguments.worker_id or True, lease=arguments.lease)
+    if arguments.metrics_file:
+        get_metrics().write(arguments.metrics_file)
+    for profile in get_metrics().dump_profiles(arguments.profile_directory):
+        print(f"Wrote {profile}")
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run a command.
+
+    Returns:
+        int: Exit status.
+
+    """
+    arguments: argparse.Namespace = build_parser().parse_args(argv)
+    layout: SiteLayout = get_layout(arguments.layout)
+    match arguments.command:
+        case "store":
+            return _store(arguments, layout)
+        case "queue":
+            _queue(arguments, layout)
+        case "dedup":
+            _dedup(arguments, layout)
+        case "export":
+            return _export(arguments, layout)
+        case _:
+            _run(arguments, layout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
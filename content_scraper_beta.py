@@ -1,122 +1,159 @@
 """URL scraper."""
 
-import time
+import argparse
+from collections.abc import Iterator
+from functools import cached_property
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import orjson
 import requests
-import requests.exceptions
 from bs4 import BeautifulSoup as bs
 from bs4.element import NavigableString, Tag
-from langdetect import detect
+
+from article_store import FsyncPolicy
+from layouts import BETA_SITE, parse_page
+from pipeline import Pipeline
+from response_cache import header_charset
+from transport import Transport
+from url_index import UrlIndex
+
+if TYPE_CHECKING:
+    from async_fetcher import FetchResult
 
 
 class PageSnapShot:
-    """InternetArchive Page snapshot."""
+    """InternetArchive Page snapshot.
+
+    The articles the url files name are scraped by the pipeline of the
+    beta site layout, which caches, retries, stores and resumes the way
+    the command line does.
+    """
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         url_directory: str = "",
-        json_db_name: str = "backup_beta.json",
+        db_name: str = "backup_beta.sqlite3",
+        legacy_json_db_name: str = "backup_beta.json",
+        *,
+        fsync: FsyncPolicy | str = FsyncPolicy.ALWAYS,
+        async_fetch: bool = False,
+        concurrency: int = 4,
+        cache_directory: str | None = "cache",
+        offline: bool = False,
+        parse_workers: int = 0,
+        streaming: bool = False,
+        image_directory: str | None = None,
+        incremental: bool = False,
+        transport: Transport | None = None,
+        retry_queue_name: str = "retry_queue_beta.sqlite3",
     ) -> None:
-        """Initialize bodhi snapshot."""
-        self.headers: dict[str, str] = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:130.0) Gecko/20100101 Firefox/130.0"
-        }
+        """Initialize bodhi snapshot.
+
+        Nothing is opened or read until it is first needed; ``run`` starts
+        the scraping. Pages are fetched one at a time, or ``concurrency``
+        at a time with ``async_fetch``.
+        """
         self.url_files_directory: Path = Path(url_directory)
         self.output_format: str = "json"
-        self.article_urls: list[str] = []
-        self.json_db_name: Path = Path(json_db_name)
-        if not self.json_db_name.exists():
-            self.json_db_name.touch()
-        self.json_db: list[dict[str, str | list[str]]] = self.__load_json_db()
-        self.article_urls_in_db: set[str] = {
-            article["url"]
-            for article in self.json_db
-            if isinstance(article["url"], str)
-        }
-        self.__load_all_article_urls()
-        self.__scrape_all_urls()
-
-    def __load_json_db(self) -> list[dict[str, str | list[str]]]:
-        """Load json db.
+        self.async_fetch: bool = async_fetch
+        self.concurrency: int = concurrency
+        self.cache_directory: str | None = cache_directory
+        self.offline: bool = offline
+        self.parse_workers: int = parse_workers
+        self.streaming: bool = streaming
+        self.image_directory: str | None = image_directory
+        self.incremental: bool = incremental
+        self.retry_queue_name: str = retry_queue_name
+        self.db_name: Path = Path(db_name)
+        self.legacy_json_db_name: str = legacy_json_db_name
+        self.fsync: FsyncPolicy | str = fsync
+        self.transport: Transport | None = transport
+
+    @cached_property
+    def pipeline(self) -> Pipeline:
+        """Pipeline of the site layout, storing into this scraper's files."""
+        return Pipeline(
+            BETA_SITE,
+            db_name=str(self.db_name),
+            retry_queue_name=self.retry_queue_name,
+            cache_directory=self.cache_directory,
+            fetch_workers=self.concurrency if self.async_fetch else 1,
+            parse_workers=self.parse_workers,
+            async_fetch=self.async_fetch,
+            streaming=self.streaming,
+            fsync=self.fsync,
+            transport=self.transport,
+        )
 
-        Returns:
-            dict[str, dict[str, str]]: Json db.
+    def run(self) -> None:
+        """Scrape every url not scraped yet."""
+        self.__migrate_legacy_stores()
+        if self.incremental:
+            self.pipeline.plan_recrawl()
+        self.pipeline.retry_queue.add(
+            article
+            for article in self.__iter_article_urls()
+            if article not in self.pipeline.resume_index
+        )
+        self.pipeline.run(fetch=not self.offline)
+        if self.image_directory is not None:
+            self.pipeline.download_images(self.image_directory)
+
+    def __migrate_legacy_stores(self) -> None:
+        """Move the articles of the older JSON stores into the database."""
+        for legacy_db_name in (
+            self.legacy_json_db_name,
+            self.db_name.with_suffix(".jsonl"),
+        ):
+            migrated: int = self.pipeline.store.migrate_from(legacy_db_name)
+            if migrated:
+                print(f"Migrated {migrated} articles from {legacy_db_name}.")
+
+    def __iter_article_urls(self) -> Iterator[str]:
+        """Read urls from the url files, one line at a time.
+
+        The files overlap, and name articles by different captures, so only
+        the first url of every article is yielded.
+
+        Yields:
+            str: Article url.
 
         """
-        try:
-            with self.json_db_name.open("rb+") as json_file:
-                return orjson.loads(json_file.read())
-        except orjson.JSONDecodeError:
-            return []
-
-    def __load_all_article_urls(self) -> None:
-        """Load urls."""
-        for file_ in self.url_files_directory.iterdir():
+        url_index: UrlIndex = UrlIndex()
+        for file_ in sorted(self.url_files_directory.iterdir()):
             if (
                 file_.is_file()
+                and "_urls.txt" in file_.name
                 and "beta" in file_.name
             ):
-                article_urls: list[str] = file_.read_text().strip().split("\n")
+                with file_.open(encoding="utf-8") as url_file:
+                    yield from url_index.unique(line.strip() for line in url_file)
+        if url_index.duplicates:
+            print(f"Skipped {url_index.duplicates} duplicate article urls.")
 
-                self.article_urls.extend(article_urls)
+    def fire_request(self, article_url: str) -> None:
+        """Fire request, answering from the response cache when possible.
 
-    def __scrape_all_urls(self) -> None:
-        """Scrape all urls."""
-        articles_to_be_scraped: set[str] = {
-            article
-            for article in self.article_urls
-            if article not in self.article_urls_in_db
-        }
-        total_articles: int = len(articles_to_be_scraped)
-        for index, article_url in enumerate(articles_to_be_scraped, start=1):
-            try:
-                self.fire_request(article_url=article_url)
-                self.make_soup()
-                if index % 4 == 0:
-                    time.sleep(60)
-                article: dict[str, str | list[str]] = self.fetch_content(
-                    article_url=article_url
-                )
-                print(article)
-                if article:
-                    self.json_db.append(article)
-                #self.__write_json_db_to_disk()
-                print(
-                    f"Finished writing {index} articles out of {total_articles} articles."
-                )
-            except requests.HTTPError as e:
-                self.__write_json_db_to_disk()
-                print(f"An error occurred: {e}. Restart application.")
-                print(f"url: {article_url}")
-            except requests.exceptions.RequestException as e:
-                self.__write_json_db_to_disk()
-                print(f"An error occurred: {e}. Restart application.")
-                print(f"url: {article_url}")
-            except TypeError as e:
-                self.__write_json_db_to_disk()
-                print(f"An error occurred: {e}. Restart application.")
-                print(f"url: {article_url}")
-            time.sleep(30)
-        self.__write_json_db_to_disk()
-
-    def __write_json_db_to_disk(self) -> None:
-        """Write json db to disk."""
-        with self.json_db_name.open("wb+") as json_file:
-            json_file.write(orjson.dumps(self.json_db))
+        Raises:
+            requests.RequestException: If the page could not be fetched.
 
-    def fire_request(self, article_url: str) -> None:
-        """Fire request."""
-        self.request: str = requests.get(
-            article_url,
-            headers=self.headers,
-            timeout=10,
-        ).text
+        """
+        result: FetchResult = self.pipeline.fetch(article_url)[0]
+        if result.error is not None:
+            raise result.error
+        if result.status >= 400:  # noqa: PLR2004
+            response: requests.Response = requests.Response()
+            response.status_code = result.status
+            response.url = article_url
+            response.raise_for_status()
+        self.request: str = result.content.decode(
+            header_charset(result.headers) or "utf-8", errors="replace"
+        )
 
     def make_soup(self) -> None:
         """Make soup."""
         self.soup: bs = bs(self.request, "lxml")
+        self.soup_content = self.soup.find("span", {"class": "field-content"})
 
     def get_page_title(self) -> str:
         """Get page title.
@@ -240,6 +277,10 @@ class PageSnapShot:
     def fetch_content(self, article_url: str) -> dict[str, str | list[str]]:
         """Fetch article content.
 
+        Every field is read in a single pass over the page, using the
+        compiled extraction spec of the site layout. In streaming mode the
+        page is parsed chunk by chunk, keeping only the regions read from.
+
         Parameters
         ----------
         article_url : str
@@ -248,29 +289,28 @@ class PageSnapShot:
         Returns
         -------
         dict[str, str | list[str]]:
-            Article content.
+            Article content, empty if the page holds no article.
 
         """
-        title: str = self.get_page_title()
-        lang: str = str(detect(title)) if title else ""
-        self.soup_content=self.soup.find('span', {'class': 'field-content'})
-        try:
-            return {
-                "url": article_url,
-                "title": title,
-                "published_date": self.get_published_date(),
-                "authors": self.get_page_authors(),
-                "language": lang,
-                "tags": self.get_page_tags(),
-                "images": self.get_page_images(),
-                "categories": self.get_page_tags(),
-                "article_content": self.get_article_body(), # always fetch article content last as this function remove details such as author names, published date, categories etc.
-            }
-        except TypeError as e:
-            print(article_url)
-            print(e)
-        return {}
+        return parse_page(
+            BETA_SITE.name, article_url, self.request, streaming=self.streaming
+        )
 
 
 if __name__ == "__main__":
-    bodhi_snapshot = PageSnapShot(url_directory="urls/")
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Scrape the beta site articles the url files name."
+    )
+    parser.add_argument(
+        "--async-fetch",
+        action="store_true",
+        help="fetch --concurrency pages at a time on coroutines",
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    arguments: argparse.Namespace = parser.parse_args()
+    bodhi_snapshot = PageSnapShot(
+        url_directory="urls/",
+        async_fetch=arguments.async_fetch,
+        concurrency=arguments.concurrency,
+    )
+    bodhi_snapshot.run()
@@ -1,43 +1,35 @@
-import requests
-import time
-import json
 import os
 from bs4 import BeautifulSoup
 from langdetect import detect
 
-def download_and_process_image(image_url):
-    url = "https://web.archive.org" +image_url
-    base_dir='images'
-    os.makedirs(base_dir, exist_ok=True)
-
-    save_path=os.path.join(base_dir,url.split('/')[-1])
-    try:
-        # Send a GET request to the image URL
-        response = requests.get(url)
-        response.raise_for_status()  # Check if the request was successful
-
-        # Open a file in binary write mode and save the image
-        with open(save_path, 'wb') as file:
-            file.write(response.content)
-
-        print(f"Image successfully downloaded and saved to {save_path}")
-    except requests.RequestException as e:
-        print(f"An error occurred: {e}")
-
+from article_store import ArticleStore
+from image_downloader import ImageDownloader
+from response_cache import ResponseCache
+from retry_queue import RetryQueue, classify
+from transport import get_transport
+from url_index import UrlIndex
 
 class WebScraper:
-    def __init__(self, url):
+    def __init__(self, url, cache=None):
         self.url = url
+        self.cache = cache
         self.soup = None
+        self.error = None
 
     # Method to fetch the webpage
     def fetch_page(self):
         try:
-            response = requests.get(self.url)
+            response = get_transport().get(self.url)
             if response.status_code == 200:
                 print("Page fetched successfully.")
+                # keep the raw html in the cache instead of in every record
+                if self.cache is not None:
+                    self.cache.put(self.url, response.status_code, dict(response.headers), response.content)
                 self.soup = BeautifulSoup(response.content, 'html.parser')
-        except:
+            else:
+                response.raise_for_status()
+        except Exception as e:
+            self.error = e
             print("Fetching failed")
     
     # Method to extract the page title
@@ -112,7 +104,6 @@ class WebScraper:
                     "images":self.get_page_images(),
                     "categories": None,
                     "article_content":self.get_article_content(),
-                    "full_html":str(self.soup)
                     }
             return content
         except Exception as e:
@@ -131,37 +122,43 @@ if __name__ == "__main__":
         url_list.extend(data.strip().split("\n"))
         
     i=0
-    full_content=[]
+    cache=ResponseCache()
+    # records are appended as they are scraped instead of held until the end
+    store=ArticleStore('bodhi_data.jsonl')
     image_dict={}
     image_list=[]
-    failed_urls=[]
-    for url in list(set(url_list)):
-        time.sleep(30) 
+    # failures are kept in the queue and retried on later runs
+    retry_queue=RetryQueue('bodhi_retry_queue.sqlite3')
+    # one url per article, whichever capture or listing page named it
+    retry_queue.add(UrlIndex().unique(url_list))
+    for url in retry_queue.due():
         # Create an instance of WebScraper
-        scraper = WebScraper(url)
+        scraper = WebScraper(url, cache=cache)
 
         # Fetch page, and print the content
         scraper.fetch_page()  # Fetch the HTML content
         content=scraper.fetch_content()  # fetch title and content and other details
         if content ==None or content["title"]==None:
-            failed_urls.append(url)
+            retry_queue.fail(url, classify(scraper.error), str(scraper.error or "No title found."))
         else:
-            full_content.append(content)
+            store.append(content)
+            retry_queue.complete(url)
             if content['images'] is not None:
                 image_list.extend(content['images'])
             print(content['title'])
         i+=1
-    json.dumps(full_content)
+    store.close()
 
-    # Store JSON to a file
-    with open('bodhi_data.json', 'w', encoding='utf-8') as file:
-        json.dump(full_content, file, ensure_ascii=False, indent=4)  
+    print("JSON data has been stored in bodhi_data.jsonl")
+    print(retry_queue.report())
 
-    print("JSON data has been stored in bodhi_data.json")
 
+    # images are fetched concurrently and stored once per distinct content
+    image_downloader=ImageDownloader('images')
+    image_downloader.download_all(image_list)
+    print(image_downloader.report())
 
-    for image_url in list(set(image_list)):
-        download_and_process_image(image_url)
+    print(get_transport().report())
 
 
 
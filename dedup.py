@@ -0,0 +1,350 @@
+"""Near-duplicate articles, found by MinHash and locality sensitive hashing."""
+
+import operator
+import zlib
+from array import array
+from collections.abc import Iterable
+from itertools import starmap
+
+from article_db import ArticleDatabase
+from article_store import Article
+from metrics import get_metrics
+
+_MASK: int = (1 << 64) - 1
+_EMPTY: int = _MASK
+# Odd constant mixed into borrowed bins, one multiple per distance.
+_GOLDEN: int = 0x9E3779B97F4A7C15
+_LIST_FIELDS: tuple[str, ...] = ("tags", "categories", "images")
+
+type Signature = array[int]
+
+
+def shingle_hashes(text: str, size: int = 5) -> set[int]:
+    """Hash the word shingles of a text.
+
+    Words are case folded and hashed with CRC-32, and each run of ``size``
+    words is hashed as a tuple of those, which keeps the hashes the same
+    in every process.
+
+    Returns:
+        set[int]: 64 bit shingle hashes, empty if the text has no words.
+
+    """
+    words: list[int] = [zlib.crc32(word.encode()) for word in text.casefold().split()]
+    if len(words) < size:
+        return {hash(tuple(words)) & _MASK} if words else set()
+    return {
+        hash(shingle) & _MASK
+        for shingle in zip(*(words[start:] for start in range(size)), strict=False)
+    }
+
+
+def minhash(hashes: Iterable[int], num_perm: int = 128) -> Signature | None:
+    """Build a one permutation MinHash signature.
+
+    Rather than hashing every shingle ``num_perm`` times, each hash picks
+    a bin and only the smallest hash of a bin is kept. Empty bins borrow
+    the nearest filled bin to their right, mixed with their distance to
+    it, so two texts agree on a bin about as often as their shingle sets
+    overlap.
+
+    Returns:
+        Signature | None: Signature, None if there are no shingles.
+
+    """
+    bins: list[int] = [_EMPTY] * num_perm
+    for value in hashes:
+        index: int = value % num_perm
+        bins[index] = min(bins[index], value // num_perm)
+    if all(value == _EMPTY for value in bins):
+        return None
+    signature: list[int] = bins.copy()
+    for index, value in enumerate(bins):
+        if value == _EMPTY:
+            distance: int = next(
+                distance
+                for distance in range(1, num_perm)
+                if bins[(index + distance) % num_perm] != _EMPTY
+            )
+            signature[index] = bins[(index + distance) % num_perm] ^ (
+                distance * _GOLDEN & _MASK
+            )
+    return array("Q", signature)
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures.
+
+    Returns:
+        float: Share of the bins the signatures agree on.
+
+    """
+    return sum(starmap(operator.eq, zip(first, second, strict=True))) / len(first)
+
+
+def lsh_rows(threshold: float, num_perm: int) -> int:
+    """Pick how many signature rows an LSH band holds.
+
+    Signatures agreeing on a whole band become candidates. The most rows
+    are picked whose steepest point, ``(1 / bands) ** (1 / rows)``, is
+    still below the threshold, so pairs above it are nearly always
+    compared and few pairs below it are.
+
+    Returns:
+        int: Rows per band, a divisor of ``num_perm``.
+
+    """
+    return max(
+        (
+            rows
+            for rows in range(1, num_perm + 1)
+            if num_perm % rows == 0 and (rows / num_perm) ** (1 / rows) <= threshold
+        ),
+        default=1,
+    )
+
+
+def _texts(value: str | list[str] | None) -> list[str]:
+    """Read a list field, which older records store as a single string."""
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def merge_articles(kept: Article, duplicate: Article) -> Article:
+    """Fold a near-duplicate into the article kept in its place.
+
+    Fields the kept article lacks are taken from the duplicate, tags,
+    categories and images are united, and the duplicate's url is added to
+    ``duplicate_urls``.
+
+    Returns:
+        Article: Merged article.
+
+    """
+    merged: Article = dict(kept)
+    for name, value in duplicate.items():
+        if name in _LIST_FIELDS:
+            merged[name] = list(
+                dict.fromkeys([*_texts(kept.get(name)), *_texts(value)])
+            )
+        elif name not in {"url", "duplicate_urls"} and not merged.get(name):
+            merged[name] = value
+    merged["duplicate_urls"] = [
+        url
+        for url in dict.fromkeys(
+            [
+                *_texts(kept.get("duplicate_urls")),
+                str(duplicate["url"]),
+                *_texts(duplicate.get("duplicate_urls")),
+            ]
+        )
+        if url != kept["url"]
+    ]
+    return merged
+
+
+class NearDuplicateIndex:
+    """Find articles whose content nearly duplicates one seen before.
+
+    Each text's MinHash signature is cut into bands and indexed by band,
+    so a lookup only compares the signatures sharing a band with it
+    instead of every indexed one. Candidates are kept if their estimated
+    similarity reaches ``threshold``.
+    """
+
+    def __init__(
+        self, *, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5
+    ) -> None:
+        """Initialize near-duplicate index.
+
+        Parameters
+        ----------
+        threshold : float
+            Estimated Jaccard similarity of the shingles from which two
+            texts are near-duplicates.
+        num_perm : int
+            Bins of a signature.
+        shingle_size : int
+            Words of a shingle.
+
+        """
+        if not 0 < threshold <= 1:
+            message: str = f"Threshold must be in (0, 1], got {threshold}."
+            raise ValueError(message)
+        self.threshold: float = threshold
+        self.num_perm: int = max(1, num_perm)
+        self.shingle_size: int = max(1, shingle_size)
+        self.rows: int = lsh_rows(threshold, self.num_perm)
+        self._bands: list[dict[bytes, list[str]]] = [
+            {} for _ in range(self.num_perm // self.rows)
+        ]
+        self._signatures: dict[str, Signature] = {}
+
+    def __len__(self) -> int:
+        """Count indexed texts."""
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        """Check whether a key is indexed."""
+        return key in self._signatures
+
+    def signature(self, text: str) -> Signature | None:
+        """Fingerprint a text.
+
+        Returns:
+            Signature | None: MinHash signature, None for an empty text.
+
+        """
+        return minhash(shingle_hashes(text, self.shingle_size), self.num_perm)
+
+    def __band_keys(self, signature: Signature) -> list[bytes]:
+        """Cut a signature into the keys of its bands."""
+        return [
+            signature[start : start + self.rows].tobytes()
+            for start in range(0, len(self._bands) * self.rows, self.rows)
+        ]
+
+    def query(self, signature: Signature, exclude: str = "") -> str | None:
+        """Find the indexed text most similar to a signature.
+
+        Returns:
+            str | None: Key of the most similar text at or above the
+            threshold, None if there is none.
+
+        """
+        candidates: set[str] = set()
+        for band, band_key in zip(
+            self._bands, self.__band_keys(signature), strict=True
+        ):
+            candidates.update(band.get(band_key, ()))
+        candidates.discard(exclude)
+        best: tuple[float, str] | None = max(
+            (
+                (similarity(signature, self._signatures[candidate]), candidate)
+                for candidate in candidates
+            ),
+            default=None,
+        )
+        return best[1] if best is not None and best[0] >= self.threshold else None
+
+    def insert(self, key: str, signature: Signature) -> None:
+        """Index a signature under a key, unless the key is indexed."""
+        if key in self._signatures:
+            return
+        self._signatures[key] = signature
+        for band, band_key in zip(
+            self._bands, self.__band_keys(signature), strict=True
+        ):
+            band.setdefault(band_key, []).append(key)
+
+    def add(self, key: str, text: str) -> str | None:
+        """Index a text unless it nearly duplicates an indexed one.
+
+        Returns:
+            str | None: Key of the text it duplicates, None if it was
+            indexed as a new text or is empty.
+
+        """
+        with get_metrics().stage("dedup"):
+            signature: Signature | None = self.signature(text)
+            if signature is None:
+                return None
+            duplicate: str | None = self.query(signature, exclude=key)
+            if duplicate is None:
+                self.insert(key, signature)
+        if duplicate is not None:
+            get_metrics().inc("near_duplicates_total")
+        return duplicate
+
+
+class Deduplicator:
+    """Merge the near-duplicate articles of an article database.
+
+    The stored articles are indexed in storage order and every article
+    nearly duplicating an earlier one is merged into it and removed, its
+    url kept among the store's merged urls. Articles of ``sources``, such
+    as the beta site's database, are then merged into their
+    near-duplicates in the store, or added to it if they have none, which
+    leaves one database without near-duplicates to export.
+    """
+
+    def __init__(
+        self,
+        store: ArticleDatabase,
+        sources: Iterable[ArticleDatabase] = (),
+        *,
+        index: NearDuplicateIndex | None = None,
+    ) -> None:
+        """Initialize deduplicator.
+
+        Parameters
+        ----------
+        store : ArticleDatabase
+            Database deduplicated and merged into.
+        sources : Iterable[ArticleDatabase]
+            Databases whose articles are merged into ``store``.
+        index : NearDuplicateIndex | None
+            Index of the articles, a new one with default settings by
+            default.
+
+        """
+        self.store: ArticleDatabase = store
+        self.sources: list[ArticleDatabase] = list(sources)
+        self.index: NearDuplicateIndex = index or NearDuplicateIndex()
+        self.merged: int = 0
+        self.added: int = 0
+
+    def run(self) -> int:
+        """Merge every near-duplicate.
+
+        Returns:
+            int: Number of articles merged into another.
+
+        """
+        duplicates: list[tuple[str, str]] = []
+        for article in self.store:
+            url: str = str(article["url"])
+            kept: str | None = self.index.add(
+                url, str(article.get("article_content") or "")
+            )
+            if kept is not None:
+                duplicates.append((kept, url))
+        for kept, url in duplicates:
+            duplicate: Article | None = self.store.get(url)
+            if duplicate is not None:
+                self.__merge(kept, duplicate)
+                self.store.remove(url)
+        for source in self.sources:
+            for article in source:
+                url = str(article["url"])
+                kept = self.index.add(url, str(article.get("article_content") or ""))
+                if kept is None:
+                    self.store.append(article)
+                    self.added += 1
+                else:
+                    self.__merge(kept, article)
+        self.store.close()
+        print(self.report())
+        return self.merged
+
+    def __merge(self, kept_url: str, duplicate: Article) -> None:
+        """Merge an article into the stored article it duplicates."""
+        kept: Article | None = self.store.get(kept_url)
+        if kept is None:
+            return
+        self.store.add_merged(str(duplicate["url"]), kept_url)
+        self.store.append(merge_articles(kept, duplicate))
+        self.merged += 1
+
+    def report(self) -> str:
+        """Summarize the merge.
+
+        Returns:
+            str: Articles merged and added.
+
+        """
+        return (
+            f"Merged {self.merged} near-duplicate articles, added {self.added}; "
+            f"{len(self.store)} articles stored."
+        )
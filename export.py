@@ -0,0 +1,349 @@
+"""Columnar export of the article database, with pages kept as blobs."""
+
+import gzip
+import hashlib
+import itertools
+import shutil
+from collections.abc import Iterator
+from datetime import date
+from enum import StrEnum
+from pathlib import Path
+from typing import BinaryIO
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from article_db import ArticleDatabase, parse_published_date
+from article_store import Article
+from metrics import get_metrics
+from response_cache import CachedResponse, ResponseCache
+
+DICTIONARY: pa.DataType = pa.dictionary(pa.int32(), pa.string())
+SCHEMA: pa.Schema = pa.schema(
+    [
+        ("url", pa.string()),
+        ("title", pa.string()),
+        ("published_date", pa.string()),
+        ("published_on", pa.date32()),
+        ("authors", DICTIONARY),
+        ("language", DICTIONARY),
+        ("tags", pa.list_(DICTIONARY)),
+        ("categories", pa.list_(pa.string())),
+        ("images", pa.list_(pa.string())),
+        ("duplicate_urls", pa.list_(pa.string())),
+        ("article_content", pa.large_string()),
+        ("snapshot_timestamp", pa.string()),
+        ("etag", pa.string()),
+        ("last_modified", pa.string()),
+        ("html_file", pa.string()),
+        ("html_offset", pa.int64()),
+        ("html_length", pa.int64()),
+    ]
+)
+_DICTIONARY_FIELDS: tuple[str, ...] = ("authors", "language", "tags")
+
+
+class ExportFormat(StrEnum):
+    """File format of an export."""
+
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+def _text(value: str | list[str] | None) -> str | None:
+    """Read a text field, None if it is missing or a list."""
+    return value if isinstance(value, str) else None
+
+
+def _label(value: str | list[str] | None) -> str | None:
+    """Read a dictionary encoded field, joining a list of values."""
+    if isinstance(value, list):
+        return ", ".join(map(str, value)) or None
+    return value
+
+
+def _texts(value: str | list[str] | None) -> list[str]:
+    """Read a list field, which older records store as a single string."""
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def read_html(directory: str | Path, html_file: str, offset: int, length: int) -> bytes:
+    """Read back a page stored next to an export.
+
+    Returns:
+        bytes: Raw page.
+
+    """
+    with (Path(directory) / "html" / html_file).open("rb") as blobs:
+        blobs.seek(offset)
+        return gzip.decompress(blobs.read(length))
+
+
+class CorpusExporter:
+    """Stream the article database into Parquet or Arrow IPC files.
+
+    Articles are read from the database in batches and written under
+    ``articles`` as a dataset partitioned by ``partition_by``, Hive style,
+    so a reader only loads the columns and partitions it asks for. ``authors``,
+    ``language`` and ``tags`` are dictionary encoded against dictionaries
+    collected up front from the same snapshot of the database the rows
+    are read from, which keeps a single dictionary per field as Arrow IPC
+    files require. The raw pages, when a response cache is given, are not
+    put in the table: each distinct page is appended as a gzip member to
+    rolling ``html/pages-NNNNN.bin`` files and rows point at it by file,
+    offset and length.
+
+    The export is written next to ``directory`` and moved in place once
+    complete, replacing any earlier export.
+    """
+
+    def __init__(
+        self,
+        store: ArticleDatabase,
+        directory: str | Path = "export",
+        *,
+        export_format: ExportFormat | str = ExportFormat.PARQUET,
+        partition_by: str | None = "language",
+        cache: ResponseCache | None = None,
+        batch_size: int = 1024,
+        rows_per_file: int = 100_000,
+        max_blob_bytes: int = 1 << 30,
+    ) -> None:
+        """Initialize corpus exporter.
+
+        Parameters
+        ----------
+        store : ArticleDatabase
+            Articles to export.
+        directory : str | Path
+            Directory the dataset is written to.
+        export_format : ExportFormat | str
+            ``parquet`` or ``arrow`` IPC files.
+        partition_by : str | None
+            Column the files are partitioned by, None for no partitions.
+        cache : ResponseCache | None
+            Response cache the pages are copied from, None to leave them out.
+        batch_size : int
+            Articles read and converted at once.
+        rows_per_file : int
+            Rows written to a file before starting the next one.
+        max_blob_bytes : int
+            Bytes written to a page file before starting the next one.
+
+        """
+        self.store: ArticleDatabase = store
+        self.directory: Path = Path(directory)
+        self.export_format: ExportFormat = ExportFormat(export_format)
+        if partition_by is not None and partition_by not in SCHEMA.names:
+            message: str = f"Cannot partition by {partition_by}, it is not a column."
+            raise ValueError(message)
+        self.partition_by: str | None = partition_by
+        self.cache: ResponseCache | None = cache
+        self.batch_size: int = max(1, batch_size)
+        self.rows_per_file: int = max(1, rows_per_file)
+        self.max_blob_bytes: int = max_blob_bytes
+        self.exported: int = 0
+        self._dictionaries: dict[str, pa.Array] = {}
+        self._indices: dict[str, dict[str, int]] = {}
+        self._blobs: dict[str, tuple[str, int, int]] = {}
+        self._blob_file: BinaryIO | None = None
+        self._blob_files: int = 0
+
+    @property
+    def partial(self) -> Path:
+        """Directory the export is written to until it is complete."""
+        return self.directory.with_name(f"{self.directory.name}.partial")
+
+    def export(self) -> int:
+        """Write every stored article.
+
+        Returns:
+            int: Number of articles exported.
+
+        """
+        shutil.rmtree(self.partial, ignore_errors=True)
+        self.partial.mkdir(parents=True)
+        self.exported = 0
+        with self.store.snapshot():
+            self.__collect_dictionaries()
+            try:
+                ds.write_dataset(
+                    pa.RecordBatchReader.from_batches(SCHEMA, self.__batches()),
+                    self.partial / "articles",
+                    format="ipc"
+                    if self.export_format == ExportFormat.ARROW
+                    else "parquet",
+                    partitioning=[self.partition_by] if self.partition_by else None,
+                    partitioning_flavor="hive",
+                    basename_template=f"part-{{i}}.{self.export_format}",
+                    max_rows_per_file=self.rows_per_file,
+                    max_rows_per_group=min(self.rows_per_file, 1 << 16),
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+            finally:
+                if self._blob_file is not None:
+                    self._blob_file.close()
+                    self._blob_file = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.partial.replace(self.directory)
+        print(f"Exported {self.exported} articles to {self.directory}.")
+        return self.exported
+
+    def __collect_dictionaries(self) -> None:
+        """Collect the dictionary encoded values of every stored article."""
+        values: dict[str, set[str]] = {field: set() for field in _DICTIONARY_FIELDS}
+        for article in self.store:
+            for field in ("authors", "language"):
+                label: str | None = _label(article.get(field))
+                if label is not None:
+                    values[field].add(label)
+            values["tags"].update(_texts(article.get("tags")))
+        for field, labels in values.items():
+            ordered: list[str] = sorted(labels)
+            self._dictionaries[field] = pa.array(ordered, pa.string())
+            self._indices[field] = {value: index for index, value in enumerate(ordered)}
+
+    def __batches(self) -> Iterator[pa.RecordBatch]:
+        """Convert the stored articles batch by batch.
+
+        Yields:
+            pa.RecordBatch: Batch of articles.
+
+        """
+        for articles in itertools.batched(self.store, self.batch_size):
+            with get_metrics().stage("export"):
+                batch: pa.RecordBatch = self.__batch(articles)
+            self.exported += batch.num_rows
+            yield batch
+
+    def __batch(self, articles: tuple[Article, ...]) -> pa.RecordBatch:
+        """Convert articles into a record batch.
+
+        Returns:
+            pa.RecordBatch: Articles, one row each.
+
+        """
+        published_on: list[date | None] = [
+            date.fromisoformat(iso)
+            if (iso := parse_published_date(_text(article.get("published_date")) or ""))
+            else None
+            for article in articles
+        ]
+        pages: list[tuple[str, int, int] | None] = [
+            self.__store_page(str(article["url"])) for article in articles
+        ]
+        tags: list[list[str]] = [_texts(article.get("tags")) for article in articles]
+        offsets: list[int] = list(itertools.accumulate(map(len, tags), initial=0))
+        columns: dict[str, pa.Array] = {
+            "published_on": pa.array(published_on, pa.date32()),
+            "authors": self.__encode(
+                "authors", [_label(article.get("authors")) for article in articles]
+            ),
+            "language": self.__encode(
+                "language", [_label(article.get("language")) for article in articles]
+            ),
+            "tags": pa.ListArray.from_arrays(
+                pa.array(offsets, pa.int32()),
+                self.__encode("tags", list(itertools.chain.from_iterable(tags))),
+            ),
+            "categories": pa.array(
+                [_texts(article.get("categories")) for article in articles],
+                pa.list_(pa.string()),
+            ),
+            "images": pa.array(
+                [_texts(article.get("images")) for article in articles],
+                pa.list_(pa.string()),
+            ),
+            "duplicate_urls": pa.array(
+                [_texts(article.get("duplicate_urls")) for article in articles],
+                pa.list_(pa.string()),
+            ),
+            "article_content": pa.array(
+                [_text(article.get("article_content")) for article in articles],
+                pa.large_string(),
+            ),
+            "html_file": pa.array([page and page[0] for page in pages], pa.string()),
+            "html_offset": pa.array([page and page[1] for page in pages], pa.int64()),
+            "html_length": pa.array([page and page[2] for page in pages], pa.int64()),
+        }
+        return pa.RecordBatch.from_arrays(
+            [
+                columns[field.name]
+                if field.name in columns
+                else pa.array(
+                    [_text(article.get(field.name)) for article in articles],
+                    field.type,
+                )
+                for field in SCHEMA
+            ],
+            schema=SCHEMA,
+        )
+
+    def __encode(self, field: str, values: list[str | None]) -> pa.DictionaryArray:
+        """Encode values against the field's dictionary.
+
+        Returns:
+            pa.DictionaryArray: Encoded values, null where a value is missing.
+
+        Raises:
+            ValueError: If a value is not in the dictionary.
+
+        """
+        indices: dict[str, int] = self._indices[field]
+        try:
+            encoded: list[int | None] = [
+                None if value is None else indices[value] for value in values
+            ]
+        except KeyError as e:
+            message: str = f"{field} value {e} is missing from its dictionary."
+            raise ValueError(message) from e
+        return pa.DictionaryArray.from_arrays(
+            pa.array(encoded, pa.int32()), self._dictionaries[field]
+        )
+
+    def __store_page(self, url: str) -> tuple[str, int, int] | None:
+        """Copy an article's page from the cache into the page files.
+
+        Returns:
+            tuple[str, int, int] | None: File, offset and length of the
+            page, None if it is not cached.
+
+        """
+        if self.cache is None or url not in self.cache:
+            return None
+        cached: CachedResponse | None = self.cache.get(url)
+        if cached is None:
+            return None
+        digest: str = hashlib.sha256(cached.content).hexdigest()
+        if digest in self._blobs:
+            return self._blobs[digest]
+        blob: bytes = gzip.compress(cached.content)
+        blob_file: BinaryIO | None = self._blob_file
+        if blob_file is None or blob_file.tell() + len(blob) > self.max_blob_bytes:
+            blob_file = self.__next_blob_file()
+        location: tuple[str, int, int] = (
+            Path(blob_file.name).name,
+            blob_file.tell(),
+            len(blob),
+        )
+        blob_file.write(blob)
+        self._blobs[digest] = location
+        return location
+
+    def __next_blob_file(self) -> BinaryIO:
+        """Close the page file being written and open the next one.
+
+        Returns:
+            BinaryIO: Open page file.
+
+        """
+        if self._blob_file is not None:
+            self._blob_file.close()
+        (self.partial / "html").mkdir(exist_ok=True)
+        self._blob_file = (
+            self.partial / "html" / f"pages-{self._blob_files:05d}.bin"
+        ).open("wb")
+        self._blob_files += 1
+        return self._blob_file
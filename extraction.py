@@ -0,0 +1,356 @@
+"""Declarative, single-pass article extraction."""
+
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.html import HtmlElement
+
+type Extractor = Callable[[HtmlElement], Any]
+
+_UNRENDERED_TAGS: frozenset[str] = frozenset({"script", "style", "template"})
+
+
+def iter_strings(
+    element: HtmlElement, skip: frozenset[str] = _UNRENDERED_TAGS
+) -> Iterator[str]:
+    """Iterate over the text of a subtree the way ``Tag.get_text`` sees it.
+
+    Comments and the contents of ``skip`` tags are left out.
+
+    Yields:
+        str: Text fragment.
+
+    """
+    if isinstance(element.tag, str) and element.tag not in skip and element.text:
+        yield element.text
+    for child in element:
+        if not isinstance(child.tag, str) or child.tag not in skip:
+            yield from iter_strings(child, skip)
+        if child.tail:
+            yield child.tail
+
+
+def get_text(element: HtmlElement) -> str:
+    """Text of a subtree.
+
+    Returns:
+        str: Concatenated text.
+
+    """
+    return "".join(iter_strings(element))
+
+
+def get_stripped_text(element: HtmlElement) -> str:
+    """Text of a subtree with every fragment stripped, like ``strip=True``.
+
+    Returns:
+        str: Concatenated stripped text.
+
+    """
+    return "".join(
+        fragment.strip() for fragment in iter_strings(element) if fragment.strip()
+    )
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """How to extract one article field.
+
+    ``css_class`` follows BeautifulSoup's ``{"class": ...}`` matching: it
+    matches the whole class attribute or any single class in it. An
+    extractor returning None marks the field as missing.
+    """
+
+    name: str
+    tag: str
+    css_class: str | None = None
+    extract: Extractor = get_text
+    many: bool = False
+    required: bool = False
+    default: Any = ""
+
+    def matches(self, element: HtmlElement) -> bool:
+        """Check whether an element is the one this field is read from.
+
+        Returns:
+            bool: True on a match.
+
+        """
+        if self.css_class is None:
+            return True
+        classes: str = " ".join(element.get("class", "").split())
+        return self.css_class in {classes, *classes.split()}
+
+
+@dataclass
+class LayoutSpec:
+    """Extraction spec of one site layout, compiled once.
+
+    Fields are grouped by tag name so a document is walked once with
+    ``iter(*tags)``; every element visited is only checked against the
+    fields for its tag.
+    """
+
+    name: str
+    fields: tuple[FieldSpec, ...]
+    _by_tag: dict[str, list[FieldSpec]] = field(init=False, repr=False)
+    _tags: tuple[str, ...] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Compile the field specs."""
+        by_tag: defaultdict[str, list[FieldSpec]] = defaultdict(list)
+        for field_spec in self.fields:
+            by_tag[field_spec.tag].append(field_spec)
+        self._by_tag = dict(by_tag)
+        self._tags = tuple(self._by_tag)
+
+    def extract(self, html: str | bytes) -> dict[str, Any]:
+        """Extract every field from a page.
+
+        Returns:
+            dict[str, Any]: Field values keyed by field name.
+
+        Raises:
+            TypeError: If the page is empty, holds no document, such as a
+                page of comments only, or a required field is missing.
+
+        """
+        if not html or not html.strip():
+            message: str = "Page is empty."
+            raise TypeError(message)
+        try:
+            root: HtmlElement = lxml_html.document_fromstring(html)
+        except (etree.ParserError, ValueError) as e:
+            message = f"Page holds no document: {e}"
+            raise TypeError(message) from e
+        extracted: defaultdict[str, list[Any]] = defaultdict(list)
+        claimed: set[str] = set()
+        for element in root.iter(*self._tags):
+            for field_spec in self.__claim(element, claimed):
+                extracted[field_spec.name].append(field_spec.extract(element))
+        return self.__finish(extracted)
+
+    def extract_stream(
+        self, chunks: Iterable[bytes], encoding: str | None = None
+    ) -> dict[str, Any]:
+        """Extract every field from a page while it is being parsed.
+
+        Only the subtrees fields are read from are kept. Every other
+        element is cleared as soon as it is closed and dropped from its
+        parent, so memory stays bounded by the regions of interest rather
+        than by the size of the page.
+
+        Returns:
+            dict[str, Any]: Field values keyed by field name.
+
+        Raises:
+            TypeError: If the page is empty, holds no document, such as a
+                page of comments only, or a required field is missing.
+
+        """
+        parser: etree.HTMLPullParser = etree.HTMLPullParser(
+            events=("start", "end"), encoding=encoding
+        )
+        extracted: defaultdict[str, list[Any]] = defaultdict(list)
+        claimed: set[str] = set()
+        regions: list[tuple[etree._Element, list[FieldSpec]]] = []
+        empty: bool = True
+        try:
+            for chunk in chunks:
+                empty = empty and not chunk.strip()
+                parser.feed(chunk)
+                self.__consume(parser.read_events(), extracted, claimed, regions)
+            if empty:
+                message: str = "Page is empty."
+                raise TypeError(message)
+            parser.close()
+        except (etree.ParserError, etree.XMLSyntaxError, ValueError) as e:
+            message = f"Page holds no document: {e}"
+            raise TypeError(message) from e
+        self.__consume(parser.read_events(), extracted, claimed, regions)
+        return self.__finish(extracted)
+
+    def __consume(
+        self,
+        events: Iterator[tuple[str, etree._Element]],
+        extracted: defaultdict[str, list[Any]],
+        claimed: set[str],
+        regions: list[tuple[etree._Element, list[FieldSpec]]],
+    ) -> None:
+        """Extract the regions closed by a batch of parser events."""
+        for event, element in events:
+            if event == "start":
+                field_specs: list[FieldSpec] = self.__claim(element, claimed)
+                if field_specs:
+                    regions.append((element, field_specs))
+                continue
+            if regions and regions[-1][0] is element:
+                for field_spec in regions.pop()[1]:
+                    extracted[field_spec.name].append(field_spec.extract(element))
+            if not regions:
+                _discard(element)
+
+    def __claim(self, element: etree._Element, claimed: set[str]) -> list[FieldSpec]:
+        """Find the fields still waiting to be read from an element.
+
+        Returns:
+            list[FieldSpec]: Fields to read from the element.
+
+        """
+        field_specs: list[FieldSpec] = [
+            field_spec
+            for field_spec in self._by_tag.get(element.tag, ())
+            if (field_spec.many or field_spec.name not in claimed)
+            and field_spec.matches(element)
+        ]
+        claimed.update(field_spec.name for field_spec in field_specs)
+        return field_specs
+
+    def __finish(self, extracted: dict[str, list[Any]]) -> dict[str, Any]:
+        """Turn the extracted values into the fields of an article.
+
+        Returns:
+            dict[str, Any]: Field values keyed by field name.
+
+        Raises:
+            TypeError: If a required field is missing.
+
+        """
+        fields: dict[str, Any] = {}
+        for field_spec in self.fields:
+            values: list[Any] = extracted.get(field_spec.name, [])
+            if field_spec.many:
+                fields[field_spec.name] = values
+                continue
+            value: Any = values[0] if values else None
+            if value is None and field_spec.required:
+                message: str = f"{field_spec.name} is empty."
+                raise TypeError(message)
+            fields[field_spec.name] = field_spec.default if value is None else value
+        return fields
+
+
+def _discard(element: etree._Element) -> None:
+    """Free a closed element and the finished siblings before it."""
+    element.clear()
+    parent: etree._Element | None = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_chunks(content: bytes, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Split a page into chunks for ``extract_stream``.
+
+    Yields:
+        bytes: Chunk of the page.
+
+    """
+    view: memoryview = memoryview(content)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset : offset + chunk_size].tobytes()
+
+
+def _tags_text(element: HtmlElement) -> list[str]:
+    """Get the tags listed in a main site tags field."""
+    return [tag for tag in get_text(element).split() if tag not in {"", "Tags"}]
+
+
+def _beta_cells(element: HtmlElement) -> list[HtmlElement]:
+    """Find the metadata table cells of a beta article."""
+    return element.findall(".//td")
+
+
+def _beta_authors(element: HtmlElement) -> str:
+    """Get the authors of a beta article."""
+    cells: list[HtmlElement] = _beta_cells(element)
+    return get_stripped_text(cells[0]).lstrip("-") if len(cells) > 1 else ""
+
+
+def _beta_published_date(element: HtmlElement) -> str | None:
+    """Get the published date of a beta article, None without a date cell."""
+    cells: list[HtmlElement] = _beta_cells(element)
+    return get_text(cells[1]).strip() if len(cells) > 2 else None  # noqa: PLR2004
+
+
+def _beta_tags(element: HtmlElement) -> list[str]:
+    """Get the tags of a beta article."""
+    cells: list[HtmlElement] = _beta_cells(element)
+    if len(cells) > 3:  # noqa: PLR2004
+        return [get_text(link) for link in cells[-3].iter("a")]
+    return []
+
+
+def _beta_body(element: HtmlElement) -> str:
+    """Get the body of a beta article; its tables only hold metadata."""
+    return "".join(iter_strings(element, _UNRENDERED_TAGS | {"table"}))
+
+
+def _image_sources(element: HtmlElement) -> list[str]:
+    """Get the image sources inside an element."""
+    return [image.get("src") for image in element.iter("img")]
+
+
+MAIN_LAYOUT: LayoutSpec = LayoutSpec(
+    name="main",
+    fields=(
+        FieldSpec(
+            "title", "title", extract=lambda e: get_text(e).strip(), required=True
+        ),
+        FieldSpec(
+            "published_date",
+            "span",
+            "authored-at is-pulled-right",
+            extract=lambda e: get_text(e).strip(),
+        ),
+        FieldSpec(
+            "authors",
+            "span",
+            "author-name",
+            extract=lambda e: get_stripped_text(e).lstrip("-"),
+        ),
+        FieldSpec(
+            "tags",
+            "div",
+            "field field--name-field-tags field--type-entity-reference "
+            "field--label-above",
+            extract=_tags_text,
+            default=[],
+        ),
+        FieldSpec("images", "img", extract=lambda e: e.get("src"), many=True),
+        FieldSpec(
+            "article_content",
+            "div",
+            "clearfix text-formatted field field--name-body "
+            "field--type-text-with-summary field--label-hidden field__item",
+            extract=lambda e: get_text(e).strip(),
+            required=True,
+        ),
+    ),
+)
+
+BETA_LAYOUT: LayoutSpec = LayoutSpec(
+    name="beta",
+    fields=(
+        FieldSpec(
+            "title", "title", extract=lambda e: get_text(e).strip(), required=True
+        ),
+        FieldSpec(
+            "published_date",
+            "span",
+            "field-content",
+            extract=_beta_published_date,
+            required=True,
+        ),
+        FieldSpec("authors", "span", "field-content", extract=_beta_authors),
+        FieldSpec("tags", "span", "field-content", extract=_beta_tags, default=[]),
+        FieldSpec(
+            "images", "span", "field-content", extract=_image_sources, default=[]
+        ),
+        FieldSpec("article_content", "span", "field-content", extract=_beta_body),
+    ),
+)
@@ -0,0 +1,247 @@
+"""Concurrent, content addressed image downloads."""
+
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path, PurePosixPath
+from urllib.parse import urljoin, urlsplit
+
+import orjson
+import requests
+
+from transport import Transport, get_transport
+from wayback import WAYBACK_URL
+
+
+@dataclass(frozen=True)
+class ImageRecord:
+    """Where a downloaded image is stored."""
+
+    url: str
+    sha256: str
+    file: str
+    size: int
+    content_type: str
+
+
+def image_extension(url: str, content_type: str) -> str:
+    """Pick a file extension for an image.
+
+    Returns:
+        str: Extension including the dot, empty if none is known.
+
+    """
+    extension: str | None = mimetypes.guess_extension(
+        content_type.partition(";")[0].strip()
+    )
+    if extension:
+        return extension
+    return PurePosixPath(urlsplit(url).path).suffix.lower()
+
+
+class ImageDownloader:
+    """Download article images on a thread pool.
+
+    Images are streamed to a temporary file while being hashed and then
+    moved to ``<sha256[:2]>/<sha256><ext>``, so identical images are
+    stored once whatever url they came from. ``manifest.jsonl`` maps every
+    image url, exactly as it appears in the article records, to its file;
+    urls already in the manifest are skipped when a run is resumed.
+    Responses that are not images, such as the archive's error pages, or
+    that are larger than ``max_bytes`` are not stored.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = "images",
+        workers: int = 4,
+        chunk_size: int = 1 << 16,
+        max_bytes: int = 20 << 20,
+        transport: Transport | None = None,
+    ) -> None:
+        """Initialize image downloader.
+
+        Parameters
+        ----------
+        directory : str | Path
+            Directory images and their manifest are kept in.
+        workers : int
+            Downloads in flight.
+        chunk_size : int
+            Bytes written at a time while streaming an image.
+        max_bytes : int
+            Size of the largest image stored.
+        transport : Transport | None
+            Transport used for the downloads, the shared one by default.
+
+        """
+        self.directory: Path = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.workers: int = max(1, workers)
+        self.chunk_size: int = chunk_size
+        self.max_bytes: int = max_bytes
+        self.transport: Transport = transport or get_transport()
+        self.manifest_path: Path = self.directory / "manifest.jsonl"
+        self.manifest: dict[str, ImageRecord] = {}
+        self.downloaded: int = 0
+        self.deduplicated: int = 0
+        self.failed: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        if self.manifest_path.exists():
+            with self.manifest_path.open("rb") as manifest_file:
+                for line in manifest_file:
+                    if line.endswith(b"\n"):
+                        image_record: ImageRecord = ImageRecord(**orjson.loads(line))
+                        self.manifest[image_record.url] = image_record
+
+    def path(self, url: str) -> Path | None:
+        """Find the file an image was stored in.
+
+        Returns:
+            Path | None: Image file, None if the image was not downloaded.
+
+        """
+        image_record: ImageRecord | None = self.manifest.get(url)
+        return self.directory / image_record.file if image_record else None
+
+    def __is_present(self, url: str) -> bool:
+        """Check whether an image is in the manifest and on disk."""
+        image_path: Path | None = self.path(url)
+        return image_path is not None and image_path.is_file()
+
+    def download(self, url: str) -> ImageRecord | None:
+        """Download one image unless it is already stored.
+
+        Returns:
+            ImageRecord | None: Stored image, None if the download failed.
+
+        """
+        if self.__is_present(url):
+            return self.manifest[url]
+        try:
+            with self.transport.get(
+                urljoin(f"{WAYBACK_URL}/", url), stream=True
+            ) as response:
+                response.raise_for_status()
+                content_type: str = self.__check(response)
+                digest, size, partial = self.__stream(response)
+        except (requests.RequestException, ValueError) as e:
+            print(f"An error occurred: {e}")
+            with self._lock:
+                self.failed += 1
+            return None
+        name: str = f"{digest}{image_extension(url, content_type)}"
+        image_path: Path = self.directory / digest[:2] / name
+        image_path.parent.mkdir(exist_ok=True)
+        with self._lock:
+            if image_path.exists():
+                partial.unlink()
+                self.deduplicated += 1
+            else:
+                partial.replace(image_path)
+                self.downloaded += 1
+            image_record: ImageRecord = ImageRecord(
+                url=url,
+                sha256=digest,
+                file=image_path.relative_to(self.directory).as_posix(),
+                size=size,
+                content_type=content_type,
+            )
+            with self.manifest_path.open("ab") as manifest_file:
+                manifest_file.write(orjson.dumps(asdict(image_record)) + b"\n")
+            self.manifest[url] = image_record
+        return image_record
+
+    def __check(self, response: requests.Response) -> str:
+        """Check that a response is an image small enough to store.
+
+        Returns:
+            str: Content type of the image.
+
+        Raises:
+            ValueError: If the response is not an image, or announces more
+                than ``max_bytes``.
+
+        """
+        content_type: str = response.headers.get("Content-Type", "")
+        message: str
+        if not content_type.lower().startswith("image/"):
+            message = f"{response.url} is not an image: {content_type or 'untyped'}."
+            raise ValueError(message)
+        length: str = response.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            message = f"{response.url} is larger than {self.max_bytes} bytes."
+            raise ValueError(message)
+        return content_type
+
+    def __chunks(self, response: requests.Response) -> Iterator[bytes]:
+        """Read a response body chunk by chunk.
+
+        Yields:
+            bytes: Chunk of the body.
+
+        Raises:
+            ValueError: If the body runs over ``max_bytes``.
+
+        """
+        size: int = 0
+        for chunk in response.iter_content(self.chunk_size):
+            size += len(chunk)
+            if size > self.max_bytes:
+                message: str = f"{response.url} is larger than {self.max_bytes} bytes."
+                raise ValueError(message)
+            yield chunk
+
+    def __stream(self, response: requests.Response) -> tuple[str, int, Path]:
+        """Write a response body to a temporary file while hashing it.
+
+        Returns:
+            tuple[str, int, Path]: Hex sha256, size and temporary file.
+
+        """
+        sha256 = hashlib.sha256()
+        size: int = 0
+        descriptor, name = tempfile.mkstemp(dir=self.directory, suffix=".partial")
+        partial: Path = Path(name)
+        try:
+            with os.fdopen(descriptor, "wb") as partial_file:
+                for chunk in self.__chunks(response):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    partial_file.write(chunk)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return sha256.hexdigest(), size, partial
+
+    def download_all(self, urls: Iterable[str]) -> dict[str, ImageRecord]:
+        """Download images concurrently.
+
+        Returns:
+            dict[str, ImageRecord]: Stored images keyed by url.
+
+        """
+        pending: list[str] = [
+            url for url in dict.fromkeys(urls) if url and not self.__is_present(url)
+        ]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for _ in pool.map(self.download, pending):
+                pass
+        return self.manifest
+
+    def report(self) -> str:
+        """Summarize the downloads.
+
+        Returns:
+            str: Download summary.
+
+        """
+        return (
+            f"Downloaded {self.downloaded} images, {self.deduplicated} duplicates, "
+            f"{self.failed} failed; {len(self.manifest)} images in the manifest."
+        )
@@ -0,0 +1,181 @@
+"""Seeded, cached and batched language detection."""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import cached_property
+
+from langdetect import DetectorFactory
+from langdetect.detector_factory import PROFILES_DIRECTORY
+from langdetect.lang_detect_exception import LangDetectException
+
+from metrics import get_metrics
+
+# Scripts written by a single language among langdetect's profiles.
+SCRIPTS: dict[str, re.Pattern[str]] = {
+    language: re.compile(f"[{characters}]")
+    for language, characters in (
+        ("ml", "\u0d00-\u0d7f"),
+        ("ta", "\u0b80-\u0bff"),
+        ("te", "\u0c00-\u0c7f"),
+        ("kn", "\u0c80-\u0cff"),
+        ("gu", "\u0a80-\u0aff"),
+        ("pa", "\u0a00-\u0a7f"),
+        ("bn", "\u0980-\u09ff"),
+        ("th", "\u0e00-\u0e7f"),
+        ("he", "\u0590-\u05ff"),
+        ("el", "\u0370-\u03ff"),
+        ("ko", "\uac00-\ud7af"),
+    )
+}
+LETTER: re.Pattern[str] = re.compile(r"[^\W\d_]")
+
+
+def script_language(text: str, share: float = 0.5) -> str | None:
+    """Name the language of a text mostly written in one language's script.
+
+    Returns:
+        str | None: Language code, None if no such script makes up
+        ``share`` of the text's letters.
+
+    """
+    letters: int = len(LETTER.findall(text))
+    for language, script in SCRIPTS.items():
+        if letters and len(script.findall(text)) >= share * letters:
+            return language
+    return None
+
+
+class LanguageDetector:
+    """Language identification over an article's title and body.
+
+    A text mostly written in the script of a single language, such as
+    Malayalam, is labelled by counting its letters. Any other text goes to
+    langdetect's n-gram model, with its profiles loaded once and a fixed
+    seed so reruns label an article the same way; calls into langdetect are
+    serialized, so threads detecting at once cannot disturb each other's
+    sampling. The body is cut down to ``sample_length`` characters, which is
+    plenty for either. Labels are cached by a hash of the text, and
+    ``detect_many`` labels a whole batch at once, detecting each distinct
+    text only once.
+    """
+
+    def __init__(
+        self,
+        *,
+        seed: int = 0,
+        sample_length: int = 1000,
+        cache_size: int = 1 << 16,
+        script_share: float = 0.5,
+    ) -> None:
+        """Initialize language detector.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of langdetect's sampling.
+        sample_length : int
+            Characters of the body detection looks at.
+        cache_size : int
+            Labels kept in the cache.
+        script_share : float
+            Share of the letters a single language's script needs to label
+            a text without langdetect.
+
+        """
+        self.seed: int = seed
+        self.sample_length: int = sample_length
+        self.cache_size: int = cache_size
+        self.script_share: float = script_share
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    @cached_property
+    def factory(self) -> DetectorFactory:
+        """Seeded langdetect factory, with its profiles loaded."""
+        factory: DetectorFactory = DetectorFactory()
+        factory.load_profile(PROFILES_DIRECTORY)
+        factory.set_seed(self.seed)
+        return factory
+
+    def sample(self, title: str, body: str = "") -> str:
+        """Join a title and the start of a body into the text to detect.
+
+        Returns:
+            str: Text to detect.
+
+        """
+        return f"{title}\n{body[: self.sample_length]}".strip()
+
+    def detect(self, title: str, body: str = "") -> str:
+        """Detect the language of one article.
+
+        Returns:
+            str: Language code, empty if it cannot be told.
+
+        """
+        return self.detect_many([(title, body)])[0]
+
+    def detect_many(self, articles: Iterable[tuple[str, str]]) -> list[str]:
+        """Detect the language of a batch of articles.
+
+        Returns:
+            list[str]: Language code of each (title, body) pair, empty if it
+            cannot be told.
+
+        """
+        samples: list[str] = [self.sample(title, body) for title, body in articles]
+        keys: list[bytes] = [
+            hashlib.blake2b(sample.encode(), digest_size=16).digest()
+            for sample in samples
+        ]
+        with get_metrics().stage("language_detection"):
+            with self._lock:
+                labels: dict[bytes, str] = {
+                    key: self._cache[key] for key in keys if key in self._cache
+                }
+            get_metrics().inc("language_cache_hits_total", len(labels))
+            for key, sample in zip(keys, samples, strict=True):
+                if key not in labels:
+                    labels[key] = self.__detect(sample)
+                    get_metrics().inc("language_cache_misses_total")
+            with self._lock:
+                for key, label in labels.items():
+                    self._cache[key] = label
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [labels[key] for key in keys]
+
+    def __detect(self, sample: str) -> str:
+        """Detect the language of a text, by its script when possible."""
+        if not sample:
+            return ""
+        language: str | None = script_language(sample, self.script_share)
+        if language is not None:
+            return language
+        with self._lock:
+            detector = self.factory.create()
+            detector.append(sample)
+            try:
+                return str(detector.detect())
+            except LangDetectException:
+                return ""
+
+
+_shared_detector: LanguageDetector | None = None
+
+
+def get_language_detector() -> LanguageDetector:
+    """Return the process wide language detector.
+
+    Returns:
+        LanguageDetector: Shared language detector.
+
+    """
+    global _shared_detector  # noqa: PLW0603
+    if _shared_detector is None:
+        _shared_detector = LanguageDetector()
+    return _shared_detector
@@ -0,0 +1,282 @@
+"""Site layouts the pipeline knows how to discover and parse."""
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cache
+from importlib.metadata import entry_points
+from typing import Any
+
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.html import HtmlElement
+
+from cdx_discovery import BETA_ARTICLE_PATTERN, MAIN_ARTICLE_PATTERN
+from extraction import BETA_LAYOUT, MAIN_LAYOUT, LayoutSpec, iter_chunks
+from language import get_language_detector
+from metrics import get_metrics
+from wayback import IMAGE_MODIFIER, WAYBACK_URL, rewrite_link
+
+type Article = dict[str, str | list[str]]
+
+ENTRY_POINT_GROUP: str = "bodhi_content_recovery.layouts"
+
+
+def _has_class(element: HtmlElement, css_class: str) -> bool:
+    """Check an element's class like BeautifulSoup's ``class_`` does."""
+    classes: str = " ".join(element.get("class", "").split())
+    return css_class in {classes, *classes.split()}
+
+
+def _first_link(element: HtmlElement) -> str | None:
+    """Get the target of the first link inside an element."""
+    link: HtmlElement | None = next(element.iter("a"), None)
+    return link.get("href") if link is not None else None
+
+
+def _main_listing_links(root: HtmlElement) -> list[str]:
+    """Read the article links of a front page listing."""
+    links: list[str | None] = [
+        _first_link(row)
+        for block in root.iter()
+        if block.get("id") == "block-lenin-content"
+        for row in block.iter()
+        if _has_class(row, "views-row")
+    ]
+    return [link for link in links if link]
+
+
+def _beta_listing_links(root: HtmlElement) -> list[str]:
+    """Read the article links of the beta site's filtered list."""
+    links: list[str | None] = [
+        _first_link(heading)
+        for block in root.iter("div")
+        if _has_class(
+            block,
+            "panels-flexible-column panels-flexible-column-filtered_lists_panel-5 "
+            "panels-flexible-column-first homePageCommon",
+        )
+        for heading in block.iter("h2")
+    ]
+    return [link for link in links if link]
+
+
+@dataclass(frozen=True)
+class SiteLayout:
+    """Everything that differs between two layouts of the site.
+
+    A layout knows where its articles are listed, both on listing pages
+    and in the CDX index, how to read an article off a page and where its
+    articles, work queue and fallback captures are stored.
+    """
+
+    name: str
+    extraction: LayoutSpec
+    cdx_prefix: str
+    article_pattern: re.Pattern[str]
+    snapshot_timestamp: str
+    listing_url: str
+    listing_pages: range
+    listing_links: Callable[[HtmlElement], list[str]]
+    db_name: str
+    retry_queue_name: str
+    cdx_state_file: str
+    tags_are_categories: bool = False
+    snapshot_winners_file: str = "snapshot_winners.jsonl"
+
+    def listing_urls(self) -> list[str]:
+        """Build the replay url of every listing page.
+
+        Returns:
+            list[str]: Listing page urls.
+
+        """
+        return [
+            self.listing_url.format(timestamp=self.snapshot_timestamp, page=page)
+            for page in self.listing_pages
+        ]
+
+    def article_urls(self, listing_url: str, html: str | bytes) -> list[str]:
+        """Read the article urls off a listing page, replayed or raw.
+
+        Returns:
+            list[str]: Replay urls of the articles, empty if the page lists
+            none.
+
+        """
+        try:
+            root: HtmlElement = lxml_html.document_fromstring(html)
+        except (etree.ParserError, ValueError):
+            return []
+        return [rewrite_link(listing_url, link) for link in self.listing_links(root)]
+
+    def article(
+        self, article_url: str, fields: dict[str, Any], *, detect_language: bool = True
+    ) -> Article:
+        """Build an article record out of extracted fields.
+
+        Without ``detect_language`` the language is left empty, for the
+        caller to detect in a batch. Image sources, whether the archive
+        rewrote them or not, become absolute ``im_`` replay urls.
+
+        Returns:
+            Article: Article content.
+
+        """
+        title: str = fields["title"]
+        lang: str = (
+            get_language_detector().detect(title, fields["article_content"] or "")
+            if detect_language
+            else ""
+        )
+        return {
+            "url": article_url,
+            "title": title,
+            "published_date": fields["published_date"],
+            "authors": fields["authors"],
+            "language": lang,
+            "tags": fields["tags"],
+            "images": [
+                rewrite_link(article_url, source, IMAGE_MODIFIER)
+                for source in fields["images"]
+                if source
+            ],
+            "categories": fields["tags"] if self.tags_are_categories else [],
+            "article_content": fields["article_content"],
+        }
+
+    def extract(self, html: str | bytes, *, streaming: bool = False) -> dict[str, Any]:
+        """Extract the fields of an article from a page.
+
+        In ``streaming`` mode the page is parsed chunk by chunk, keeping
+        only the regions fields are read from.
+
+        Returns:
+            dict[str, Any]: Field values keyed by field name.
+
+        """
+        if not streaming:
+            return self.extraction.extract(html)
+        if isinstance(html, str):
+            return self.extraction.extract_stream(iter_chunks(html.encode()), "utf-8")
+        return self.extraction.extract_stream(iter_chunks(html))
+
+    def parse(
+        self,
+        article_url: str,
+        html: str | bytes,
+        *,
+        detect_language: bool = True,
+        streaming: bool = False,
+    ) -> Article:
+        """Parse an article out of a page.
+
+        Returns:
+            Article: Article content.
+
+        Raises:
+            TypeError: If the page holds no article.
+
+        """
+        with get_metrics().stage("parse"):
+            fields: dict[str, Any] = self.extract(html, streaming=streaming)
+        return self.article(article_url, fields, detect_language=detect_language)
+
+
+MAIN_SITE: SiteLayout = SiteLayout(
+    name="main",
+    extraction=MAIN_LAYOUT,
+    cdx_prefix="bodhicommons.org/",
+    article_pattern=MAIN_ARTICLE_PATTERN,
+    snapshot_timestamp="20230331041108",
+    listing_url=f"{WAYBACK_URL}/web/{{timestamp}}/http://bodhicommons.org?page={{page}}",
+    listing_pages=range(22, 66),
+    listing_links=_main_listing_links,
+    db_name="backup.sqlite3",
+    retry_queue_name="retry_queue.sqlite3",
+    cdx_state_file="cdx_state.json",
+)
+BETA_SITE: SiteLayout = SiteLayout(
+    name="beta",
+    extraction=BETA_LAYOUT,
+    cdx_prefix="beta.bodhicommons.org/article/",
+    article_pattern=BETA_ARTICLE_PATTERN,
+    snapshot_timestamp="20160320002127",
+    listing_url=f"{WAYBACK_URL}/web/{{timestamp}}/http://beta.bodhicommons.org/filter/all",
+    listing_pages=range(1),
+    listing_links=_beta_listing_links,
+    db_name="backup_beta.sqlite3",
+    retry_queue_name="retry_queue_beta.sqlite3",
+    cdx_state_file="cdx_beta_state.json",
+    tags_are_categories=True,
+    snapshot_winners_file="snapshot_winners_beta.jsonl",
+)
+LAYOUTS: dict[str, SiteLayout] = {MAIN_SITE.name: MAIN_SITE, BETA_SITE.name: BETA_SITE}
+
+
+def register_layout(layout: SiteLayout) -> None:
+    """Make a layout available to the pipeline under its name."""
+    LAYOUTS[layout.name] = layout
+
+
+@cache
+def _load_plugins() -> None:
+    """Register the layouts installed packages declare as entry points, once."""
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        layout: Any = entry_point.load()
+        if not isinstance(layout, SiteLayout):
+            message: str = f"Entry point {entry_point.name} is not a SiteLayout."
+            raise TypeError(message)
+        register_layout(layout)
+
+
+def available_layouts() -> list[str]:
+    """List the names of the known layouts, plugins included.
+
+    Returns:
+        list[str]: Layout names.
+
+    """
+    _load_plugins()
+    return sorted(LAYOUTS)
+
+
+def get_layout(name: str) -> SiteLayout:
+    """Look a layout up by name, plugins included.
+
+    Returns:
+        SiteLayout: Layout.
+
+    Raises:
+        ValueError: If no layout has this name.
+
+    """
+    _load_plugins()
+    if name not in LAYOUTS:
+        message: str = f"Unknown layout {name}, expected one of {sorted(LAYOUTS)}."
+        raise ValueError(message)
+    return LAYOUTS[name]
+
+
+def parse_page(
+    layout_name: str,
+    article_url: str,
+    html: str | bytes,
+    *,
+    detect_language: bool = True,
+    streaming: bool = False,
+) -> Article:
+    """Parse an article with a named layout, e.g. inside a parse worker.
+
+    Returns:
+        Article: Article content, empty on failure.
+
+    """
+    try:
+        return get_layout(layout_name).parse(
+            article_url, html, detect_language=detect_language, streaming=streaming
+        )
+    except TypeError as e:
+        print(article_url)
+        print(e)
+        return {}
@@ -0,0 +1,302 @@
+"""Per stage counters, timings and profiles in the Prometheus text format."""
+
+import cProfile
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+type Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass
+class Histogram:
+    """Distribution of observed values over fixed buckets."""
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        """Start with every bucket, and the implicit ``+Inf`` one, empty."""
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        """Count a value in the first bucket it fits in."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    """Format labels the way the Prometheus text format expects."""
+    pairs: Labels = labels + extra
+    if not pairs:
+        return ""
+    escaped: list[str] = [f'{name}="{_escape(value)}"' for name, value in pairs]
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metrics:
+    """Counters, gauges and histograms of one scraping run.
+
+    Every stage is timed with ``stage``, which can also run the stage
+    under cProfile. The metrics are rendered in the Prometheus text
+    format, either to a file a node exporter picks up or on a local
+    scrape endpoint. Updates take a lock, so stages running on different
+    threads share one instance.
+    """
+
+    def __init__(self, namespace: str = "bodhi") -> None:
+        """Initialize metrics."""
+        self.namespace: str = namespace
+        self.started: float = time.monotonic()
+        self.profiled: set[str] = set()
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._gauges: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._profiling: threading.Lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Add to a counter."""
+        key: tuple[str, Labels] = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self._gauges[name, tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add an observation to a histogram."""
+        key: tuple[str, Labels] = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram: Histogram | None = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Read a counter.
+
+        Returns:
+            float: Counter value, 0 if it was never incremented.
+
+        """
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def profile(self, *stages: str) -> None:
+        """Run the given stages under cProfile from now on."""
+        self.profiled.update(stages)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block as one run of a stage.
+
+        When the stage is profiled, the block also runs under the stage's
+        profiler, unless another block is being profiled already: only
+        one profiler can be active per process.
+
+        Yields:
+            None: Control to the timed block.
+
+        """
+        profiler: cProfile.Profile | None = None
+        if name in self.profiled and self._profiling.acquire(blocking=False):
+            profiler = self._profiles.setdefault(name, cProfile.Profile())
+            profiler.enable()
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - started, stage=name)
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.release()
+
+    def dump_profiles(self, directory: str | Path = "profiles") -> list[Path]:
+        """Write the profile of every profiled stage, for pstats or snakeviz.
+
+        Returns:
+            list[Path]: One ``<stage>.prof`` file per profiled stage.
+
+        """
+        paths: list[Path] = []
+        if not self._profiles:
+            return paths
+        profile_directory: Path = Path(directory)
+        profile_directory.mkdir(parents=True, exist_ok=True)
+        for name, profiler in self._profiles.items():
+            path: Path = profile_directory / f"{name}.prof"
+            profiler.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format.
+
+        Returns:
+            str: Exposition text.
+
+        """
+        lines: list[str] = []
+        with self._lock:
+            uptime: float = time.monotonic() - self.started
+            lines += [
+                f"# TYPE {self.namespace}_uptime_seconds gauge",
+                f"{self.namespace}_uptime_seconds {uptime:.3f}",
+            ]
+            for kind, values in (("counter", self._counters), ("gauge", self._gauges)):
+                typed: set[str] = set()
+                for (name, labels), value in sorted(values.items()):
+                    metric: str = f"{self.namespace}_{name}"
+                    if name not in typed:
+                        typed.add(name)
+                        lines.append(f"# TYPE {metric} {kind}")
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+            typed = set()
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {metric} histogram")
+                label_text: str = _format_labels(labels)
+                cumulative: int = 0
+                for bound, count in zip(
+                    (*histogram.buckets, "+Inf"), histogram.counts, strict=True
+                ):
+                    cumulative += count
+                    bucket_labels: str = _format_labels(labels, (("le", f"{bound}"),))
+                    lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{metric}_sum{label_text} {histogram.total:g}")
+                lines.append(f"{metric}_count{label_text} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path) -> None:
+        """Atomically replace a metrics file, e.g. for a textfile collector."""
+        metrics_path: Path = Path(path)
+        partial: Path = metrics_path.with_name(f"{metrics_path.name}.partial")
+        partial.write_text(self.render(), encoding="utf-8")
+        partial.replace(metrics_path)
+
+    def write_every(self, path: str | Path, interval: float = 15.0) -> threading.Thread:
+        """Keep rewriting a metrics file in the background.
+
+        Returns:
+            threading.Thread: Daemon thread doing the writing.
+
+        """
+
+        def write_forever() -> None:
+            while True:
+                self.write(path)
+                time.sleep(interval)
+
+        writer: threading.Thread = threading.Thread(target=write_forever, daemon=True)
+        writer.start()
+        return writer
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics on a local scrape endpoint in the background.
+
+        Returns:
+            ThreadingHTTPServer: Running server, stopped with ``shutdown``.
+
+        """
+        metrics: Metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body: bytes = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_: object) -> None:
+                pass
+
+        server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class Progress:
+    """Throughput and ETA of a run over a known number of items."""
+
+    def __init__(self, total: int, metrics: "Metrics | None" = None) -> None:
+        """Initialize progress."""
+        self.total: int = total
+        self.done: int = 0
+        self.metrics: Metrics = metrics or get_metrics()
+        self.started: float = time.monotonic()
+
+    def advance(self, count: int = 1) -> str:
+        """Count finished items.
+
+        Returns:
+            str: Progress line with pages per second and ETA.
+
+        """
+        self.done += count
+        elapsed: float = max(time.monotonic() - self.started, 1e-9)
+        rate: float = self.done / elapsed
+        remaining: int = max(0, self.total - self.done)
+        eta: float = remaining / rate if rate else 0.0
+        self.metrics.set("progress_total", self.total)
+        self.metrics.set("progress_done", self.done)
+        self.metrics.set("pages_per_second", rate)
+        self.metrics.set("eta_seconds", eta)
+        return (
+            f"Finished writing {self.done} articles out of {self.total} articles "
+            f"({rate:.2f} pages/s, ETA {timedelta(seconds=round(eta))})."
+        )
+
+
+_shared_metrics: Metrics | None = None
+
+
+def get_metrics() -> Metrics:
+    """Return the process wide metrics.
+
+    Returns:
+        Metrics: Shared metrics.
+
+    """
+    global _shared_metrics  # noqa: PLW0603
+    if _shared_metrics is None:
+        _shared_metrics = Metrics()
+    return _shared_metrics
@@ -0,0 +1,956 @@
+"""Streaming discover, fetch, parse and store pipeline."""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import StrEnum
+from functools import cached_property
+from pathlib import Path
+
+import httpx
+import orjson
+import requests
+
+from article_db import ArticleDatabase
+from article_store import FsyncPolicy
+from async_fetcher import AsyncFetcher, FetchResult
+from cdx_discovery import CdxDiscovery
+from dedup import NearDuplicateIndex, merge_articles
+from image_downloader import ImageDownloader
+from language import get_language_detector
+from layouts import Article, SiteLayout, parse_page
+from metrics import Progress
+from recrawl import Recrawl, article_key, snapshot_fields
+from response_cache import (
+    UNCACHEABLE_STATUSES,
+    CachedResponse,
+    ResponseCache,
+    header_charset,
+)
+from resume_index import ResumeIndex
+from retry_queue import DEFAULT_LEASE, FailureKind, RetryQueue, WorkQueue, classify
+from snapshot_resolver import SnapshotResolver
+from transport import Transport, get_transport
+from url_index import UrlIndex
+from wayback import raw_url
+
+
+class DiscoveryMethod(StrEnum):
+    """Where article urls are discovered."""
+
+    CDX = "cdx"
+    LISTING = "listing"
+
+
+@dataclass
+class _Outcome:
+    """What happened to one url, reported back to the coordinating thread."""
+
+    url: str
+    status: int = 0
+    headers: dict[str, str] = field(default_factory=dict)
+    fresh: FetchResult | None = None
+    article: Article | None = None
+    error: BaseException | str | None = None
+    source: str | None = None
+    fell_back: bool = False
+
+
+class Pipeline:
+    """Discover, fetch, parse and store the articles of one site layout.
+
+    The stages run concurrently and are connected by bounded queues, so
+    an url is fetched as soon as it is discovered and a page is parsed as
+    soon as it is fetched. Discovery runs on its own thread and fetching
+    on ``fetch_workers`` threads, or, with ``async_fetch``, on as many
+    coroutines of one event loop thread. Pages are parsed right after
+    fetching, or on ``parse_workers`` processes, spawned rather than
+    forked since the pipeline is threaded. The article database, retry
+    queue and resume index are only touched by the thread that calls
+    ``run``, which stores articles as they arrive, in batches of
+    ``language_batch`` whose languages are detected together. Fetch and
+    fallback threads read cached pages from the response cache, and the
+    run thread writes fetched ones to it; the cache locks its own writes.
+
+    Every stage can run alone and every stage resumes: discovery through
+    the CDX state file, fetching through the response cache and parsing
+    and storing through the retry queue and the resume index.
+
+    Several pipelines, on one machine or on several sharing a work queue,
+    can run as workers: each claims urls from the queue in batches and
+    keeps its leases alive until the urls are stored or failed, so no url
+    is fetched twice and the urls of a worker that dies are taken over
+    once its leases run out.
+
+    A page that is missing from the archive or holds no article is handed
+    to a snapshot resolver, which tries the url's other captures before
+    the failure is recorded; once a capture wins, later runs fetch it
+    directly.
+
+    With ``dedup``, the content of every stored article is fingerprinted
+    when the run starts, and an article nearly duplicating one of them,
+    say under another slug, is merged into it.
+
+    ``plan_recrawl`` queues the newer captures of stored articles ahead of
+    a run, and each is stored in place of the capture stored before.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        layout: SiteLayout,
+        *,
+        db_name: str | None = None,
+        retry_queue_name: str | None = None,
+        cache_directory: str | None = "cache",
+        fetch_workers: int = 4,
+        parse_workers: int = 0,
+        queue_size: int = 64,
+        language_batch: int = 64,
+        transport: Transport | None = None,
+        work_queue: WorkQueue | None = None,
+        fallback_concurrency: int = 3,
+        raw: bool = False,
+        dedup: bool = False,
+        async_fetch: bool = False,
+        streaming: bool = False,
+        fsync: FsyncPolicy | str = FsyncPolicy.ALWAYS,
+    ) -> None:
+        """Initialize pipeline.
+
+        Parameters
+        ----------
+        layout : SiteLayout
+            Layout of the site to recover.
+        db_name : str | None
+            Article database, the layout's by default.
+        retry_queue_name : str | None
+            Retry queue database, the layout's by default.
+        cache_directory : str | None
+            Response cache directory, None to fetch without caching.
+        fetch_workers : int
+            Threads fetching pages.
+        parse_workers : int
+            Processes parsing pages, 0 to parse on the fetching threads.
+        queue_size : int
+            Urls and pages buffered between two stages.
+        language_batch : int
+            Parsed articles whose languages are detected together, 0 to
+            detect each article's language while parsing it.
+        transport : Transport | None
+            Transport used for every request, the shared one by default.
+        work_queue : WorkQueue | None
+            Work queue, a retry queue at ``retry_queue_name`` by default.
+        fallback_concurrency : int
+            Other captures of an url tried at once when its snapshot is
+            unusable, 0 to record the failure without trying any.
+        raw : bool
+            Fetch the original bytes of each capture, without the archive's
+            toolbar and link rewriting, rather than its replay page.
+        dedup : bool
+            Merge an article nearly duplicating one already stored into it
+            rather than storing it on its own.
+        async_fetch : bool
+            Fetch on ``fetch_workers`` coroutines sharing one async client
+            rather than on as many threads.
+        streaming : bool
+            Parse pages chunk by chunk, keeping only the regions articles
+            are read from.
+        fsync : FsyncPolicy | str
+            When the article database commits stored articles durably.
+
+        """
+        self.layout: SiteLayout = layout
+        self.db_name: Path = Path(db_name or layout.db_name)
+        self.retry_queue_name: str = retry_queue_name or layout.retry_queue_name
+        self.fetch_workers: int = max(1, fetch_workers)
+        self.parse_workers: int = max(0, parse_workers)
+        self.queue_size: int = max(1, queue_size)
+        self.language_batch: int = max(0, language_batch)
+        self.transport: Transport = transport or get_transport()
+        self.cache: ResponseCache | None = (
+            ResponseCache(cache_directory) if cache_directory else None
+        )
+        self.work_queue: WorkQueue | None = work_queue
+        self.fallback_concurrency: int = max(0, fallback_concurrency)
+        self.raw: bool = raw
+        self.dedup: bool = dedup
+        self.async_fetch: bool = async_fetch
+        self.streaming: bool = streaming
+        self.fsync: FsyncPolicy = FsyncPolicy(fsync)
+        self.worker: str | None = None
+        self.lease: float = DEFAULT_LEASE
+        self._renewed: float = 0.0
+        self._parse_pool: ProcessPoolExecutor | None = None
+        self._fallback_pool: ThreadPoolExecutor | None = None
+        self._parse_slots: threading.BoundedSemaphore = threading.BoundedSemaphore(
+            self.queue_size
+        )
+        self._unlabelled: list[_Outcome] = []
+        self.progress: Progress = Progress(0)
+        self.stored: int = 0
+        self.merged: int = 0
+        self.failed: int = 0
+        self.fetched: int = 0
+
+    @cached_property
+    def retry_queue(self) -> WorkQueue:
+        """Queue of the urls still to be scraped."""
+        return self.work_queue or RetryQueue(self.retry_queue_name)
+
+    @cached_property
+    def resolver(self) -> SnapshotResolver | None:
+        """Resolver of fallback captures, None if falling back is disabled."""
+        if not self.fallback_concurrency:
+            return None
+        return SnapshotResolver(
+            self.layout.snapshot_winners_file,
+            concurrency=self.fallback_concurrency,
+            transport=self.transport,
+        )
+
+    @cached_property
+    def store(self) -> ArticleDatabase:
+        """Article database."""
+        return ArticleDatabase(self.db_name, fsync=self.fsync)
+
+    @cached_property
+    def duplicates(self) -> NearDuplicateIndex | None:
+        """Index of the stored articles' content, None without ``dedup``."""
+        if not self.dedup:
+            return None
+        duplicates: NearDuplicateIndex = NearDuplicateIndex()
+        for article in self.store:
+            duplicates.add(str(article["url"]), str(article["article_content"] or ""))
+        return duplicates
+
+    @cached_property
+    def stored_urls(self) -> dict[str, str]:
+        """Url stored for each article, by ``article_key``."""
+        return {article_key(url): url for url in self.store.urls()}
+
+    @cached_property
+    def resume_index(self) -> ResumeIndex:
+        """Index of the urls already stored."""
+        return ResumeIndex.for_store(self.store)
+
+    def discover(self, method: DiscoveryMethod | str) -> Iterator[str]:
+        """Discover article urls, yielding each as soon as it is found.
+
+        Every article is yielded once, by the first url found for it, even
+        when listing pages repeat it or name it by other captures.
+
+        Yields:
+            str: Replay url of an article.
+
+        """
+        url_index: UrlIndex = UrlIndex()
+        if DiscoveryMethod(method) == DiscoveryMethod.CDX:
+            discovery: CdxDiscovery = CdxDiscovery(
+                url=self.layout.cdx_prefix,
+                article_pattern=self.layout.article_pattern,
+                before=self.layout.snapshot_timestamp,
+                state_file=self.layout.cdx_state_file,
+                transport=self.transport,
+            )
+            try:
+                yield from url_index.unique(
+                    capture.archive_url for capture in discovery.iter_resolved()
+                )
+            except (requests.RequestException, orjson.JSONDecodeError) as e:
+                print(f"CDX lookup failed: {e}")
+            return
+        for listing_url in self.layout.listing_urls():
+            try:
+                response: requests.Response = self.transport.get(
+                    raw_url(listing_url) if self.raw else listing_url
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"An error occurred: {e}")
+                continue
+            article_urls: list[str] = self.layout.article_urls(
+                listing_url, response.content
+            )
+            if not article_urls:
+                print(f"Found no articles on {listing_url}.")
+            yield from url_index.unique(article_urls)
+
+    def plan_recrawl(self) -> set[str]:
+        """Queue the newer snapshot of every stored article that has one.
+
+        Returns:
+            set[str]: Keys of the stored articles.
+
+        """
+        stored: dict[str, Article] = self.store.latest(
+            key=lambda article: article_key(str(article.get("url", "")))
+        )
+        recrawl: Recrawl = Recrawl(
+            stored,
+            discovery=CdxDiscovery(
+                url=self.layout.cdx_prefix,
+                article_pattern=self.layout.article_pattern,
+                state_file=None,
+                transport=self.transport,
+            ),
+            transport=self.transport,
+            cache=self.cache,
+        )
+        changed: list[str] = recrawl.changed()
+        self.retry_queue.replace(changed, priority=1)
+        print(f"{len(changed)} of {len(stored)} stored articles have a newer snapshot.")
+        return set(stored)
+
+    def download_images(self, directory: str) -> None:
+        """Download the images of every stored article."""
+        image_downloader: ImageDownloader = ImageDownloader(
+            directory, transport=self.transport
+        )
+        image_downloader.download_all(
+            image
+            for article in self.store
+            for image in article.get("images", [])
+            if isinstance(image, str)
+        )
+        print(image_downloader.report())
+
+    def fetch(self, url: str) -> tuple[FetchResult, bool]:
+        """Fetch a page, answering from the response cache when possible.
+
+        In raw mode the capture's original bytes are requested, but the
+        page is cached and reported under ``url`` all the same; a raw and
+        a replayed page parse to the same article.
+
+        Returns:
+            tuple[FetchResult, bool]: Page, and whether it came from the
+            network rather than the cache.
+
+        """
+        cached: FetchResult | None = self.__cached(url)
+        if cached is not None:
+            return cached, False
+        try:
+            response: requests.Response = self.transport.get(
+                raw_url(url) if self.raw else url
+            )
+        except requests.RequestException as e:
+            return FetchResult(url=url, error=e), True
+        return (
+            FetchResult(
+                url=url,
+                status=response.status_code,
+                content=response.content,
+                headers=dict(response.headers),
+            ),
+            True,
+        )
+
+    async def fetch_async(
+        self, fetcher: AsyncFetcher, client: httpx.AsyncClient, url: str
+    ) -> tuple[FetchResult, bool]:
+        """Fetch a page like ``fetch``, over an async client.
+
+        Returns:
+            tuple[FetchResult, bool]: Page, and whether it came from the
+            network rather than the cache.
+
+        """
+        cached: FetchResult | None = self.__cached(url)
+        if cached is not None:
+            return cached, False
+        result: FetchResult = await fetcher.fetch(
+            client, raw_url(url) if self.raw else url
+        )
+        result.url = url
+        return result, True
+
+    def __cached(self, url: str) -> FetchResult | None:
+        """Read a page from the response cache.
+
+        Returns:
+            FetchResult | None: Cached page, None if it is not cached.
+
+        """
+        cached: CachedResponse | None = (
+            self.cache.get(url) if self.cache is not None else None
+        )
+        if cached is None:
+            return None
+        return FetchResult(
+            url=url,
+            status=cached.status,
+            content=cached.content,
+            headers=cached.headers,
+        )
+
+    def parse(self, result: FetchResult) -> Article:
+        """Parse the article out of a fetched page.
+
+        Returns:
+            Article: Article content, empty if the page holds no article.
+
+        """
+        return parse_page(
+            self.layout.name,
+            result.url,
+            self.__html(result),
+            detect_language=not self.language_batch,
+            streaming=self.streaming,
+        )
+
+    @staticmethod
+    def __html(result: FetchResult) -> str:
+        """Decode a fetched page."""
+        return result.content.decode(
+            header_charset(result.headers) or "utf-8", errors="replace"
+        )
+
+    def run(
+        self,
+        discover: DiscoveryMethod | str | None = None,
+        *,
+        fetch: bool = True,
+        parse: bool = True,
+        worker: str | bool | None = None,
+        lease: float = DEFAULT_LEASE,
+    ) -> None:
+        """Run the chosen stages until the work queue is drained.
+
+        Urls already due in the retry queue are worked on first, then every
+        newly discovered url as it appears. Without ``fetch`` only cached
+        pages are worked on; without ``parse`` pages are only fetched into
+        the cache and stay queued for a later parse.
+
+        As a ``worker``, named by host and process unless a name is given,
+        urls are claimed from the queue for ``lease`` seconds at a time
+        instead, discovered urls are only queued, and the resume index is
+        left alone since other workers store into the same database. A
+        worker keeps going while other workers hold leases, to take over
+        those of a worker that died.
+        """
+        self.worker = (
+            f"{socket.gethostname()}:{os.getpid()}"
+            if worker is True
+            else worker or None
+        )
+        self.lease = lease
+        events: queue.Queue[str | _Outcome | None] = queue.Queue()
+        to_fetch: queue.Queue[str | None] = queue.Queue(maxsize=self.queue_size)
+        fetchers: int = self.fetch_workers if fetch or parse else 0
+        if parse and self.parse_workers:
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        if fetch and parse and self.resolver is not None:
+            self._fallback_pool = ThreadPoolExecutor(
+                max_workers=self.fallback_concurrency, thread_name_prefix="fallback"
+            )
+        due: list[str] = (
+            self.retry_queue.due() if fetchers and self.worker is None else []
+        )
+        fetch_worker: Callable[..., None] = (
+            self.__async_fetch_worker if self.async_fetch else self.__fetch_worker
+        )
+        for _ in range(min(fetchers, 1) if self.async_fetch else fetchers):
+            threading.Thread(
+                target=fetch_worker, args=(to_fetch, events, parse), daemon=True
+            ).start()
+        if discover is not None:
+            threading.Thread(
+                target=self.__discover_worker, args=(discover, events), daemon=True
+            ).start()
+        try:
+            self.__coordinate(
+                due,
+                to_fetch,
+                events,
+                discovering=discover is not None,
+                fetch=fetch,
+                parse=parse,
+            )
+        finally:
+            for _ in range(fetchers):
+                to_fetch.put(None)
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown(cancel_futures=True)
+                self._parse_pool = None
+            if self._fallback_pool is not None:
+                self._fallback_pool.shutdown(cancel_futures=True)
+                self._fallback_pool = None
+            if self.resolver is not None:
+                self.resolver.close()
+            self.__store_unlabelled()
+            self.store.close()
+            if self.worker is None:
+                self.resume_index.flush()
+            else:
+                self.retry_queue.release(self.worker)
+        print(self.report())
+
+    def __coordinate(
+        self,
+        due: list[str],
+        to_fetch: queue.Queue[str | None],
+        events: queue.Queue[str | _Outcome | None],
+        *,
+        discovering: bool,
+        fetch: bool,
+        parse: bool,
+    ) -> None:
+        """Queue discovered urls and record outcomes until all work is done."""
+        in_flight: int = sum(
+            self.__dispatch(url, to_fetch, fetch=fetch, parse=parse) for url in due
+        )
+        while True:
+            if self.worker is not None:
+                in_flight += self.__claim(
+                    in_flight, to_fetch, fetch=fetch, parse=parse
+                )
+            if not (discovering or in_flight or self.__others_working()):
+                return
+            try:
+                event: str | _Outcome | None = events.get(
+                    timeout=None if self.worker is None else min(self.lease / 3, 10.0)
+                )
+            except queue.Empty:
+                continue
+            if event is None:
+                discovering = False
+            elif isinstance(event, str):
+                if self.worker is not None:
+                    self.retry_queue.add([event])
+                elif event not in self.resume_index and self.retry_queue.add([event]):
+                    in_flight += self.__dispatch(
+                        event, to_fetch, fetch=fetch, parse=parse
+                    )
+            else:
+                if self.__record(event, events, parse=parse):
+                    continue
+                in_flight -= 1
+                print(self.progress.advance())
+
+    def __others_working(self) -> bool:
+        """Check whether other workers hold leases that may yet run out.
+
+        Returns:
+            bool: True if this is a worker and others hold leases.
+
+        """
+        return (
+            self.worker is not None
+            and self.retry_queue.leased_to_others(self.worker) > 0
+        )
+
+    def __claim(
+        self,
+        in_flight: int,
+        to_fetch: queue.Queue[str | None],
+        *,
+        fetch: bool,
+        parse: bool,
+    ) -> int:
+        """Renew this worker's leases when due and claim urls to keep it busy.
+
+        Urls are claimed once half the claimed ones are done, enough to
+        have ``queue_size`` in flight. Claimed urls the chosen stages skip
+        stay leased to the worker until it stops.
+
+        Returns:
+            int: Number of urls claimed and handed to the fetchers.
+
+        """
+        worker: str = self.worker or ""
+        if time.monotonic() - self._renewed >= self.lease / 3:
+            self.retry_queue.heartbeat(worker, self.lease)
+            self._renewed = time.monotonic()
+        if in_flight > self.queue_size // 2:
+            return 0
+        while claimed := self.retry_queue.claim(
+            worker, self.queue_size - in_flight, self.lease
+        ):
+            dispatched: int = sum(
+                self.__dispatch(url, to_fetch, fetch=fetch, parse=parse)
+                for url in claimed
+            )
+            if dispatched:
+                return dispatched
+        return 0
+
+    def __dispatch(
+        self, url: str, to_fetch: queue.Queue[str | None], *, fetch: bool, parse: bool
+    ) -> bool:
+        """Hand an url to the fetchers, unless the chosen stages skip it.
+
+        Returns:
+            bool: True if the url was handed over.
+
+        """
+        if not (fetch or parse) or (
+            not fetch and (self.cache is None or self.__source(url) not in self.cache)
+        ):
+            return False
+        to_fetch.put(url)
+        self.progress.total += 1
+        return True
+
+    def __discover_worker(
+        self,
+        method: DiscoveryMethod | str,
+        events: queue.Queue[str | _Outcome | None],
+    ) -> None:
+        """Stream discovered urls to the coordinating thread."""
+        try:
+            for url in self.discover(method):
+                events.put(url)
+        finally:
+            events.put(None)
+
+    def __fetch_worker(
+        self,
+        to_fetch: queue.Queue[str | None],
+        events: queue.Queue[str | _Outcome | None],
+        parse: bool,  # noqa: FBT001
+    ) -> None:
+        """Fetch urls and parse their pages, reporting every outcome.
+
+        Whatever goes wrong with an url is reported as its outcome's error,
+        so the coordinating thread never waits on an url whose worker died.
+        """
+        while (url := to_fetch.get()) is not None:
+            outcome: _Outcome = _Outcome(url=url)
+            try:
+                source: str = self.__source(url)
+                result, fresh = self.fetch(source)
+                if self.__take_page(
+                    outcome, source, result, events, fresh=fresh, parse=parse
+                ):
+                    continue
+            except Exception as e:  # noqa: BLE001
+                outcome.error = e
+            events.put(outcome)
+
+    def __async_fetch_worker(
+        self,
+        to_fetch: queue.Queue[str | None],
+        events: queue.Queue[str | _Outcome | None],
+        parse: bool,  # noqa: FBT001
+    ) -> None:
+        """Fetch urls on an event loop, ``fetch_workers`` at a time."""
+        asyncio.run(self.__fetch_all_async(to_fetch, events, parse=parse))
+
+    async def __fetch_all_async(
+        self,
+        to_fetch: queue.Queue[str | None],
+        events: queue.Queue[str | _Outcome | None],
+        *,
+        parse: bool,
+    ) -> None:
+        """Run ``fetch_workers`` fetching coroutines over one async client.
+
+        Every coroutine waits for its next url on a thread of its own, so
+        waiting never blocks the event loop.
+        """
+        fetcher: AsyncFetcher = AsyncFetcher(self.transport, self.fetch_workers)
+        with ThreadPoolExecutor(
+            max_workers=self.fetch_workers, thread_name_prefix="fetch-queue"
+        ) as waiting:
+            async with self.transport.async_client(self.fetch_workers) as client:
+                await asyncio.gather(
+                    *(
+                        self.__fetch_coroutine(
+                            fetcher, client, waiting, to_fetch, events, parse=parse
+                        )
+                        for _ in range(self.fetch_workers)
+                    )
+                )
+
+    async def __fetch_coroutine(
+        self,
+        fetcher: AsyncFetcher,
+        client: httpx.AsyncClient,
+        waiting: ThreadPoolExecutor,
+        to_fetch: queue.Queue[str | None],
+        events: queue.Queue[str | _Outcome | None],
+        *,
+        parse: bool,
+    ) -> None:
+        """Fetch urls and parse their pages, reporting every outcome."""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while (url := await loop.run_in_executor(waiting, to_fetch.get)) is not None:
+            outcome: _Outcome = _Outcome(url=url)
+            try:
+                source: str = self.__source(url)
+                result, fresh = await self.fetch_async(fetcher, client, source)
+                if self.__take_page(
+                    outcome, source, result, events, fresh=fresh, parse=parse
+                ):
+                    continue
+            except Exception as e:  # noqa: BLE001
+                outcome.error = e
+            events.put(outcome)
+
+    def __take_page(
+        self,
+        outcome: _Outcome,
+        source: str,
+        result: FetchResult,
+        events: queue.Queue[str | _Outcome | None],
+        *,
+        fresh: bool,
+        parse: bool,
+    ) -> bool:
+        """Fill in the outcome of a fetched page, parsing it if asked to.
+
+        Returns:
+            bool: True if the page was handed to the parse pool, which
+            reports the outcome once it is parsed.
+
+        """
+        outcome.status = result.status
+        outcome.headers = result.headers
+        outcome.fresh = result if fresh else None
+        outcome.source = source if source != outcome.url else None
+        if result.error is not None:
+            outcome.error = result.error
+        elif result.status >= 400:  # noqa: PLR2004
+            outcome.error = f"Status {result.status}"
+        elif parse and self._parse_pool is not None:
+            self.__parse_in_pool(self._parse_pool, result, outcome, events)
+            return True
+        elif parse:
+            outcome.article = self.parse(result)
+        return False
+
+    def __parse_in_pool(
+        self,
+        parse_pool: ProcessPoolExecutor,
+        result: FetchResult,
+        outcome: _Outcome,
+        events: queue.Queue[str | _Outcome | None],
+    ) -> None:
+        """Parse a page on the process pool, reporting once it is parsed.
+
+        A slot is taken before submitting and given back once parsed, so
+        at most ``queue_size`` pages wait on the pool.
+        """
+        self._parse_slots.acquire()
+
+        def report(future: Future[Article]) -> None:
+            self._parse_slots.release()
+            if future.cancelled():
+                outcome.error = "Parsing was cancelled"
+            elif (error := future.exception()) is not None:
+                outcome.error = error
+            else:
+                outcome.article = future.result()
+            events.put(outcome)
+
+        try:
+            future: Future[Article] = parse_pool.submit(
+                parse_page,
+                self.layout.name,
+                result.url,
+                self.__html(result),
+                detect_language=not self.language_batch,
+                streaming=self.streaming,
+            )
+        except BaseException:
+            self._parse_slots.release()
+            raise
+        future.add_done_callback(report)
+
+    def __source(self, url: str) -> str:
+        """Pick the replay url to fetch for an url, a fallback if one won.
+
+        Returns:
+            str: Replay url to fetch.
+
+        """
+        return url if self.resolver is None else self.resolver.preferred(url)
+
+    def __record(
+        self,
+        outcome: _Outcome,
+        events: queue.Queue[str | _Outcome | None],
+        *,
+        parse: bool,
+    ) -> bool:
+        """Cache, store or record the failure of one url.
+
+        Returns:
+            bool: True if the url was handed to the snapshot resolver
+            instead, to be reported again once resolved.
+
+        """
+        if outcome.fresh is not None and outcome.fresh.error is None:
+            self.fetched += 1
+            if self.cache is not None and outcome.status not in UNCACHEABLE_STATUSES:
+                self.cache.put(
+                    outcome.source or outcome.url,
+                    outcome.status,
+                    outcome.headers,
+                    outcome.fresh.content,
+                )
+        if outcome.error is None and not parse:
+            return False
+        if outcome.error is None and not outcome.article:
+            outcome.error = "No article found on the page"
+        if outcome.error is not None:
+            if self.__fall_back(outcome, events):
+                return True
+            self.__record_failure(outcome)
+            return False
+        self._unlabelled.append(outcome)
+        if len(self._unlabelled) >= self.language_batch:
+            self.__store_unlabelled()
+        return False
+
+    def __fall_back(
+        self, outcome: _Outcome, events: queue.Queue[str | _Outcome | None]
+    ) -> bool:
+        """Hand a missing or unparsable page to the snapshot resolver.
+
+        Returns:
+            bool: True if the url was handed over.
+
+        """
+        if self._fallback_pool is None or outcome.fell_back:
+            return False
+        error: BaseException | str = outcome.error or ""
+        if classify(
+            error if isinstance(error, BaseException) else None, outcome.status
+        ) not in {FailureKind.PARSE, FailureKind.MISSING_SNAPSHOT}:
+            return False
+        outcome.fresh = None
+        outcome.fell_back = True
+        self._fallback_pool.submit(self.__fallback_worker, outcome, events)
+        return True
+
+    def __fallback_worker(
+        self, outcome: _Outcome, events: queue.Queue[str | _Outcome | None]
+    ) -> None:
+        """Try the other captures of an url, reporting the winner if any."""
+        try:
+            resolved: tuple[str, tuple[FetchResult, bool, Article]] | None = (
+                self.resolver.resolve(outcome.source or outcome.url, self.__attempt)
+                if self.resolver is not None
+                else None
+            )
+            if resolved is None:
+                outcome.error = f"{outcome.error}, and no other capture held one"
+                return
+            source, (result, fresh, article) = resolved
+            outcome.source = source
+            outcome.status = result.status
+            outcome.headers = result.headers
+            outcome.fresh = result if fresh else None
+            outcome.article = article
+            outcome.error = None
+        except Exception as e:  # noqa: BLE001
+            outcome.error = e
+        finally:
+            events.put(outcome)
+
+    def __attempt(self, source: str) -> tuple[FetchResult, bool, Article] | None:
+        """Fetch and parse a fallback capture.
+
+        Returns:
+            tuple[FetchResult, bool, Article] | None: Page, whether it came
+            from the network, and its article, None if it holds none.
+
+        """
+        result, fresh = self.fetch(source)
+        if result.error is not None or result.status >= 400:  # noqa: PLR2004
+            return None
+        article: Article = self.parse(result)
+        return (result, fresh, article) if article else None
+
+    def __store_unlabelled(self) -> None:
+        """Detect the languages of the parsed articles at once and store them."""
+        outcomes: list[_Outcome] = self._unlabelled
+        self._unlabelled = []
+        articles: list[Article] = [outcome.article or {} for outcome in outcomes]
+        if self.language_batch:
+            languages: list[str] = get_language_detector().detect_many(
+                (str(article["title"] or ""), str(article["article_content"] or ""))
+                for article in articles
+            )
+            for article, language in zip(articles, languages, strict=True):
+                article["language"] = language
+        for outcome, article in zip(outcomes, articles, strict=True):
+            stored: Article = {
+                **article,
+                **snapshot_fields(outcome.source or outcome.url, outcome.headers),
+            }
+            self.__store(stored)
+            if self.worker is None:
+                self.resume_index.add(outcome.url)
+            self.retry_queue.complete(outcome.url, self.worker)
+            self.stored += 1
+
+    def __store(self, article: Article) -> None:
+        """Store an article, or merge it into the one it nearly duplicates.
+
+        An article stored from another capture, as when recrawled, is
+        replaced by the new capture instead.
+        """
+        url: str = str(article["url"])
+        key: str = article_key(url)
+        previous_url: str | None = self.stored_urls.get(key)
+        if previous_url is not None and previous_url != url:
+            self.store.replace(previous_url, article)
+            self.stored_urls[key] = url
+            return
+        kept_url: str | None = (
+            self.duplicates.add(url, str(article["article_content"] or ""))
+            if self.duplicates is not None
+            else None
+        )
+        kept: Article | None = self.store.get(kept_url) if kept_url else None
+        if kept is None:
+            self.store.append(article)
+            self.stored_urls[key] = url
+            return
+        self.store.add_merged(url, str(kept_url))
+        self.store.append(merge_articles(kept, article))
+        self.merged += 1
+
+    def __record_failure(self, outcome: _Outcome) -> None:
+        """Record a failed attempt in the retry queue."""
+        error: BaseException | str = outcome.error or ""
+        kind: FailureKind = classify(
+            error if isinstance(error, BaseException) else None, outcome.status
+        )
+        delay: float | None = self.retry_queue.fail(
+            outcome.url, kind, str(error), self.worker
+        )
+        self.failed += 1
+        print(f"An error occurred: {error}.")
+        print(f"url: {outcome.url}")
+        if delay is None:
+            print(f"Not retrying the article after a {kind} failure.")
+        else:
+            print(f"Retrying the article in {delay:.0f}s after a {kind} failure.")
+
+    def report(self) -> str:
+        """Summarize the run.
+
+        Returns:
+            str: Pages fetched, articles stored, failures and queue state.
+
+        """
+        return (
+            f"Fetched {self.fetched} pages, stored {self.stored} articles "
+            f"({self.merged} merged into near-duplicates), {self.failed} failures; "
+            f"{len(self.store)} articles stored in total.\n"
+            f"{self.transport.report()}\n"
+            f"Queue: {self.retry_queue.report()}"
+        )
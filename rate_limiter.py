@@ -0,0 +1,245 @@
+"""Rate limiters shared by the scrapers."""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import orjson
+
+BACKOFF_STATUSES: frozenset[int] = frozenset({429, 503})
+
+
+class TokenBucket:
+    """Global token bucket rate limiter.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    Every request takes one token; when the bucket is empty the caller is
+    handed a reservation and waits until its token has been refilled, so
+    concurrent callers are spaced out evenly instead of bursting together.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        """Initialize token bucket.
+
+        Raises:
+            ValueError: If rate or capacity is not positive.
+
+        """
+        if rate <= 0 or capacity <= 0:
+            message: str = "Rate and capacity must be positive."
+            raise ValueError(message)
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self._tokens: float = capacity
+        self._updated: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token.
+
+        Returns:
+            float: Seconds to wait before the token may be used.
+
+        """
+        with self._lock:
+            now: float = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        delay: float = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """Wait until a token is available without blocking the event loop."""
+        delay: float = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def record(
+        self, status: int | None, latency: float, retry_after: str | None = None
+    ) -> None:
+        """Take feedback from a response; a fixed rate bucket ignores it."""
+
+
+def parse_retry_after(retry_after: str | None) -> float:
+    """Parse a Retry-After header.
+
+    Returns:
+        float: Seconds to wait, 0 if the header is missing or malformed.
+
+    """
+    if not retry_after:
+        return 0.0
+    if retry_after.strip().isdigit():
+        return float(retry_after.strip())
+    try:
+        retry_at: datetime = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket whose rate follows server feedback (AIMD).
+
+    Every healthy response adds ``increase`` requests per second to the
+    rate. A 429 or 503, a failed request or a latency well above the
+    running average multiplies it by ``decrease``. The average follows
+    every response, slow ones included, so a lasting rise in latency
+    only backs off until the average has caught up. A ``Retry-After``
+    header pauses every caller until it has passed. The learned rate is
+    saved to ``state_file`` so the next run starts where this one ended;
+    an unreadable state file is ignored.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.25,
+        min_rate: float = 1 / 120,
+        max_rate: float = 4.0,
+        increase: float = 0.01,
+        decrease: float = 0.5,
+        latency_factor: float = 3.0,
+        state_file: str | None = "rate_limiter.json",
+    ) -> None:
+        """Initialize adaptive rate limiter.
+
+        Parameters
+        ----------
+        rate : float
+            Starting rate in requests per second, unless a learned rate was
+            saved by an earlier run.
+        min_rate : float
+            Rate never backed off below.
+        max_rate : float
+            Rate never sped up beyond.
+        increase : float
+            Requests per second added after each healthy response.
+        decrease : float
+            Factor the rate is multiplied by when backing off.
+        latency_factor : float
+            Latency, relative to the running average, treated as overload.
+        state_file : str | None
+            File the learned rate is kept in between runs.
+
+        """
+        self.state_file: Path | None = Path(state_file) if state_file else None
+        if self.state_file is not None and self.state_file.is_file():
+            rate = self.__saved_rate(self.state_file, rate)
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        super().__init__(rate=min(max(rate, min_rate), max_rate))
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self.latency_factor: float = latency_factor
+        self.latency: float = 0.0
+        self._paused_until: float = 0.0
+        self._saved_at: float = 0.0
+
+    @staticmethod
+    def __saved_rate(state_file: Path, default: float) -> float:
+        """Read the rate saved by an earlier run.
+
+        Returns:
+            float: Saved rate, ``default`` if the file cannot be read.
+
+        """
+        try:
+            state: object = orjson.loads(state_file.read_bytes())
+        except (OSError, orjson.JSONDecodeError) as e:
+            print(f"Ignoring unreadable rate limiter state {state_file}: {e}")
+            return default
+        rate: object = state.get("rate") if isinstance(state, dict) else None
+        return float(rate) if isinstance(rate, int | float) else default
+
+    def _reserve(self) -> float:
+        """Take a token, honouring any Retry-After pause.
+
+        Returns:
+            float: Seconds to wait before the token may be used.
+
+        """
+        delay: float = super()._reserve()
+        return max(delay, self._paused_until - time.monotonic())
+
+    def record(
+        self, status: int | None, latency: float, retry_after: str | None = None
+    ) -> None:
+        """Adjust the rate to a response.
+
+        Parameters
+        ----------
+        status : int | None
+            Response status, None if the request failed outright.
+        latency : float
+            Seconds the request took.
+        retry_after : str | None
+            Retry-After header of the response.
+
+        """
+        pause: float = parse_retry_after(retry_after)
+        with self._lock:
+            overloaded: bool = (
+                status is None
+                or status in BACKOFF_STATUSES
+                or status >= 500  # noqa: PLR2004
+                or pause > 0
+                or bool(self.latency and latency > self.latency_factor * self.latency)
+            )
+            if overloaded:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            if status is not None:
+                self.latency = (
+                    0.8 * self.latency + 0.2 * latency if self.latency else latency
+                )
+            if pause:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        if overloaded or time.monotonic() - self._saved_at > 10:  # noqa: PLR2004
+            self.save()
+
+    def save(self) -> None:
+        """Persist the learned rate.
+
+        The rate is written to a temporary file of its own and moved over
+        the state file, so threads and processes saving at once never
+        replace each other's files. A failed save is reported, not raised,
+        since it happens on the fetch path.
+        """
+        if self.state_file is None:
+            return
+        with self._lock:
+            self._saved_at = time.monotonic()
+            state: bytes = orjson.dumps({"rate": self.rate})
+            try:
+                descriptor, name = tempfile.mkstemp(
+                    dir=self.state_file.parent,
+                    prefix=f"{self.state_file.name}.",
+                    suffix=".partial",
+                )
+            except OSError as e:
+                print(f"Could not save the rate limiter state {self.state_file}: {e}")
+                return
+            partial: Path = Path(name)
+            try:
+                with os.fdopen(descriptor, "wb") as partial_file:
+                    partial_file.write(state)
+                partial.replace(self.state_file)
+            except OSError as e:
+                partial.unlink(missing_ok=True)
+                print(f"Could not save the rate limiter state {self.state_file}: {e}")
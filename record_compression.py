@@ -0,0 +1,114 @@
+"""Per-record zstd compression with dictionaries trained on the corpus."""
+
+from collections.abc import Iterable, Mapping
+
+import zstandard
+
+ZSTD_MAGIC: bytes = b"\x28\xb5\x2f\xfd"
+
+
+def is_compressed(value: bytes) -> bool:
+    """Check whether a stored value is a zstd frame.
+
+    Returns:
+        bool: True for a zstd frame, False for plain text or JSON.
+
+    """
+    return value[:4] == ZSTD_MAGIC
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 1 << 17) -> bytes:
+    """Train a zstd dictionary on sample records.
+
+    Returns:
+        bytes: Dictionary, carrying its own id.
+
+    Raises:
+        ValueError: If the samples are too few or too small to train on.
+
+    """
+    try:
+        return zstandard.train_dictionary(size, list(samples)).as_bytes()
+    except zstandard.ZstdError as e:
+        message: str = f"Cannot train a dictionary on these records: {e}"
+        raise ValueError(message) from e
+
+
+def dictionary_id(dictionary: bytes) -> int:
+    """Read the id a dictionary is referred to by in the frames it compressed.
+
+    Returns:
+        int: Dictionary id.
+
+    """
+    return zstandard.ZstdCompressionDict(dictionary).dict_id()
+
+
+class RecordCodec:
+    """Compress records one by one, each as its own zstd frame.
+
+    Every frame names the dictionary it was compressed with, so records
+    compressed with an older dictionary still read back after retraining,
+    and reading one record never touches another.
+    """
+
+    def __init__(
+        self, dictionaries: Mapping[int, bytes], current: int, level: int = 9
+    ) -> None:
+        """Initialize record codec.
+
+        Parameters
+        ----------
+        dictionaries : Mapping[int, bytes]
+            Every dictionary records may have been compressed with, by id.
+        current : int
+            Id of the dictionary new records are compressed with.
+        level : int
+            Compression level.
+
+        """
+        self.dictionaries: dict[int, zstandard.ZstdCompressionDict] = {
+            dictionary_id: zstandard.ZstdCompressionDict(dictionary)
+            for dictionary_id, dictionary in dictionaries.items()
+        }
+        self.current: int = current
+        self.level: int = level
+        self._compressor: zstandard.ZstdCompressor = zstandard.ZstdCompressor(
+            level=level, dict_data=self.dictionaries[current]
+        )
+        self._decompressors: dict[int, zstandard.ZstdDecompressor] = {}
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a record with the current dictionary.
+
+        Returns:
+            bytes: Zstd frame.
+
+        """
+        return self._compressor.compress(data)
+
+    def decompress(self, frame: bytes) -> bytes:
+        """Decompress a record with the dictionary it names.
+
+        Returns:
+            bytes: Record, as it is if it was stored uncompressed.
+
+        Raises:
+            ValueError: If the dictionary the record names is unknown.
+
+        """
+        if not is_compressed(frame):
+            return frame
+        frame_dictionary: int = zstandard.get_frame_parameters(frame).dict_id
+        decompressor: zstandard.ZstdDecompressor | None = self._decompressors.get(
+            frame_dictionary
+        )
+        if decompressor is None:
+            if frame_dictionary and frame_dictionary not in self.dictionaries:
+                message: str = f"Unknown zstd dictionary {frame_dictionary}."
+                raise ValueError(message)
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=self.dictionaries.get(frame_dictionary)
+            )
+            self._decompressors[frame_dictionary] = decompressor
+        return decompressor.decompress(frame)
@@ -0,0 +1,187 @@
+"""Incremental recrawl of stored articles."""
+
+from collections.abc import Mapping
+from email.utils import parsedate_to_datetime
+
+import orjson
+import requests
+
+from cdx_discovery import Capture, CdxDiscovery
+from response_cache import ResponseCache
+from transport import Transport, get_transport
+from wayback import WAYBACK_URL, canonical_url, original_url, split_archive_url
+
+type Article = dict[str, str | list[str]]
+
+
+def article_key(url: str) -> str:
+    """Key an article by its original url, whatever snapshot it came from.
+
+    Returns:
+        str: Canonical url of the original, without its scheme.
+
+    """
+    return canonical_url(url).removeprefix("https://")
+
+
+def _header(headers: Mapping[str, str], name: str) -> str:
+    """Read a header case insensitively."""
+    return next(
+        (value for key, value in headers.items() if key.lower() == name), ""
+    )
+
+
+def snapshot_timestamp(url: str, headers: Mapping[str, str]) -> str:
+    """Find the capture timestamp of a replayed page.
+
+    The ``Memento-Datetime`` header is preferred, since the archive may
+    redirect to a capture other than the one in the requested url.
+
+    Returns:
+        str: Fourteen digit capture timestamp, empty if unknown.
+
+    """
+    memento_datetime: str = _header(headers, "memento-datetime")
+    if memento_datetime:
+        try:
+            return parsedate_to_datetime(memento_datetime).strftime("%Y%m%d%H%M%S")
+        except (TypeError, ValueError):
+            pass
+    try:
+        return split_archive_url(url)[0]
+    except ValueError:
+        return ""
+
+
+def snapshot_fields(url: str, headers: Mapping[str, str]) -> dict[str, str]:
+    """Collect what a later recrawl needs to tell whether an article changed.
+
+    Returns:
+        dict[str, str]: Snapshot timestamp, ETag and Last-Modified.
+
+    """
+    return {
+        "snapshot_timestamp": snapshot_timestamp(url, headers),
+        "etag": _header(headers, "etag"),
+        "last_modified": _header(headers, "last-modified"),
+    }
+
+
+class Recrawl:
+    """Find stored articles with a newer snapshot than the one stored.
+
+    The CDX index is read once and every article whose latest capture is
+    newer than its stored snapshot is refetched. If the index cannot be
+    read, each article is revalidated with a conditional request for its
+    latest capture instead; an unchanged article costs a 304.
+    """
+
+    def __init__(
+        self,
+        articles: dict[str, Article],
+        discovery: CdxDiscovery,
+        transport: Transport | None = None,
+        cache: ResponseCache | None = None,
+    ) -> None:
+        """Initialize recrawl.
+
+        Parameters
+        ----------
+        articles : dict[str, Article]
+            Latest stored version of every article, keyed by ``article_key``.
+        discovery : CdxDiscovery
+            Lookup of the latest capture of every article.
+        transport : Transport | None
+            Transport used for conditional requests, the shared one by default.
+        cache : ResponseCache | None
+            Cache newer captures found by conditional requests are kept in,
+            so they are not downloaded twice.
+
+        """
+        self.articles: dict[str, Article] = articles
+        self.discovery: CdxDiscovery = discovery
+        self.transport: Transport = transport or get_transport()
+        self.cache: ResponseCache | None = cache
+
+    @staticmethod
+    def stored_timestamp(article: Article) -> str:
+        """Get the snapshot timestamp of a stored article.
+
+        Returns:
+            str: Capture timestamp, empty if unknown.
+
+        """
+        timestamp: str | list[str] = article.get("snapshot_timestamp", "")
+        if isinstance(timestamp, str) and timestamp:
+            return timestamp
+        return snapshot_timestamp(str(article.get("url", "")), {})
+
+    def changed(self) -> list[str]:
+        """Find the replay urls of every article with a newer snapshot.
+
+        Returns:
+            list[str]: Replay urls to refetch.
+
+        """
+        try:
+            return self.changed_by_cdx()
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            print(f"CDX lookup failed: {e}. Revalidating every article.")
+        return [
+            replay_url
+            for article in self.articles.values()
+            if (replay_url := self.revalidate(article)) is not None
+        ]
+
+    def changed_by_cdx(self) -> list[str]:
+        """Compare the latest capture of every article with the stored one.
+
+        Returns:
+            list[str]: Replay urls of newer captures.
+
+        """
+        changed: list[str] = []
+        captures: dict[str, Capture] = self.discovery.resolve()
+        for capture in captures.values():
+            article: Article | None = self.articles.get(article_key(capture.original))
+            if article is not None and capture.timestamp > self.stored_timestamp(
+                article
+            ):
+                changed.append(capture.archive_url)
+        return changed
+
+    def revalidate(self, article: Article) -> str | None:
+        """Ask for the latest capture of an article unless it is unchanged.
+
+        Returns:
+            str | None: Replay url of a newer capture, None if there is none.
+
+        """
+        headers: dict[str, str] = {}
+        if article.get("etag"):
+            headers["If-None-Match"] = str(article["etag"])
+        if article.get("last_modified"):
+            headers["If-Modified-Since"] = str(article["last_modified"])
+        latest_url: str = f"{WAYBACK_URL}/web/{original_url(str(article['url']))}"
+        try:
+            response: requests.Response = self.transport.get(
+                latest_url, headers=headers
+            )
+            if response.status_code == requests.codes.not_modified:
+                return None
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"An error occurred: {e}")
+            return None
+        if snapshot_timestamp(
+            response.url, response.headers
+        ) <= self.stored_timestamp(article):
+            return None
+        if self.cache is not None:
+            self.cache.put(
+                response.url,
+                response.status_code,
+                dict(response.headers),
+                response.content,
+            )
+        return response.url
@@ -0,0 +1,331 @@
+"""On-disk cache of raw responses, stored as WARC records."""
+
+import fcntl
+import gzip
+import hashlib
+import os
+import threading
+import uuid
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from http import HTTPStatus
+from pathlib import Path
+
+import orjson
+
+from metrics import get_metrics
+from wayback import split_archive_url
+
+CACHED_HEADERS: tuple[str, ...] = (
+    "content-type",
+    "etag",
+    "last-modified",
+    "memento-datetime",
+)
+UNCACHEABLE_STATUSES: frozenset[int] = frozenset({408, 429, 500, 502, 503, 504})
+REVISIT_PROFILE: str = (
+    "http://netpreserve.org/warc/1.1/revisit/identical-payload-digest"
+)
+
+
+@dataclass
+class CachedResponse:
+    """A response read back from the cache."""
+
+    url: str
+    status: int
+    content: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        """Body decoded with the charset the server declared."""
+        try:
+            return self.content.decode(
+                header_charset(self.headers) or "utf-8", errors="replace"
+            )
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+
+def header_charset(headers: Mapping[str, str]) -> str | None:
+    """Read the charset declared in a Content-Type header.
+
+    Returns:
+        str | None: Declared charset, None if there is none.
+
+    """
+    content_type: str = next(
+        (value for name, value in headers.items() if name.lower() == "content-type"),
+        "",
+    )
+    for parameter in content_type.split(";")[1:]:
+        name, _, value = parameter.strip().partition("=")
+        if name.lower() == "charset" and value:
+            return value.strip("\"'")
+    return None
+
+
+def cache_key(url: str) -> str:
+    """Key a response by capture timestamp and original url.
+
+    Returns:
+        str: Hex sha256 key.
+
+    """
+    try:
+        timestamp, original = split_archive_url(url)
+        identity: str = f"{timestamp} {original}"
+    except ValueError:
+        identity = url
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Content addressed cache of raw responses.
+
+    Responses are appended as gzip compressed WARC ``response`` records to
+    rolling ``responses-NNNNN.warc.gz`` files, one gzip member per record,
+    so any record can be read back on its own. ``index.jsonl`` maps each
+    url key to the file, offset and length of its record. Identical
+    payloads are stored once: a later url that returned one gets a WARC
+    ``revisit`` record of its own status and headers, and its index entry
+    also points at the record holding the payload.
+
+    Records and index entries are appended under file locks, and a miss
+    first reads the index entries other processes appended since, so
+    worker processes can share a cache. Writes also hold a thread lock, so
+    threads can write to it while others read from it.
+    """
+
+    def __init__(
+        self, directory: str | Path = "cache", max_file_bytes: int = 1 << 30
+    ) -> None:
+        """Initialize response cache."""
+        self.directory: Path = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_file_bytes: int = max_file_bytes
+        self.index_path: Path = self.directory / "index.jsonl"
+        self.index: dict[str, dict[str, str | int]] = {}
+        self.digests: dict[str, dict[str, str | int]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._index_offset: int = 0
+        self.__reload()
+
+    def __reload(self) -> None:
+        """Index the entries appended to ``index.jsonl`` since the last read.
+
+        A line cut short by a crashed writer is skipped.
+        """
+        try:
+            with self.index_path.open("rb") as index_file:
+                index_file.seek(self._index_offset)
+                for line in index_file:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._index_offset += len(line)
+                    try:
+                        self.__index(orjson.loads(line))
+                    except orjson.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def __index(self, entry: dict[str, str | int]) -> None:
+        """Add an entry to the in-memory index."""
+        self.index[str(entry["key"])] = entry
+        self.digests.setdefault(str(entry["digest"]), entry)
+
+    def __contains__(self, url: str) -> bool:
+        """Check whether a response for url is cached."""
+        key: str = cache_key(url)
+        if key not in self.index:
+            with self._lock:
+                self.__reload()
+        return key in self.index
+
+    def __len__(self) -> int:
+        """Count cached responses."""
+        return len(self.index)
+
+    def __warc_file(self) -> Path:
+        """Return the WARC file new records are appended to."""
+        warc_files: list[Path] = sorted(self.directory.glob("responses-*.warc.gz"))
+        if warc_files and warc_files[-1].stat().st_size < self.max_file_bytes:
+            return warc_files[-1]
+        return self.directory / f"responses-{len(warc_files):05d}.warc.gz"
+
+    def put(
+        self,
+        url: str,
+        status: int,
+        headers: dict[str, str],
+        content: bytes,
+    ) -> None:
+        """Store a raw response."""
+        digest: str = hashlib.sha256(content).hexdigest()
+        kept_headers: dict[str, str] = {
+            name.lower(): value
+            for name, value in headers.items()
+            if name.lower() in CACHED_HEADERS
+        }
+        with self._lock, self.index_path.open("ab") as index_file:
+            fcntl.flock(index_file, fcntl.LOCK_EX)
+            self.__reload()
+            shared: dict[str, str | int] | None = self.digests.get(digest)
+            location: dict[str, str | int] = self.__write_record(
+                url, status, kept_headers, content, digest, shared
+            )
+            if shared is not None:
+                location |= {
+                    "payload_file": shared.get("payload_file", shared["file"]),
+                    "payload_offset": shared.get("payload_offset", shared["offset"]),
+                    "payload_length": shared.get("payload_length", shared["length"]),
+                }
+            entry: dict[str, str | int] = {
+                "key": cache_key(url),
+                "url": url,
+                "status": status,
+                "digest": digest,
+                **location,
+            }
+            torn: bool = index_file.seek(0, os.SEEK_END) > self._index_offset
+            index_file.write(b"\n" * torn + orjson.dumps(entry) + b"\n")
+            index_file.flush()
+            self._index_offset = index_file.tell()
+            self.__index(entry)
+
+    def __write_record(
+        self,
+        url: str,
+        status: int,
+        headers: dict[str, str],
+        content: bytes,
+        digest: str,
+        shared: dict[str, str | int] | None = None,
+    ) -> dict[str, str | int]:
+        """Append a WARC response record, or a revisit record of a shared payload.
+
+        Returns:
+            dict[str, str | int]: Record id, file, offset and length of the
+            record.
+
+        """
+        reason: str = HTTPStatus(status).phrase if status in HTTPStatus else ""
+        http_block: bytes = (
+            f"HTTP/1.1 {status} {reason}\r\n".encode()
+            + "".join(
+                f"{name}: {value}\r\n" for name, value in headers.items()
+            ).encode()
+            + b"\r\n"
+            + (content if shared is None else b"")
+        )
+        record_id: str = f"<urn:uuid:{uuid.uuid4()}>"
+        revisit: str = (
+            ""
+            if shared is None
+            else (
+                f"WARC-Profile: {REVISIT_PROFILE}\r\n"
+                f"WARC-Refers-To-Target-URI: {shared['url']}\r\n"
+                + (
+                    f"WARC-Refers-To: {shared['record_id']}\r\n"
+                    if "record_id" in shared
+                    else ""
+                )
+            )
+        )
+        warc_headers: str = (
+            "WARC/1.1\r\n"
+            f"WARC-Type: {'response' if shared is None else 'revisit'}\r\n"
+            f"WARC-Record-ID: {record_id}\r\n"
+            f"WARC-Date: {datetime.now(UTC).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"WARC-Payload-Digest: sha256:{digest}\r\n"
+            f"{revisit}"
+            "Content-Type: application/http;msgtype=response\r\n"
+            f"Content-Length: {len(http_block)}\r\n"
+            "\r\n"
+        )
+        record: bytes = gzip.compress(
+            warc_headers.encode() + http_block + b"\r\n\r\n"
+        )
+        warc_file: Path = self.__warc_file()
+        with warc_file.open("ab") as warc:
+            fcntl.flock(warc, fcntl.LOCK_EX)
+            offset: int = warc.seek(0, os.SEEK_END)
+            warc.write(record)
+            warc.flush()
+            os.fsync(warc.fileno())
+        return {
+            "record_id": record_id,
+            "file": warc_file.name,
+            "offset": offset,
+            "length": len(record),
+        }
+
+    def __read_record(
+        self, warc_file: str, offset: int, length: int
+    ) -> tuple[dict[str, str], bytes]:
+        """Read the HTTP headers and payload of a record.
+
+        Returns:
+            tuple[dict[str, str], bytes]: Headers, lower cased, and payload,
+            empty for a revisit record.
+
+        """
+        with (self.directory / warc_file).open("rb") as warc:
+            warc.seek(offset)
+            record: bytes = gzip.decompress(warc.read(length))
+        _, _, http_block = record.partition(b"\r\n\r\n")
+        head, _, content = http_block.removesuffix(b"\r\n\r\n").partition(
+            b"\r\n\r\n"
+        )
+        header_lines: list[str] = head.decode("latin-1").split("\r\n")[1:]
+        headers: dict[str, str] = {}
+        for header_line in header_lines:
+            name, _, value = header_line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return headers, content
+
+    def get(self, url: str) -> CachedResponse | None:
+        """Read a cached response.
+
+        Returns:
+            CachedResponse | None: Cached response, None if not cached.
+
+        """
+        key: str = cache_key(url)
+        entry: dict[str, str | int] | None = self.index.get(key)
+        if entry is None:
+            with self._lock:
+                self.__reload()
+            entry = self.index.get(key)
+        if entry is None:
+            get_metrics().inc("cache_misses_total")
+            return None
+        get_metrics().inc("cache_hits_total")
+        headers, content = self.__read_record(
+            str(entry["file"]), int(entry["offset"]), int(entry["length"])
+        )
+        if "payload_file" in entry:
+            _, content = self.__read_record(
+                str(entry["payload_file"]),
+                int(entry["payload_offset"]),
+                int(entry["payload_length"]),
+            )
+        return CachedResponse(
+            url=url, status=int(entry["status"]), content=content, headers=headers
+        )
+
+    def __iter__(self) -> Iterator[CachedResponse]:
+        """Iterate over every cached response.
+
+        Yields:
+            CachedResponse: Cached response.
+
+        """
+        for entry in list(self.index.values()):
+            cached: CachedResponse | None = self.get(str(entry["url"]))
+            if cached is not None:
+                yield cached
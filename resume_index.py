@@ -0,0 +1,160 @@
+"""Memory mapped index of the urls already scraped."""
+
+import hashlib
+import heapq
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from itertools import chain
+from pathlib import Path
+
+from article_db import ArticleDatabase
+from recrawl import article_key
+
+
+def url_hash(url: str) -> int:
+    """Hash an url to 64 bits.
+
+    Returns:
+        int: Unsigned 64 bit hash.
+
+    """
+    return int.from_bytes(
+        hashlib.blake2b(url.encode(), digest_size=8).digest(), "little"
+    )
+
+
+def article_hash(url: str) -> int:
+    """Hash the article an url names, whatever capture it points at.
+
+    Returns:
+        int: Unsigned 64 bit hash of the url's ``article_key``.
+
+    """
+    return url_hash(article_key(url))
+
+
+class ResumeIndex:
+    """Sorted file of 64 bit article hashes.
+
+    The file is memory mapped and searched in place, so answering "already
+    scraped?" costs a binary search over 8 bytes per url and never reads an
+    article. Urls added during a run are kept in memory and merged into the
+    file by ``flush``. Urls are indexed by ``article_hash``, so every
+    capture of a scraped article counts as scraped. The index of a store
+    also records the store's generation when written, and is only rebuilt
+    once the store has had urls added by someone else.
+    """
+
+    def __init__(
+        self, path: str | Path = "resume.idx", store: ArticleDatabase | None = None
+    ) -> None:
+        """Initialize resume index."""
+        self.path: Path = Path(path)
+        self.store: ArticleDatabase | None = store
+        self.generation_path: Path = self.path.with_name(f"{self.path.name}.generation")
+        self._added: set[int] = set()
+        self._map: mmap.mmap | None = None
+        self._view: memoryview | None = None
+        self._hashes: memoryview | array[int] = array("Q")
+        self.__map()
+
+    @classmethod
+    def for_store(cls, store: ArticleDatabase) -> "ResumeIndex":
+        """Open the index kept next to an article database.
+
+        Returns:
+            ResumeIndex: Index of the stored and merged urls, rebuilt when
+            out of date.
+
+        """
+        resume_index: ResumeIndex = cls(store.path.with_suffix(".idx"), store)
+        if resume_index.generation() != store.generation():
+            resume_index.rebuild(chain(store.urls(), store.merged_urls()))
+        return resume_index
+
+    def generation(self) -> int | None:
+        """Read the store generation the index was last written at.
+
+        Returns:
+            int | None: Store generation, None if it was never recorded.
+
+        """
+        try:
+            return int(self.generation_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def __map(self) -> None:
+        """Map the index file, if there is one."""
+        if not self.path.is_file() or not self.path.stat().st_size:
+            return
+        with self.path.open("rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._hashes = self._view.cast("Q")
+
+    def __unmap(self) -> None:
+        """Release the mapped index file."""
+        if isinstance(self._hashes, memoryview):
+            self._hashes.release()
+        if self._view is not None:
+            self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._hashes = array("Q")
+        self._view = None
+        self._map = None
+
+    def __len__(self) -> int:
+        """Count indexed urls."""
+        return len(self._hashes) + len(self._added)
+
+    def __contains__(self, url: str) -> bool:
+        """Check whether an url is indexed."""
+        return self.__contains_hash(article_hash(url))
+
+    def __contains_hash(self, hash_: int) -> bool:
+        """Check whether an url hash is indexed."""
+        if hash_ in self._added:
+            return True
+        position: int = bisect_left(self._hashes, hash_)
+        return position < len(self._hashes) and self._hashes[position] == hash_
+
+    def add(self, url: str) -> None:
+        """Index an url."""
+        hash_: int = article_hash(url)
+        if not self.__contains_hash(hash_):
+            self._added.add(hash_)
+
+    def flush(self) -> None:
+        """Merge the urls added since the last flush into the index file."""
+        if self._added:
+            self.__write(heapq.merge(self._hashes, sorted(self._added)))
+
+    def rebuild(self, urls: Iterable[str]) -> None:
+        """Replace the index with the given urls."""
+        self.__write(sorted({article_hash(url) for url in urls}))
+
+    def __write(self, hashes: Iterable[int]) -> None:
+        """Atomically replace the index file with sorted hashes."""
+        sorted_hashes: array[int] = array("Q", hashes)
+        partial: Path = self.path.with_name(f"{self.path.name}.partial")
+        with partial.open("wb") as index_file:
+            sorted_hashes.tofile(index_file)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        self.__unmap()
+        partial.replace(self.path)
+        self._added.clear()
+        self.__map()
+        if self.store is not None:
+            partial.write_text(str(self.store.generation()), encoding="utf-8")
+            partial.replace(self.generation_path)
+
+    def close(self) -> None:
+        """Flush added urls and release the index file."""
+        self.flush()
+        self.__unmap()
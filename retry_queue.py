@@ -0,0 +1,526 @@
+"""Durable work queue of article urls with retries and dead letters."""
+
+import sqlite3
+import time
+from collections.abc import Iterable
+from enum import StrEnum
+from pathlib import Path
+from typing import Protocol
+
+import httpx
+import requests
+
+from metrics import get_metrics
+from recrawl import article_key
+
+MISSING_SNAPSHOT_STATUSES: frozenset[int] = frozenset({404, 410})
+
+
+class FailureKind(StrEnum):
+    """Why fetching or parsing an article failed."""
+
+    NETWORK = "network"
+    PARSE = "parse"
+    MISSING_SNAPSHOT = "missing-snapshot"
+
+
+class WorkState(StrEnum):
+    """Where an url is in the queue."""
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    DEAD = "dead"
+
+
+DEFAULT_LEASE: float = 300.0
+DEFAULT_MAX_ATTEMPTS: dict[FailureKind, int] = {
+    FailureKind.NETWORK: 6,
+    FailureKind.PARSE: 2,
+    FailureKind.MISSING_SNAPSHOT: 1,
+}
+
+
+def classify(error: BaseException | None = None, status: int = 0) -> FailureKind:
+    """Classify a failure.
+
+    A 404 or 410 means the archive holds no usable snapshot; any other
+    error status or transport error is assumed to be transient. Anything
+    else, including a page the article could not be read from, is a
+    parse failure.
+
+    Returns:
+        FailureKind: Kind of failure.
+
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    if status in MISSING_SNAPSHOT_STATUSES:
+        return FailureKind.MISSING_SNAPSHOT
+    if (
+        isinstance(error, (requests.RequestException, httpx.HTTPError))
+        or status >= 400  # noqa: PLR2004
+    ):
+        return FailureKind.NETWORK
+    return FailureKind.PARSE
+
+
+class WorkQueue(Protocol):
+    """What the pipeline needs from a work queue.
+
+    ``RetryQueue`` keeps the queue in a local SQLite database that the
+    workers of one machine share; a queue served to several machines only
+    has to provide these methods.
+    """
+
+    def add(self, urls: Iterable[str], priority: int = 0) -> int:
+        """Queue urls whose article is not in the queue yet."""
+
+    def replace(self, urls: Iterable[str], priority: int = 0) -> int:
+        """Queue urls in place of the earlier urls of their articles."""
+
+    def due(self, now: float | None = None) -> list[str]:
+        """List the pending urls that may be tried now."""
+
+    def claim(
+        self, owner: str, limit: int = 1, lease: float = DEFAULT_LEASE
+    ) -> list[str]:
+        """Lease due urls to a worker."""
+
+    def heartbeat(self, owner: str, lease: float = DEFAULT_LEASE) -> int:
+        """Renew every lease a worker holds."""
+
+    def release(self, owner: str) -> int:
+        """Give up every lease a worker holds."""
+
+    def leased_to_others(self, owner: str) -> int:
+        """Count the urls leased to other workers."""
+
+    def complete(self, url: str, owner: str | None = None) -> bool:
+        """Mark an url as done, if ``owner`` still holds its lease."""
+
+    def fail(
+        self, url: str, kind: FailureKind, error: str, owner: str | None = None
+    ) -> float | None:
+        """Record a failed attempt and schedule the next one."""
+
+    def report(self) -> str:
+        """Summarize the queue."""
+
+
+class RetryQueue:
+    """Work queue and failure ledger kept in SQLite.
+
+    Every url is a row holding its state, priority, attempt count, the time
+    it may be retried at and the last failure. Rows are unique by
+    ``article_key`` too, so an article is queued once whichever capture urls
+    name it. Failed urls are retried on an exponential backoff schedule
+    until their kind of failure runs out of attempts, then they are moved to
+    the dead letters. A resumed run only sees urls that are pending and due,
+    highest priority and fewest attempts first, and takes back urls whose
+    lease ran out.
+
+    Workers sharing the queue ``claim`` urls instead: a claimed url is
+    leased to its worker, which renews the lease with ``heartbeat`` while
+    it works. A lease that runs out, because its worker died, makes the
+    url claimable again, so every url is worked on by one worker at a
+    time and none is lost.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "retry_queue.sqlite3",
+        base_delay: float = 60.0,
+        max_delay: float = 6 * 3600.0,
+        max_attempts: dict[FailureKind, int] | None = None,
+    ) -> None:
+        """Initialize retry queue.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite database the queue is kept in.
+        base_delay : float
+            Seconds to wait before the first retry, doubled on every
+            further attempt.
+        max_delay : float
+            Longest wait between two attempts.
+        max_attempts : dict[FailureKind, int] | None
+            Attempts allowed per kind of failure before an url is given up.
+
+        """
+        self.path: Path = Path(path)
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.max_attempts: dict[FailureKind, int] = {
+            **DEFAULT_MAX_ATTEMPTS,
+            **(max_attempts or {}),
+        }
+        self.connection: sqlite3.Connection = sqlite3.connect(self.path, timeout=30.0)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS work (
+                    url TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL DEFAULT 0,
+                    failure TEXT,
+                    error TEXT,
+                    updated REAL NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL NOT NULL DEFAULT 0,
+                    key TEXT
+                )
+                """
+            )
+            columns: set[str] = {
+                name
+                for _, name, *_ in self.connection.execute("PRAGMA table_info(work)")
+            }
+            if "lease_owner" not in columns:
+                self.connection.execute("ALTER TABLE work ADD COLUMN lease_owner TEXT")
+                self.connection.execute(
+                    "ALTER TABLE work "
+                    "ADD COLUMN lease_expires REAL NOT NULL DEFAULT 0"
+                )
+            if "key" not in columns:
+                self.__add_keys()
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS work_due "
+                "ON work (state, priority DESC, attempts, next_attempt)"
+            )
+            self.connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS work_key ON work (key)"
+            )
+
+    def __add_keys(self) -> None:
+        """Key the rows of an older queue by article, first url first.
+
+        Later urls of an article already keyed keep a null key, which the
+        unique index allows.
+        """
+        self.connection.execute("ALTER TABLE work ADD COLUMN key TEXT")
+        keys: dict[str, str] = {}
+        for (url,) in self.connection.execute("SELECT url FROM work ORDER BY rowid"):
+            keys.setdefault(article_key(url), url)
+        self.connection.executemany(
+            "UPDATE work SET key = ? WHERE url = ?", keys.items()
+        )
+
+    def add(self, urls: Iterable[str], priority: int = 0) -> int:
+        """Queue urls whose article is not in the queue yet.
+
+        Returns:
+            int: Number of urls added.
+
+        """
+        with self.connection:
+            cursor: sqlite3.Cursor = self.connection.executemany(
+                "INSERT OR IGNORE INTO work (url, key, priority, updated) "
+                "VALUES (?, ?, ?, ?)",
+                ((url, article_key(url), priority, time.time()) for url in urls),
+            )
+        return cursor.rowcount
+
+    def replace(self, urls: Iterable[str], priority: int = 0) -> int:
+        """Queue urls in place of the earlier urls of their articles.
+
+        A newer capture of an article replaces the article's row, unless
+        a worker holds a lease on it.
+
+        Returns:
+            int: Number of urls added.
+
+        """
+        queued: list[str] = list(urls)
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM work WHERE key = ? AND url != ? AND state != ?",
+                ((article_key(url), url, WorkState.LEASED) for url in queued),
+            )
+        return self.add(queued, priority)
+
+    def due(self, now: float | None = None) -> list[str]:
+        """List the pending urls that may be tried now, in priority order.
+
+        Urls leased to a worker whose lease ran out, because it died, are
+        made pending again first.
+
+        Returns:
+            list[str]: Urls to work on.
+
+        """
+        now = time.time() if now is None else now
+        with self.connection:
+            self.connection.execute(
+                "UPDATE work SET state = ?, lease_owner = NULL, lease_expires = 0 "
+                "WHERE state = ? AND lease_expires <= ?",
+                (WorkState.PENDING, WorkState.LEASED, now),
+            )
+        rows: list[tuple[str]] = self.connection.execute(
+            "SELECT url FROM work WHERE state = ? AND next_attempt <= ? "
+            "ORDER BY priority DESC, attempts, next_attempt, rowid",
+            (WorkState.PENDING, now),
+        ).fetchall()
+        return [url for (url,) in rows]
+
+    def claim(
+        self,
+        owner: str,
+        limit: int = 1,
+        lease: float = DEFAULT_LEASE,
+        now: float | None = None,
+    ) -> list[str]:
+        """Lease due urls, and urls whose lease ran out, to a worker.
+
+        Returns:
+            list[str]: Urls leased to ``owner`` for ``lease`` seconds,
+            highest priority first.
+
+        """
+        now = time.time() if now is None else now
+        with self.connection:
+            rows: list[tuple[str, int, int, float]] = self.connection.execute(
+                """
+                UPDATE work
+                SET state = ?, lease_owner = ?, lease_expires = ?, updated = ?
+                WHERE url IN (
+                    SELECT url FROM work
+                    WHERE (state = ? AND next_attempt <= ?)
+                        OR (state = ? AND lease_expires <= ?)
+                    ORDER BY priority DESC, attempts, next_attempt, rowid
+                    LIMIT ?
+                )
+                RETURNING url, priority, attempts, next_attempt
+                """,
+                (
+                    WorkState.LEASED,
+                    owner,
+                    now + lease,
+                    now,
+                    WorkState.PENDING,
+                    now,
+                    WorkState.LEASED,
+                    now,
+                    limit,
+                ),
+            ).fetchall()
+        rows.sort(key=lambda row: (-row[1], row[2], row[3]))
+        return [row[0] for row in rows]
+
+    def heartbeat(
+        self, owner: str, lease: float = DEFAULT_LEASE, now: float | None = None
+    ) -> int:
+        """Renew every lease a worker holds.
+
+        Returns:
+            int: Number of urls still leased to ``owner``.
+
+        """
+        now = time.time() if now is None else now
+        with self.connection:
+            cursor: sqlite3.Cursor = self.connection.execute(
+                "UPDATE work SET lease_expires = ? WHERE state = ? AND lease_owner = ?",
+                (now + lease, WorkState.LEASED, owner),
+            )
+        return cursor.rowcount
+
+    def release(self, owner: str) -> int:
+        """Give up every lease a worker holds, making the urls due again.
+
+        Returns:
+            int: Number of urls released.
+
+        """
+        with self.connection:
+            cursor: sqlite3.Cursor = self.connection.execute(
+                "UPDATE work SET state = ?, lease_owner = NULL, lease_expires = 0 "
+                "WHERE state = ? AND lease_owner = ?",
+                (WorkState.PENDING, WorkState.LEASED, owner),
+            )
+        return cursor.rowcount
+
+    def leased_to_others(self, owner: str) -> int:
+        """Count the urls leased to other workers, expired leases included.
+
+        Returns:
+            int: Number of urls leased to a worker other than ``owner``.
+
+        """
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM work WHERE state = ? AND lease_owner != ?",
+            (WorkState.LEASED, owner),
+        ).fetchone()[0]
+
+    def complete(self, url: str, owner: str | None = None) -> bool:
+        """Mark an url as done.
+
+        A worker passes itself as ``owner``, and the url is only marked if
+        the worker still holds its lease: once the lease ran out and another
+        worker claimed the url, the url is that worker's to finish.
+
+        Returns:
+            bool: True if the url was marked as done.
+
+        """
+        with self.connection:
+            cursor: sqlite3.Cursor = self.connection.execute(
+                "UPDATE work SET state = ?, lease_owner = NULL, updated = ? "
+                "WHERE url = ? AND (? IS NULL OR (state = ? AND lease_owner = ?))",
+                (WorkState.DONE, time.time(), url, owner, WorkState.LEASED, owner),
+            )
+        return cursor.rowcount > 0
+
+    def fail(
+        self, url: str, kind: FailureKind, error: str, owner: str | None = None
+    ) -> float | None:
+        """Record a failed attempt and schedule the next one.
+
+        As in ``complete``, a worker's attempt is only recorded while it
+        holds the url's lease. An url not in the queue is added, unless
+        another url of its article is queued already.
+
+        Returns:
+            float | None: Seconds until the url is retried, None once it has
+            been moved to the dead letters or if the attempt was not
+            recorded.
+
+        """
+        row: tuple[int] | None = self.connection.execute(
+            "SELECT attempts FROM work WHERE url = ?", (url,)
+        ).fetchone()
+        attempts: int = (row[0] if row else 0) + 1
+        now: float = time.time()
+        delay: float | None = min(
+            self.max_delay, self.base_delay * 2 ** (attempts - 1)
+        )
+        state: WorkState = WorkState.PENDING
+        if attempts >= self.max_attempts[kind]:
+            delay = None
+            state = WorkState.DEAD
+        values: tuple[WorkState, int, float, FailureKind, str, float] = (
+            state,
+            attempts,
+            now + (delay or 0),
+            kind,
+            error,
+            now,
+        )
+        with self.connection:
+            cursor: sqlite3.Cursor = (
+                self.connection.execute(
+                    """
+                    INSERT INTO work (
+                        state, attempts, next_attempt, failure, error, updated,
+                        url, key
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET
+                        state = excluded.state,
+                        attempts = excluded.attempts,
+                        next_attempt = excluded.next_attempt,
+                        failure = excluded.failure,
+                        error = excluded.error,
+                        updated = excluded.updated,
+                        lease_owner = NULL
+                    ON CONFLICT DO NOTHING
+                    RETURNING url
+                    """,
+                    (*values, url, article_key(url)),
+                )
+                if owner is None
+                else self.connection.execute(
+                    """
+                    UPDATE work SET
+                        state = ?, attempts = ?, next_attempt = ?, failure = ?,
+                        error = ?, updated = ?, lease_owner = NULL
+                    WHERE url = ? AND state = ? AND lease_owner = ?
+                    RETURNING url
+                    """,
+                    (*values, url, WorkState.LEASED, owner),
+                )
+            )
+            recorded: tuple[str] | None = cursor.fetchone()
+        if recorded is None:
+            return None
+        get_metrics().inc(
+            "retries_total" if state == WorkState.PENDING else "dead_letters_total",
+            kind=kind,
+        )
+        return delay
+
+    def dead_letters(self) -> list[tuple[str, str, int, str]]:
+        """List the urls that were given up on.
+
+        Returns:
+            list[tuple[str, str, int, str]]: Url, kind of failure, attempts
+            and last error.
+
+        """
+        return self.connection.execute(
+            "SELECT url, failure, attempts, error FROM work WHERE state = ? "
+            "ORDER BY failure, url",
+            (WorkState.DEAD,),
+        ).fetchall()
+
+    def requeue_dead(self, kind: FailureKind | None = None) -> int:
+        """Give dead letters a fresh set of attempts.
+
+        Returns:
+            int: Number of urls requeued.
+
+        """
+        with self.connection:
+            cursor: sqlite3.Cursor = self.connection.execute(
+                "UPDATE work SET state = ?, attempts = 0, next_attempt = 0 "
+                "WHERE state = ? AND (? IS NULL OR failure = ?)",
+                (WorkState.PENDING, WorkState.DEAD, kind, kind),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> dict[str, int]:
+        """Count urls per state.
+
+        Returns:
+            dict[str, int]: Number of urls keyed by state.
+
+        """
+        return dict(
+            self.connection.execute(
+                "SELECT state, COUNT(*) FROM work GROUP BY state"
+            ).fetchall()
+        )
+
+    def report(self) -> str:
+        """Summarize the queue.
+
+        Returns:
+            str: Urls per state and dead letters per kind of failure.
+
+        """
+        counts: dict[str, int] = self.counts()
+        dead: dict[str, int] = dict(
+            self.connection.execute(
+                "SELECT failure, COUNT(*) FROM work WHERE state = ? GROUP BY failure",
+                (WorkState.DEAD,),
+            ).fetchall()
+        )
+        leased: int = counts.get(WorkState.LEASED, 0)
+        summary: str = (
+            f"{counts.get(WorkState.DONE, 0)} done, "
+            f"{counts.get(WorkState.PENDING, 0)} pending, "
+            + (f"{leased} leased, " if leased else "")
+            + f"{counts.get(WorkState.DEAD, 0)} dead"
+        )
+        if dead:
+            summary += " (" + ", ".join(
+                f"{count} {kind}" for kind, count in sorted(dead.items())
+            ) + ")"
+        return f"{summary}."
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
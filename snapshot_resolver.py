@@ -0,0 +1,196 @@
+"""Fall back to other captures of an article when its snapshot is unusable."""
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+import requests
+
+from cdx_discovery import CDX_FIELDS, Capture
+from metrics import get_metrics
+from recrawl import article_key
+from transport import Transport, get_transport
+from wayback import CDX_ENDPOINT, archive_url, original_url, split_archive_url
+
+
+def _capture_time(timestamp: str) -> datetime:
+    """Read a capture timestamp, however many digits it has.
+
+    Returns:
+        datetime: Capture time.
+
+    """
+    return datetime.strptime(timestamp[:14].ljust(14, "0"), "%Y%m%d%H%M%S")  # noqa: DTZ007
+
+
+class SnapshotResolver:
+    """Find a usable capture of an article when the pinned one is not.
+
+    The other captures of the article are listed from the CDX index,
+    identical ones collapsed, and tried nearest to the pinned timestamp
+    first. They are tried ``concurrency`` at a time and, within a round,
+    the nearest capture that works wins, so a lost article costs a few
+    rounds of requests at most. The winning timestamp of every url is
+    appended to ``winners_file``, and later runs go straight to it.
+    """
+
+    def __init__(
+        self,
+        winners_file: str | Path | None = "snapshot_winners.jsonl",
+        *,
+        concurrency: int = 3,
+        max_candidates: int = 9,
+        endpoint: str = CDX_ENDPOINT,
+        transport: Transport | None = None,
+    ) -> None:
+        """Initialize snapshot resolver.
+
+        Parameters
+        ----------
+        winners_file : str | Path | None
+            JSON Lines file the winning timestamps are kept in, None to only
+            keep them in memory.
+        concurrency : int
+            Captures tried at once.
+        max_candidates : int
+            Captures tried per article before giving up.
+        endpoint : str
+            CDX server endpoint.
+        transport : Transport | None
+            Transport used for the lookups, the shared one by default.
+
+        """
+        self.winners_file: Path | None = Path(winners_file) if winners_file else None
+        self.concurrency: int = max(1, concurrency)
+        self.max_candidates: int = max(1, max_candidates)
+        self.endpoint: str = endpoint
+        self.transport: Transport = transport or get_transport()
+        self.winners: dict[str, str] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        if self.winners_file is not None and self.winners_file.is_file():
+            with self.winners_file.open("rb") as winners:
+                for line in winners:
+                    if line.endswith(b"\n"):
+                        winner: dict[str, str] = orjson.loads(line)
+                        self.winners[winner["key"]] = winner["timestamp"]
+
+    def __pool(self) -> ThreadPoolExecutor:
+        """Start the threads trying captures, once for every caller.
+
+        Returns:
+            ThreadPoolExecutor: Threads trying captures.
+
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix="snapshot"
+                )
+            return self._pool
+
+    def preferred(self, url: str) -> str:
+        """Swap a replay url for the capture that won for it before.
+
+        Returns:
+            str: Replay url of the winning capture, url itself if none won.
+
+        """
+        timestamp: str | None = self.winners.get(article_key(url))
+        return archive_url(original_url(url), timestamp) if timestamp else url
+
+    def remember(self, url: str, timestamp: str) -> None:
+        """Record the capture that won for an url."""
+        key: str = article_key(url)
+        with self._lock:
+            self.winners[key] = timestamp
+            if self.winners_file is not None:
+                with self.winners_file.open("ab") as winners:
+                    winners.write(
+                        orjson.dumps({"key": key, "timestamp": timestamp}) + b"\n"
+                    )
+
+    def candidates(self, url: str) -> list[Capture]:
+        """List the other good captures of an article, nearest first.
+
+        Returns:
+            list[Capture]: Html captures with status 200, the one ``url``
+            points at left out, nearest to its timestamp first.
+
+        Raises:
+            requests.HTTPError: If the CDX lookup fails.
+
+        """
+        try:
+            pinned: str = split_archive_url(url)[0]
+        except ValueError:
+            pinned = ""
+        response: requests.Response = self.transport.get(
+            self.endpoint,
+            params={
+                "url": original_url(url),
+                "output": "json",
+                "fl": ",".join(CDX_FIELDS),
+                "filter": ["statuscode:200", "mimetype:text/html"],
+                "collapse": "digest",
+            },
+        )
+        response.raise_for_status()
+        rows: list[list[str]] = orjson.loads(response.content or b"[]")
+        captures: list[Capture] = [
+            Capture(**dict(zip(CDX_FIELDS, row, strict=True)))
+            for row in rows[1:]
+            if row
+        ]
+        captures = [capture for capture in captures if capture.timestamp != pinned]
+        if pinned:
+            pinned_time: datetime = _capture_time(pinned)
+            captures.sort(
+                key=lambda capture: (
+                    abs(_capture_time(capture.timestamp) - pinned_time),
+                    capture.timestamp,
+                )
+            )
+        return captures
+
+    def resolve[T](
+        self, url: str, attempt: Callable[[str], T | None]
+    ) -> tuple[str, T] | None:
+        """Try the other captures of an article until one works.
+
+        ``attempt`` fetches and parses a replay url, returning None when
+        the capture is of no use.
+
+        Returns:
+            tuple[str, T] | None: Replay url of the winning capture and what
+            ``attempt`` returned for it, None if no capture worked.
+
+        """
+        try:
+            candidates: list[Capture] = self.candidates(url)[: self.max_candidates]
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            print(f"CDX lookup failed: {e}")
+            return None
+        for start in range(0, len(candidates), self.concurrency):
+            round_: list[Capture] = candidates[start : start + self.concurrency]
+            get_metrics().inc("snapshot_fallback_attempts_total", len(round_))
+            results: list[T | None] = list(
+                self.__pool().map(lambda capture: attempt(capture.archive_url), round_)
+            )
+            for capture, result in zip(round_, results, strict=True):
+                if result is not None:
+                    self.remember(url, capture.timestamp)
+                    get_metrics().inc("snapshot_fallback_recovered_total")
+                    return capture.archive_url, result
+        return None
+
+    def close(self) -> None:
+        """Stop the threads trying captures."""
+        with self._lock:
+            pool: ThreadPoolExecutor | None = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,69 @@
+"""Article database behaviour."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+from pages import article_record
+
+from article_db import ArticleDatabase
+from article_store import Article
+
+ARTICLES: int = 300
+
+
+def test_plain_store_is_written_and_searched_by_other_clients(
+    tmp_path: Path,
+) -> None:
+    """Without compression the schema needs no function of the store's."""
+    path: Path = tmp_path / "articles.sqlite3"
+    ArticleDatabase(path).append(article_record(0))
+    connection: sqlite3.Connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(
+            "INSERT INTO articles (url, title, article_content, record) "
+            "VALUES ('b', 'outside', 'written by another client', '{}')"
+        )
+        connection.execute("UPDATE articles SET title = 'edited' WHERE url = 'b'")
+    assert connection.execute(
+        "SELECT rowid FROM articles_fts WHERE articles_fts MATCH 'client'"
+    ).fetchall()
+    with connection:
+        connection.execute("DELETE FROM articles WHERE url = 'b'")
+    connection.close()
+    store: ArticleDatabase = ArticleDatabase(path)
+    assert [article["url"] for article in store.search("client")] == []
+    assert len(store) == 1
+
+
+def test_compressed_store_reads_back_the_original_text(tmp_path: Path) -> None:
+    """Compressed articles are read, searched and exported as stored."""
+    pytest.importorskip("zstandard")
+    store: ArticleDatabase = ArticleDatabase(tmp_path / "articles.sqlite3")
+    articles: list[Article] = [article_record(index) for index in range(ARTICLES)]
+    for article in articles:
+        store.append(article)
+    assert store.compress(dictionary_size=1 << 14) == ARTICLES
+    assert store.connection.execute(
+        "SELECT count(*) FROM articles WHERE typeof(article_content) = 'blob'"
+    ).fetchone()[0] == ARTICLES
+    reopened: ArticleDatabase = ArticleDatabase(tmp_path / "articles.sqlite3")
+    first: Article = articles[0]
+    assert reopened.get(str(first["url"])) == first
+    word: str = str(first["article_content"]).split()[0]
+    found: list[Article] = reopened.search(word, limit=ARTICLES)
+    assert first["url"] in [article["url"] for article in found]
+    assert reopened.by_author("Author 1") == [articles[1]]
+    assert list(reopened) == articles
+    added: Article = article_record(ARTICLES)
+    reopened.append(added)
+    assert reopened.get(str(added["url"])) == added
+    ds = pytest.importorskip("pyarrow.dataset")
+    from export import CorpusExporter  # noqa: PLC0415
+
+    assert CorpusExporter(
+        reopened, tmp_path / "export", partition_by=None
+    ).export() == ARTICLES + 1
+    table = ds.dataset(tmp_path / "export" / "articles").to_table()
+    rows: dict[str, dict[str, object]] = {row["url"]: row for row in table.to_pylist()}
+    assert rows[first["url"]]["article_content"] == first["article_content"]
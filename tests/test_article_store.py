@@ -0,0 +1,26 @@
+"""Article store behaviour."""
+
+import os
+from pathlib import Path
+
+import pytest
+from pages import article_record
+
+import article_store
+from article_store import ArticleStore
+
+
+def test_short_writes_are_completed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """An article the OS writes a few bytes at a time is stored whole."""
+    write = os.write
+    monkeypatch.setattr(
+        article_store.os, "write", lambda fd, data: write(fd, bytes(data[:7]))
+    )
+    store: ArticleStore = ArticleStore(tmp_path / "articles.jsonl")
+    articles = [article_record(index) for index in range(3)]
+    for article in articles:
+        store.append(article)
+    store.close()
+    assert ArticleStore(tmp_path / "articles.jsonl").load() == articles
@@ -0,0 +1,118 @@
+"""Async fetcher behaviour against a local stand-in for the archive."""
+
+import asyncio
+import threading
+import time
+from collections.abc import Iterator
+
+import httpx
+import pytest
+from fake_archive import FakeArchive
+
+from async_fetcher import AsyncFetcher, FetchResult
+from rate_limiter import TokenBucket
+from transport import Transport
+
+
+class _SlowArchive(FakeArchive):
+    """Fake archive that answers slowly and counts requests in flight."""
+
+    def __init__(self, articles: int) -> None:
+        """Initialize slow archive."""
+        super().__init__(articles=articles)
+        self.in_flight: int = 0
+        self.most_in_flight: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def respond(self, path: str, query: dict[str, list[str]]) -> bytes | None:
+        """Answer after a pause, noting how many requests overlap.
+
+        Returns:
+            bytes | None: Response body, None for a 404.
+
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+        return super().respond(path, query)
+
+
+class _CountingBucket(TokenBucket):
+    """Token bucket counting the tokens taken and the responses recorded."""
+
+    def __init__(self) -> None:
+        """Initialize counting bucket."""
+        super().__init__(rate=10_000, capacity=1_000)
+        self.acquired: int = 0
+        self.recorded: list[int | None] = []
+
+    async def acquire_async(self) -> None:
+        """Take a token, counting it."""
+        self.acquired += 1
+        await super().acquire_async()
+
+    def record(
+        self, status: int | None, latency: float, retry_after: str | None = None
+    ) -> None:
+        """Note the status of a response."""
+        self.recorded.append(status)
+
+
+@pytest.fixture
+def archive() -> Iterator[_SlowArchive]:
+    """Serve a slow fake archive of 12 articles."""
+    with _SlowArchive(articles=12) as archive:
+        yield archive
+
+
+async def _fetch_all(fetcher: AsyncFetcher, urls: list[str]) -> list[FetchResult]:
+    """Collect every result of a batch.
+
+    Returns:
+        list[FetchResult]: Results in completion order.
+
+    """
+    return [result async for result in fetcher.fetch_all(urls)]
+
+
+def test_concurrency_is_bounded(archive: _SlowArchive) -> None:
+    """No more than ``concurrency`` requests are in flight at once."""
+    fetcher: AsyncFetcher = AsyncFetcher(
+        Transport(rate_limiter=_CountingBucket()), concurrency=3
+    )
+    results: list[FetchResult] = asyncio.run(
+        _fetch_all(fetcher, archive.article_urls)
+    )
+    assert sorted(result.url for result in results) == sorted(archive.article_urls)
+    assert all(result.status == 200 and result.content for result in results)
+    assert 1 < archive.most_in_flight <= 3
+
+
+def test_rate_limiter_is_consulted(archive: _SlowArchive) -> None:
+    """Every request takes a token and reports its outcome."""
+    bucket: _CountingBucket = _CountingBucket()
+    fetcher: AsyncFetcher = AsyncFetcher(Transport(rate_limiter=bucket))
+    asyncio.run(_fetch_all(fetcher, archive.article_urls[:5]))
+    assert bucket.acquired == 5
+    assert bucket.recorded == [200] * 5
+
+
+def test_failures_come_back_as_results(archive: _SlowArchive) -> None:
+    """Error statuses and refused connections do not abort the batch."""
+    bucket: _CountingBucket = _CountingBucket()
+    fetcher: AsyncFetcher = AsyncFetcher(Transport(rate_limiter=bucket))
+    missing: str = f"{archive.url}/web/1/http://bodhicommons.org/missing"
+    refused: str = "http://127.0.0.1:1/web/1/http://bodhicommons.org/a"
+    urls: list[str] = [missing, refused, *archive.article_urls[:3]]
+    results: dict[str, FetchResult] = {
+        result.url: result for result in asyncio.run(_fetch_all(fetcher, urls))
+    }
+    assert set(results) == set(urls)
+    assert results[missing].status == 404
+    assert results[missing].error is None
+    assert isinstance(results[refused].error, httpx.ConnectError)
+    assert all(results[url].status == 200 for url in archive.article_urls[:3])
+    assert sorted(bucket.recorded, key=str) == sorted([200, 200, 200, 404, None], key=str)
@@ -0,0 +1,182 @@
+"""CDX discovery behaviour."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import orjson
+import pytest
+from fake_archive import FakeArchive
+
+from cdx_discovery import CDX_FIELDS, MAIN_ARTICLE_PATTERN, Capture, CdxDiscovery
+from rate_limiter import TokenBucket
+from transport import Transport
+
+# Three pages of the index. Article b's captures span the first two pages
+# and its latest one is on the second.
+PAGES: list[list[tuple[str, str]]] = [
+    [("a-a", "20200101000000"), ("b-b", "20200101000000"), ("b-b", "20210101000000")],
+    [("b-b", "20220101000000"), ("c-c", "20200101000000")],
+    [("c-c", "20190101000000"), ("about", "20200101000000")],
+]
+
+
+class _CdxArchive(FakeArchive):
+    """Fake archive serving ``PAGES`` as its CDX index."""
+
+    def __init__(self) -> None:
+        """Initialize CDX archive."""
+        super().__init__(articles=0)
+        self.resume_keys: list[str] = []
+
+    def respond(self, path: str, query: dict[str, list[str]]) -> bytes | None:
+        """Serve the CDX page the resume key points at.
+
+        Returns:
+            bytes | None: Response body, None for a 404.
+
+        """
+        if path != "/cdx/search/cdx":
+            return None
+        resume_key: str = query.get("resumeKey", ["0"])[0]
+        self.resume_keys.append(resume_key)
+        page: int = int(resume_key)
+        rows: list[list[str]] = [
+            list(CDX_FIELDS),
+            *(
+                [
+                    f"org,bodhicommons)/{slug}",
+                    timestamp,
+                    f"http://bodhicommons.org/{slug}",
+                    "text/html",
+                    "200",
+                ]
+                for slug, timestamp in PAGES[page]
+            ),
+        ]
+        if page + 1 < len(PAGES):
+            rows += [[], [str(page + 1)]]
+        return orjson.dumps(rows)
+
+
+@pytest.fixture
+def archive() -> Iterator[_CdxArchive]:
+    """Serve the CDX index."""
+    with _CdxArchive() as archive:
+        yield archive
+
+
+def _discovery(
+    archive: _CdxArchive, state_file: Path, before: str | None = None
+) -> CdxDiscovery:
+    """Discovery against the fake index.
+
+    Returns:
+        CdxDiscovery: Discovery.
+
+    """
+    return CdxDiscovery(
+        before=before,
+        page_size=3,
+        state_file=str(state_file),
+        endpoint=f"{archive.url}/cdx/search/cdx",
+        transport=Transport(rate_limiter=TokenBucket(rate=10_000, capacity=1_000)),
+    )
+
+
+def _resolved(captures: Iterator[Capture]) -> list[tuple[str, str]]:
+    """Reduce captures to their slug and timestamp.
+
+    Returns:
+        list[tuple[str, str]]: Slug and timestamp of every capture.
+
+    """
+    return [
+        (capture.original.rsplit("/", 1)[1], capture.timestamp) for capture in captures
+    ]
+
+
+def test_articles_are_yielded_once_final(archive: _CdxArchive, tmp_path: Path) -> None:
+    """An article is yielded once no later page can hold a newer capture."""
+    captures: Iterator[Capture] = _discovery(
+        archive, tmp_path / "state.json"
+    ).iter_resolved()
+    assert _resolved([next(captures)]) == [("a-a", "20200101000000")]
+    assert archive.resume_keys == ["0"]
+    assert _resolved([next(captures)]) == [("b-b", "20220101000000")]
+    assert archive.resume_keys == ["0", "1"]
+    assert _resolved(captures) == [("c-c", "20200101000000")]
+    assert archive.resume_keys == ["0", "1", "2"]
+
+
+def test_captures_after_before_are_skipped(
+    archive: _CdxArchive, tmp_path: Path
+) -> None:
+    """The best capture is the latest one no later than ``before``."""
+    discovery: CdxDiscovery = _discovery(
+        archive, tmp_path / "state.json", before="20211231000000"
+    )
+    assert sorted(_resolved(discovery.iter_resolved())) == [
+        ("a-a", "20200101000000"),
+        ("b-b", "20210101000000"),
+        ("c-c", "20200101000000"),
+    ]
+
+
+def test_interrupted_lookup_resumes(archive: _CdxArchive, tmp_path: Path) -> None:
+    """A lookup stopped between pages continues from its resume key."""
+    state_file: Path = tmp_path / "state.json"
+    captures: Iterator[Capture] = _discovery(archive, state_file).iter_resolved()
+    next(captures)
+    captures.close()
+    assert state_file.is_file()
+    assert sorted(_resolved(_discovery(archive, state_file).iter_resolved())) == [
+        ("a-a", "20200101000000"),
+        ("b-b", "20220101000000"),
+        ("c-c", "20200101000000"),
+    ]
+    assert archive.resume_keys == ["0", "1", "2"]
+
+
+def test_finished_lookup_queries_again(archive: _CdxArchive, tmp_path: Path) -> None:
+    """The state of a finished lookup is removed, so the next one starts over."""
+    state_file: Path = tmp_path / "state.json"
+    assert len(_discovery(archive, state_file).resolve()) == 3
+    assert not state_file.exists()
+    assert len(_discovery(archive, state_file).resolve()) == 3
+    assert archive.resume_keys == ["0", "1", "2"] * 2
+
+
+@pytest.mark.parametrize(
+    "state", [b"", b'{"resume_key": "1", "capt', b"[]", b'{"resume_key": "1"}']
+)
+def test_unreadable_state_is_ignored(
+    archive: _CdxArchive, tmp_path: Path, state: bytes
+) -> None:
+    """A corrupt or cut short state file counts as no state."""
+    state_file: Path = tmp_path / "state.json"
+    state_file.write_bytes(state)
+    assert len(_discovery(archive, state_file).resolve()) == 3
+    assert archive.resume_keys == ["0", "1", "2"]
+
+
+@pytest.mark.parametrize(
+    ("path", "article"),
+    [
+        ("/critical-view-debates-caste-reservations", True),
+        ("/malabar_revolt_beyond_religions_khilafath", True),
+        ("/thomas-issac-KIIFB-CAG", True),
+        ("/article/neoliberalism-past-present-and-ideology", True),
+        ("/node/580", True),
+        ("/index.php/node/570", True),
+        ("/about", False),
+        ("/contact", False),
+        ("/user", False),
+        ("/node", False),
+        ("/node/580/edit", False),
+        ("/taxonomy/term/3", False),
+        ("/article/", False),
+    ],
+)
+def test_main_article_pattern(path: str, article: bool) -> None:  # noqa: FBT001
+    """Article paths match, other pages of the main site do not."""
+    assert bool(MAIN_ARTICLE_PATTERN.match(path)) == article
@@ -0,0 +1,106 @@
+"""Near-duplicate detection and merging behaviour."""
+
+from pathlib import Path
+
+from article_db import ArticleDatabase
+from dedup import (
+    Deduplicator,
+    NearDuplicateIndex,
+    merge_articles,
+    minhash,
+    shingle_hashes,
+    similarity,
+)
+from resume_index import ResumeIndex
+
+TEXT: str = " ".join(f"word{index}" for index in range(200))
+EDITED: str = TEXT.replace("word100", "changed")
+OTHER: str = " ".join(f"other{index}" for index in range(200))
+
+
+def test_shingles_ignore_case_and_spacing() -> None:
+    """Texts differing only in case and whitespace share their shingles."""
+    assert shingle_hashes("One two  three\nfour five") == shingle_hashes(
+        "one TWO three four five"
+    )
+    assert len(shingle_hashes("a b c d e f")) == 2
+    assert len(shingle_hashes("a b")) == 1
+    assert shingle_hashes("  ") == set()
+
+
+def test_similarity_tells_near_duplicates_apart() -> None:
+    """A small edit keeps texts similar, a different text is not."""
+    text, edited, other = (
+        minhash(shingle_hashes(value)) for value in (TEXT, EDITED, OTHER)
+    )
+    assert text is not None
+    assert edited is not None
+    assert other is not None
+    assert similarity(text, text) == 1.0
+    assert similarity(text, edited) > 0.8
+    assert similarity(text, other) < 0.2
+    assert minhash(set()) is None
+
+
+def test_index_returns_the_text_duplicated() -> None:
+    """Near-duplicates point at the first text, others are indexed."""
+    index: NearDuplicateIndex = NearDuplicateIndex(threshold=0.8)
+    assert index.add("a", TEXT) is None
+    assert index.add("b", EDITED) == "a"
+    assert index.add("c", OTHER) is None
+    assert index.add("d", "") is None
+    assert len(index) == 2
+    assert "b" not in index
+
+
+def test_merge_unites_lists_and_records_duplicate_urls() -> None:
+    """The kept article gains the duplicate's tags, missing fields and url."""
+    merged = merge_articles(
+        {"url": "a", "title": "A", "tags": ["x"], "author": ""},
+        {
+            "url": "b",
+            "title": "B",
+            "tags": "y",
+            "author": "Someone",
+            "duplicate_urls": ["a", "c"],
+        },
+    )
+    assert merged["title"] == "A"
+    assert merged["tags"] == ["x", "y"]
+    assert merged["author"] == "Someone"
+    assert merged["duplicate_urls"] == ["b", "c"]
+
+
+def test_deduplicator_merges_store_and_sources(tmp_path: Path) -> None:
+    """Duplicates are merged away, new source articles added."""
+    store: ArticleDatabase = ArticleDatabase(tmp_path / "main.sqlite3")
+    store.append({"url": "a", "article_content": TEXT, "tags": ["x"]})
+    store.append({"url": "b", "article_content": EDITED, "tags": ["y"]})
+    source: ArticleDatabase = ArticleDatabase(tmp_path / "beta.sqlite3")
+    source.append({"url": "c", "article_content": EDITED, "tags": ["z"]})
+    source.append({"url": "d", "article_content": OTHER})
+    deduplicator: Deduplicator = Deduplicator(store, [source])
+    assert deduplicator.run() == 2
+    assert deduplicator.added == 1
+    merged: ArticleDatabase = ArticleDatabase(tmp_path / "main.sqlite3")
+    assert sorted(str(article["url"]) for article in merged) == ["a", "d"]
+    kept = merged.get("a")
+    assert kept is not None
+    assert kept["tags"] == ["x", "y", "z"]
+    assert kept["duplicate_urls"] == ["b", "c"]
+
+
+def test_merged_urls_survive_a_resume_index_rebuild(tmp_path: Path) -> None:
+    """Urls merged away still count as scraped once the index is rebuilt."""
+    store: ArticleDatabase = ArticleDatabase(tmp_path / "main.sqlite3")
+    store.append({"url": "a", "article_content": TEXT})
+    store.append({"url": "b", "article_content": EDITED})
+    ResumeIndex.for_store(store).close()
+    Deduplicator(store).run()
+    store.append({"url": "c", "article_content": OTHER})
+    reopened: ResumeIndex = ResumeIndex.for_store(
+        ArticleDatabase(tmp_path / "main.sqlite3")
+    )
+    assert "a" in reopened
+    assert "b" in reopened
+    assert "c" in reopened
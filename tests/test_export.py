@@ -0,0 +1,37 @@
+"""Columnar export behaviour."""
+
+from pathlib import Path
+
+import pytest
+
+from article_db import ArticleDatabase
+
+pa = pytest.importorskip("pyarrow")
+ds = pytest.importorskip("pyarrow.dataset")
+from export import CorpusExporter  # noqa: E402
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_dictionary_fields_survive_export(tmp_path: Path, export_format: str) -> None:
+    """Authors, languages and tags read back as stored, lists included."""
+    store: ArticleDatabase = ArticleDatabase(tmp_path / "articles.sqlite3")
+    store.append({"url": "a", "authors": "A", "language": "ml", "tags": ["x"]})
+    store.append({"url": "b", "authors": ["B", "C"], "language": "en", "tags": "y"})
+    store.append({"url": "c", "title": "no labels"})
+    exported: int = CorpusExporter(
+        store, tmp_path / "export", export_format=export_format, partition_by=None
+    ).export()
+    assert exported == 3
+    table = ds.dataset(
+        tmp_path / "export" / "articles",
+        format="ipc" if export_format == "arrow" else "parquet",
+    ).to_table()
+    rows: dict[str, dict[str, object]] = {
+        row["url"]: row for row in table.to_pylist()
+    }
+    assert rows["a"]["authors"] == "A"
+    assert rows["b"]["authors"] == "B, C"
+    assert rows["b"]["tags"] == ["y"]
+    assert rows["a"]["tags"] == ["x"]
+    assert rows["c"]["authors"] is None
+    assert rows["c"]["language"] is None
@@ -0,0 +1,59 @@
+"""Article extraction behaviour."""
+
+from collections.abc import Callable
+
+import pytest
+from pages import beta_article, main_article
+
+from extraction import BETA_LAYOUT, MAIN_LAYOUT, LayoutSpec, iter_chunks
+from layouts import parse_page
+
+URL: str = "https://web.archive.org/web/20230101000000/http://bodhicommons.org/a"
+NOT_DOCUMENTS: tuple[str, ...] = (
+    "",
+    "  \n",
+    "<!-- x -->",
+    '<?xml version="1.0"?>',
+    '<?xml version="1.0" encoding="utf-8"?><html><title>x</title></html>',
+)
+# Malayalam text, so chunk boundaries fall inside multi-byte characters.
+MALAYALAM: str = "<p>ബോധി കോമൺസ് ലേഖനം</p>"
+
+
+@pytest.mark.parametrize(
+    ("spec", "page"),
+    [(MAIN_LAYOUT, main_article), (BETA_LAYOUT, beta_article)],
+    ids=["main", "beta"],
+)
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("chunk_size", [7, 1 << 16])
+def test_streamed_extraction_matches_whole_page(
+    spec: LayoutSpec, page: Callable[..., str], seed: int, chunk_size: int
+) -> None:
+    """Extracting while parsing finds the same fields as the whole page."""
+    html: str = page(f"slug-{seed}", paragraphs=5, seed=seed).replace(
+        "<p>", MALAYALAM + "<p>", 1
+    )
+    expected: dict[str, object] = spec.extract(html)
+    assert "ബോധി" in expected["article_content"]
+    chunks: list[bytes] = list(iter_chunks(html.encode(), chunk_size))
+    assert spec.extract_stream(chunks, "utf-8") == expected
+    assert spec.extract_stream(chunks) == spec.extract(html.encode())
+
+
+@pytest.mark.parametrize("spec", [MAIN_LAYOUT, BETA_LAYOUT], ids=["main", "beta"])
+@pytest.mark.parametrize("page", NOT_DOCUMENTS)
+def test_page_without_document_is_not_an_article(spec: LayoutSpec, page: str) -> None:
+    """Empty and comment only pages are rejected like any non-article."""
+    with pytest.raises(TypeError):
+        spec.extract(page)
+    with pytest.raises(TypeError):
+        spec.extract_stream(iter_chunks(page.encode()))
+    with pytest.raises(TypeError):
+        spec.extract(page.encode())
+
+
+@pytest.mark.parametrize("layout", ["main", "beta"])
+def test_parse_page_returns_no_article(layout: str) -> None:
+    """A parse worker reports a comment only page as holding no article."""
+    assert parse_page(layout, URL, b"<!-- x -->") == {}
@@ -0,0 +1,126 @@
+"""Image downloader behaviour."""
+
+import io
+from pathlib import Path
+from typing import Any, cast
+
+import requests
+
+from image_downloader import ImageDownloader
+from transport import Transport
+
+PNG: bytes = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+IMAGE: str = "/web/20230101000000im_/http://bodhicommons.org/a.png"
+COPY: str = "/web/20230101000000im_/http://bodhicommons.org/copy.png"
+
+
+class _ImageTransport:
+    """Transport serving canned responses and keeping every one it sent."""
+
+    def __init__(self, bodies: dict[str, tuple[int, dict[str, str], bytes]]) -> None:
+        """Initialize image transport."""
+        self.bodies: dict[str, tuple[int, dict[str, str], bytes]] = bodies
+        self.responses: list[requests.Response] = []
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:  # noqa: ARG002
+        status, headers, body = self.bodies[url.removeprefix("https://web.archive.org")]
+        response: requests.Response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers.update(headers)
+        response.raw = io.BytesIO(body)
+        self.responses.append(response)
+        return response
+
+
+def _downloader(
+    directory: Path, transport: _ImageTransport, max_bytes: int = 1 << 20
+) -> ImageDownloader:
+    """Open a downloader over a fake transport.
+
+    Returns:
+        ImageDownloader: Downloader.
+
+    """
+    return ImageDownloader(
+        directory,
+        chunk_size=100,
+        max_bytes=max_bytes,
+        transport=cast(Transport, transport),
+    )
+
+
+def _files(directory: Path) -> list[str]:
+    """List the files kept besides the manifest.
+
+    Returns:
+        list[str]: Paths relative to ``directory``.
+
+    """
+    return sorted(
+        path.relative_to(directory).as_posix()
+        for path in directory.rglob("*")
+        if path.is_file() and path.name != "manifest.jsonl"
+    )
+
+
+def test_identical_images_are_stored_once(tmp_path: Path) -> None:
+    """Images are stored by content, and a resumed run skips stored ones."""
+    transport: _ImageTransport = _ImageTransport(
+        {url: (200, {"Content-Type": "image/png"}, PNG) for url in (IMAGE, COPY)}
+    )
+    downloader: ImageDownloader = _downloader(tmp_path, transport)
+    manifest = downloader.download_all([IMAGE, COPY, IMAGE])
+    assert manifest[IMAGE].file == manifest[COPY].file
+    assert manifest[IMAGE].file.endswith(".png")
+    assert (tmp_path / manifest[IMAGE].file).read_bytes() == PNG
+    assert (downloader.downloaded, downloader.deduplicated) == (1, 1)
+    assert _files(tmp_path) == [manifest[IMAGE].file]
+    resumed: ImageDownloader = _downloader(tmp_path, transport)
+    assert resumed.download_all([IMAGE, COPY]) == manifest
+    assert resumed.download(IMAGE) == manifest[IMAGE]
+    assert len(transport.responses) == 2
+
+
+def test_pages_that_are_not_images_are_skipped(tmp_path: Path) -> None:
+    """An html page served for an image url is not stored."""
+    transport: _ImageTransport = _ImageTransport(
+        {IMAGE: (200, {"Content-Type": "text/html"}, b"<html></html>")}
+    )
+    downloader: ImageDownloader = _downloader(tmp_path, transport)
+    assert downloader.download(IMAGE) is None
+    assert downloader.failed == 1
+    assert _files(tmp_path) == []
+    assert transport.responses[0].raw.closed
+
+
+def test_images_over_the_size_limit_are_skipped(tmp_path: Path) -> None:
+    """Images announced or found to be too large are not stored."""
+    transport: _ImageTransport = _ImageTransport(
+        {
+            IMAGE: (
+                200,
+                {"Content-Type": "image/png", "Content-Length": str(len(PNG))},
+                PNG,
+            ),
+            COPY: (200, {"Content-Type": "image/png"}, PNG),
+        }
+    )
+    downloader: ImageDownloader = _downloader(
+        tmp_path, transport, max_bytes=len(PNG) - 1
+    )
+    assert downloader.download(IMAGE) is None
+    assert downloader.download(COPY) is None
+    assert downloader.failed == 2
+    assert downloader.manifest == {}
+    assert _files(tmp_path) == []
+    assert all(response.raw.closed for response in transport.responses)
+
+
+def test_failed_response_is_closed(tmp_path: Path) -> None:
+    """A response with an error status is released, not leaked."""
+    transport: _ImageTransport = _ImageTransport({IMAGE: (404, {}, b"missing")})
+    downloader: ImageDownloader = _downloader(tmp_path, transport)
+    assert downloader.download(IMAGE) is None
+    assert downloader.failed == 1
+    assert transport.responses[0].raw.closed
@@ -0,0 +1,28 @@
+"""Language detection behaviour."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from language import LanguageDetector
+
+TEXTS: list[tuple[str, str]] = [
+    ("Reading Marx", "The times of communalism call for a careful reading."),
+    ("Lecture", "Ceci est un article écrit en français sur la politique."),
+    ("Artikel", "Dies ist ein Artikel über die Politik in Kerala."),
+    ("കേരളം", "കേരളത്തിലെ രാഷ്ട്രീയത്തെക്കുറിച്ചുള്ള ലേഖനം."),
+]
+
+
+def test_script_and_model_labels() -> None:
+    """Malayalam is told by its script, other languages by the model."""
+    assert LanguageDetector().detect_many(TEXTS) == ["en", "fr", "de", "ml"]
+
+
+def test_concurrent_detection_is_deterministic() -> None:
+    """Threads detecting at once label every text as a single thread does."""
+    expected: list[str] = LanguageDetector().detect_many(TEXTS)
+    detector: LanguageDetector = LanguageDetector(cache_size=0)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        labels: list[list[str]] = list(
+            pool.map(lambda _: detector.detect_many(TEXTS), range(64))
+        )
+    assert all(label == expected for label in labels)
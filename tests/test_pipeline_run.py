@@ -0,0 +1,157 @@
+"""Pipeline behaviour."""
+
+import dataclasses
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+import requests
+from fake_archive import FakeArchive
+from pages import main_article
+
+import content_scraper_2
+from layouts import MAIN_SITE, SiteLayout
+from pipeline import DiscoveryMethod, Pipeline
+from rate_limiter import TokenBucket
+from retry_queue import RetryQueue
+from transport import Transport
+
+ARCHIVE: str = "https://web.archive.org"
+URL: str = f"{ARCHIVE}/web/20230101000000/http://bodhicommons.org/a"
+
+
+class _BrokenTransport(Transport):
+    """Transport whose every request fails with an unexpected error."""
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        """Fail.
+
+        Raises:
+            FileNotFoundError: Always.
+
+        """
+        message: str = f"Lost the state file while fetching {url}."
+        raise FileNotFoundError(message)
+
+
+@pytest.fixture(scope="module")
+def fake_archive() -> Iterator[FakeArchive]:
+    """Serve a fake archive of 12 articles."""
+    with FakeArchive(articles=12) as archive:
+        yield archive
+
+
+def _transport() -> Transport:
+    """Transport without a meaningful rate limit.
+
+    Returns:
+        Transport: Transport.
+
+    """
+    return Transport(rate_limiter=TokenBucket(rate=10_000, capacity=1_000))
+
+
+def test_unexpected_fetch_error_is_recorded(tmp_path: Path) -> None:
+    """A fetch thread that hits an unexpected error does not hang the run."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.add([URL])
+    pipeline: Pipeline = Pipeline(
+        MAIN_SITE,
+        db_name=str(tmp_path / "articles.sqlite3"),
+        retry_queue_name=str(tmp_path / "queue.sqlite3"),
+        cache_directory=None,
+        fetch_workers=2,
+        transport=_BrokenTransport(rate_limiter=TokenBucket(rate=1000)),
+        fallback_concurrency=0,
+    )
+    run: threading.Thread = threading.Thread(target=pipeline.run, daemon=True)
+    run.start()
+    run.join(timeout=30)
+    assert not run.is_alive()
+    assert pipeline.failed == 1
+    assert pipeline.stored == 0
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_async_fetch_stores_every_article(
+    fake_archive: FakeArchive, tmp_path: Path, streaming: bool  # noqa: FBT001
+) -> None:
+    """Coroutines fetch and store the articles listed, streamed or not."""
+    layout: SiteLayout = dataclasses.replace(
+        MAIN_SITE,
+        listing_url=fake_archive.listing_url(),
+        listing_pages=fake_archive.listing_pages,
+    )
+    pipeline: Pipeline = Pipeline(
+        layout,
+        db_name=str(tmp_path / "articles.sqlite3"),
+        retry_queue_name=str(tmp_path / "queue.sqlite3"),
+        cache_directory=str(tmp_path / "cache"),
+        fetch_workers=3,
+        transport=_transport(),
+        fallback_concurrency=0,
+        async_fetch=True,
+        streaming=streaming,
+    )
+    pipeline.run(DiscoveryMethod.LISTING)
+    assert pipeline.stored == len(fake_archive.slugs)
+    assert len(pipeline.cache or ()) == len(fake_archive.slugs)
+
+
+@pytest.mark.parametrize("async_fetch", [False, True])
+def test_page_snapshot_scrapes_url_files(
+    fake_archive: FakeArchive, tmp_path: Path, async_fetch: bool  # noqa: FBT001
+) -> None:
+    """The script scrapes each article named in its url files once."""
+    urls: list[str] = fake_archive.article_urls
+    (tmp_path / "page_0_urls.txt").write_text("\n".join(urls[:8]))
+    (tmp_path / "page_1_urls.txt").write_text("\n".join([f"{urls[0]}/", *urls[8:]]))
+    (tmp_path / "page_beta_urls.txt").write_text("http://beta.bodhicommons.org/a")
+    snapshot: content_scraper_2.PageSnapShot = content_scraper_2.PageSnapShot(
+        url_directory=str(tmp_path),
+        db_name=str(tmp_path / "backup.sqlite3"),
+        legacy_json_db_name=str(tmp_path / "backup.json"),
+        retry_queue_name=str(tmp_path / "queue.sqlite3"),
+        cache_directory=None,
+        async_fetch=async_fetch,
+        transport=_transport(),
+    )
+    snapshot.run()
+    assert snapshot.pipeline.stored == len(urls)
+    assert len(snapshot.pipeline.store) == len(urls)
+
+
+def test_recrawled_article_replaces_its_old_capture(tmp_path: Path) -> None:
+    """A newer capture of a stored article is stored in place of the old one."""
+    old_url: str = f"{ARCHIVE}/web/20230101000000/http://bodhicommons.org/a"
+    new_url: str = f"{ARCHIVE}/web/20240101000000/http://bodhicommons.org/a"
+    other_url: str = f"{ARCHIVE}/web/20230101000000/http://bodhicommons.org/b"
+    pipeline: Pipeline = Pipeline(
+        MAIN_SITE,
+        db_name=str(tmp_path / "articles.sqlite3"),
+        retry_queue_name=str(tmp_path / "queue.sqlite3"),
+        cache_directory=str(tmp_path / "cache"),
+        fallback_concurrency=0,
+    )
+    assert pipeline.cache is not None
+    pages: dict[str, str] = {
+        old_url: main_article("a", seed=0),
+        new_url: main_article("a", seed=0),
+        other_url: main_article("b", seed=1),
+    }
+    for url, page in pages.items():
+        pipeline.cache.put(url, 200, {}, page.encode())
+    pipeline.retry_queue.add([old_url, other_url])
+    pipeline.run(fetch=False)
+    authors: str = str((pipeline.store.get(old_url) or {})["authors"])
+    pipeline.retry_queue.replace([new_url], priority=1)
+    pipeline.run(fetch=False)
+    assert pipeline.stored == 3
+    assert len(pipeline.store) == 2
+    assert pipeline.store.get(old_url) is None
+    assert pipeline.store.get(new_url) is not None
+    assert [article["url"] for article in pipeline.store.by_author(authors)] == [
+        new_url
+    ]
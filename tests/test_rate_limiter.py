@@ -0,0 +1,75 @@
+"""Adaptive rate limiter behaviour."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rate_limiter import AdaptiveRateLimiter
+
+
+def test_backs_off_on_overload_and_speeds_up_after() -> None:
+    """A 429 halves the rate and healthy responses raise it again."""
+    limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+        rate=1.0, increase=0.1, state_file=None
+    )
+    limiter.record(429, 0.1)
+    assert limiter.rate == 0.5
+    limiter.record(200, 0.1)
+    assert limiter.rate == 0.6
+
+
+def test_lasting_latency_rise_is_adapted_to() -> None:
+    """Once responses stay slower, the rate stops backing off."""
+    limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+        rate=1.0, min_rate=0.01, increase=0.01, state_file=None
+    )
+    for _ in range(20):
+        limiter.record(200, 0.1)
+    for _ in range(50):
+        limiter.record(200, 1.0)
+    assert limiter.latency > 0.9
+    low: float = limiter.rate
+    limiter.record(200, 1.0)
+    assert limiter.rate > low > limiter.min_rate
+
+
+def test_saved_rate_is_resumed(tmp_path: Path) -> None:
+    """The learned rate carries over to the next run."""
+    state_file: Path = tmp_path / "rate_limiter.json"
+    limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+        rate=1.0, state_file=str(state_file)
+    )
+    limiter.record(503, 0.1)
+    assert AdaptiveRateLimiter(rate=1.0, state_file=str(state_file)).rate == 0.5
+
+
+def test_corrupt_state_file_falls_back_to_default(tmp_path: Path) -> None:
+    """A truncated or foreign state file is ignored."""
+    state_file: Path = tmp_path / "rate_limiter.json"
+    for content in (b'{"rate": 0.', b"[1, 2]", b'{"rate": "fast"}'):
+        state_file.write_bytes(content)
+        limiter = AdaptiveRateLimiter(rate=0.25, state_file=str(state_file))
+        assert limiter.rate == 0.25
+
+
+def test_threads_save_at_once(tmp_path: Path) -> None:
+    """Concurrent backoffs each save without clobbering the others."""
+    state_file: Path = tmp_path / "rate_limiter.json"
+    limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+        rate=1.0, min_rate=1e-6, state_file=str(state_file)
+    )
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: limiter.record(503, 0.1), range(64)))
+    assert [path.name for path in tmp_path.iterdir()] == ["rate_limiter.json"]
+    reopened: AdaptiveRateLimiter = AdaptiveRateLimiter(
+        min_rate=1e-6, state_file=str(state_file)
+    )
+    assert reopened.rate == limiter.rate
+
+
+def test_failed_save_is_not_raised(tmp_path: Path) -> None:
+    """A state file that cannot be written does not fail the request."""
+    limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+        rate=1.0, state_file=str(tmp_path / "missing" / "rate_limiter.json")
+    )
+    limiter.record(503, 0.1)
+    assert limiter.rate == 0.5
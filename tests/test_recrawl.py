@@ -0,0 +1,130 @@
+"""Incremental recrawl behaviour."""
+
+from pathlib import Path
+from typing import Any, cast
+
+import orjson
+import requests
+
+from cdx_discovery import CDX_FIELDS, CdxDiscovery
+from recrawl import Article, Recrawl, article_key
+from response_cache import ResponseCache
+from transport import Transport
+from wayback import CDX_ENDPOINT, WAYBACK_URL, archive_url
+
+SITE: str = "http://bodhicommons.org"
+# Latest capture of every article in the CDX index.
+CAPTURES: dict[str, str] = {
+    "a-a": "20230601000000",
+    "b-b": "20230101000000",
+    "c-c": "20240101000000",
+    "d-d": "20240101000000",
+}
+
+
+def _stored(slug: str, timestamp: str, **fields: str) -> Article:
+    """Make up the stored version of an article.
+
+    Returns:
+        Article: Article.
+
+    """
+    return {"url": archive_url(f"{SITE}/{slug}", timestamp), **fields}
+
+
+# Stored versions: a and c have newer captures, b does not, d is not stored.
+ARTICLES: dict[str, Article] = {
+    article_key(str(article["url"])): article
+    for article in (
+        _stored("a-a", "20220101000000", snapshot_timestamp="20220101000000", etag="x"),
+        _stored("b-b", "20230101000000", last_modified="Sun, 01 Jan 2023 00:00:00 GMT"),
+        _stored("c-c", "20230101000000"),
+    )
+}
+
+
+class _ArchiveTransport:
+    """Transport answering CDX lookups and requests for latest captures."""
+
+    def __init__(self, *, cdx: bool = True) -> None:
+        """Initialize archive transport."""
+        self.cdx: bool = cdx
+        self.requests: list[tuple[str, dict[str, str]]] = []
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        self.requests.append((url, kwargs.get("headers") or {}))
+        response: requests.Response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        if url == CDX_ENDPOINT:
+            response.status_code = 200 if self.cdx else 503
+            response._content = orjson.dumps(  # noqa: SLF001
+                [
+                    list(CDX_FIELDS),
+                    *(
+                        [f"org,bodhicommons)/{slug}", timestamp, f"{SITE}/{slug}"]
+                        + ["text/html", "200"]
+                        for slug, timestamp in CAPTURES.items()
+                    ),
+                ]
+            )
+            return response
+        slug: str = url.rsplit("/", 1)[1]
+        if slug == "a-a":
+            response.status_code = 304
+            return response
+        response.url = archive_url(f"{SITE}/{slug}", CAPTURES[slug])
+        response.headers["Memento-Datetime"] = {
+            "b-b": "Sun, 01 Jan 2023 00:00:00 GMT",
+            "c-c": "Mon, 01 Jan 2024 00:00:00 GMT",
+        }[slug]
+        response._content = f"<html>{slug}</html>".encode()  # noqa: SLF001
+        return response
+
+
+def _recrawl(
+    transport: _ArchiveTransport, cache: ResponseCache | None = None
+) -> Recrawl:
+    """Recrawl the stored articles over a fake archive.
+
+    Returns:
+        Recrawl: Recrawl.
+
+    """
+    return Recrawl(
+        ARTICLES,
+        discovery=CdxDiscovery(state_file=None, transport=cast(Transport, transport)),
+        transport=cast(Transport, transport),
+        cache=cache,
+    )
+
+
+def test_newer_captures_are_found_in_the_cdx_index() -> None:
+    """Only stored articles captured since they were stored are refetched."""
+    transport: _ArchiveTransport = _ArchiveTransport()
+    assert sorted(_recrawl(transport).changed()) == [
+        archive_url(f"{SITE}/a-a", CAPTURES["a-a"]),
+        archive_url(f"{SITE}/c-c", CAPTURES["c-c"]),
+    ]
+    assert [url for url, _ in transport.requests] == [CDX_ENDPOINT]
+
+
+def test_articles_are_revalidated_without_the_cdx_index(tmp_path: Path) -> None:
+    """Without the index each article is asked for conditionally."""
+    transport: _ArchiveTransport = _ArchiveTransport(cdx=False)
+    cache: ResponseCache = ResponseCache(tmp_path / "cache")
+    newer: str = archive_url(f"{SITE}/c-c", CAPTURES["c-c"])
+    assert _recrawl(transport, cache).changed() == [newer]
+    headers: dict[str, dict[str, str]] = {
+        url: sent for url, sent in transport.requests if url != CDX_ENDPOINT
+    }
+    assert headers == {
+        f"{WAYBACK_URL}/web/{SITE}/a-a": {"If-None-Match": "x"},
+        f"{WAYBACK_URL}/web/{SITE}/b-b": {
+            "If-Modified-Since": "Sun, 01 Jan 2023 00:00:00 GMT"
+        },
+        f"{WAYBACK_URL}/web/{SITE}/c-c": {},
+    }
+    cached = cache.get(newer)
+    assert cached is not None
+    assert cached.content == b"<html>c-c</html>"
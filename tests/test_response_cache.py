@@ -0,0 +1,107 @@
+"""Response cache behaviour."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from response_cache import ResponseCache, cache_key
+
+OLD: str = "https://web.archive.org/web/20200101000000/http://bodhicommons.org/a"
+NEW: str = "https://web.archive.org/web/20230101000000/http://bodhicommons.org/a"
+BODY: bytes = b"<html><body>same page</body></html>"
+
+
+def _put_both(cache: ResponseCache) -> None:
+    """Cache two captures returning the same body with different headers."""
+    cache.put(
+        OLD,
+        200,
+        {"ETag": '"a"', "Memento-Datetime": "Wed, 01 Jan 2020 00:00:00 GMT"},
+        BODY,
+    )
+    cache.put(
+        NEW,
+        200,
+        {"ETag": '"b"', "Memento-Datetime": "Sun, 01 Jan 2023 00:00:00 GMT"},
+        BODY,
+    )
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    """A cached response reads back with its status, headers and body."""
+    cache: ResponseCache = ResponseCache(tmp_path)
+    cache.put(OLD, 404, {"Content-Type": "text/html; charset=utf-8"}, BODY)
+    cached = cache.get(OLD)
+    assert cached is not None
+    assert cached.status == 404
+    assert cached.content == BODY
+    assert cached.headers == {"content-type": "text/html; charset=utf-8"}
+    assert cache.get(NEW) is None
+
+
+def test_shared_payload_keeps_headers_per_url(tmp_path: Path) -> None:
+    """Urls sharing a payload each read back their own headers."""
+    cache: ResponseCache = ResponseCache(tmp_path)
+    _put_both(cache)
+    old, new = cache.get(OLD), cache.get(NEW)
+    assert old is not None
+    assert new is not None
+    assert old.content == new.content == BODY
+    assert old.headers["etag"] == '"a"'
+    assert new.headers["etag"] == '"b"'
+    assert new.headers["memento-datetime"].startswith("Sun, 01 Jan 2023")
+
+
+def test_shared_payload_is_stored_once(tmp_path: Path) -> None:
+    """A repeated payload is written as a revisit record without the body."""
+    cache: ResponseCache = ResponseCache(tmp_path, max_file_bytes=1 << 20)
+    _put_both(cache)
+    assert "payload_file" in cache.index[cache_key(NEW)]
+    reopened: ResponseCache = ResponseCache(tmp_path)
+    new = reopened.get(NEW)
+    assert new is not None
+    assert new.content == BODY
+    assert new.headers["etag"] == '"b"'
+
+
+def test_threads_share_a_cache(tmp_path: Path) -> None:
+    """Concurrent writers of one payload each read back their own entry."""
+    cache: ResponseCache = ResponseCache(tmp_path)
+    urls: list[str] = [f"http://bodhicommons.org/{index}" for index in range(64)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda url: cache.put(url, 200, {"ETag": url}, BODY), urls))
+    reopened: ResponseCache = ResponseCache(tmp_path)
+    assert len(reopened) == len(urls)
+    for url in urls:
+        cached = reopened.get(url)
+        assert cached is not None
+        assert cached.content == BODY
+        assert cached.headers["etag"] == url
+
+
+def test_processes_share_a_cache(tmp_path: Path) -> None:
+    """Responses cached by one process are read and shared by another."""
+    first: ResponseCache = ResponseCache(tmp_path)
+    second: ResponseCache = ResponseCache(tmp_path)
+    first.put(OLD, 200, {"ETag": '"a"'}, BODY)
+    assert NEW not in first
+    assert OLD in second
+    second.put(NEW, 200, {"ETag": '"b"'}, BODY)
+    assert "payload_file" in second.index[cache_key(NEW)]
+    new = first.get(NEW)
+    assert new is not None
+    assert new.content == BODY
+    assert new.headers["etag"] == '"b"'
+
+
+def test_torn_index_line_is_skipped(tmp_path: Path) -> None:
+    """An entry cut short by a crashed writer does not hide later entries."""
+    cache: ResponseCache = ResponseCache(tmp_path)
+    cache.put(OLD, 200, {}, BODY)
+    with (tmp_path / "index.jsonl").open("ab") as index_file:
+        index_file.write(b'{"key": "')
+    cache.put(NEW, 200, {}, b"other page")
+    reopened: ResponseCache = ResponseCache(tmp_path)
+    assert len(reopened) == 2
+    new = reopened.get(NEW)
+    assert new is not None
+    assert new.content == b"other page"
@@ -0,0 +1,56 @@
+"""Resume index behaviour."""
+
+from pathlib import Path
+
+from article_db import ArticleDatabase
+from resume_index import ResumeIndex
+
+NEW: str = "https://web.archive.org/web/20230101000000/https://www.bodhicommons.org"
+
+
+def _store(path: Path, *urls: str) -> ArticleDatabase:
+    """Open an article database holding articles at the given urls."""
+    store: ArticleDatabase = ArticleDatabase(path)
+    for url in urls:
+        store.append({"url": url, "title": url})
+    return store
+
+
+def test_index_of_store_lists_stored_urls(tmp_path: Path) -> None:
+    """A new index of a store holds its urls and nothing else."""
+    store: ArticleDatabase = _store(tmp_path / "a.sqlite3", "u1", "u2")
+    index: ResumeIndex = ResumeIndex.for_store(store)
+    assert "u1" in index
+    assert "u2" in index
+    assert "u3" not in index
+
+
+def test_index_is_kept_when_merged_urls_are_not_stored(tmp_path: Path) -> None:
+    """Urls scraped but merged away do not make the index look stale."""
+    store: ArticleDatabase = _store(tmp_path / "a.sqlite3", "u1", "u2")
+    index: ResumeIndex = ResumeIndex.for_store(store)
+    store.remove("u2")
+    index.add("merged")
+    index.close()
+    reopened: ResumeIndex = ResumeIndex.for_store(store)
+    assert "merged" in reopened
+    assert "u2" in reopened
+
+
+def test_index_is_rebuilt_after_urls_are_stored_elsewhere(tmp_path: Path) -> None:
+    """Articles stored without the index are picked up on the next open."""
+    store: ArticleDatabase = _store(tmp_path / "a.sqlite3", "u1")
+    ResumeIndex.for_store(store).close()
+    store.append({"url": "u2", "title": "u2"})
+    assert "u2" in ResumeIndex.for_store(store)
+
+
+def test_other_captures_of_a_scraped_article_are_indexed(tmp_path: Path) -> None:
+    """Any capture of a scraped article counts as scraped."""
+    store: ArticleDatabase = _store(
+        tmp_path / "a.sqlite3",
+        "https://web.archive.org/web/20200101000000/http://bodhicommons.org/a/",
+    )
+    index: ResumeIndex = ResumeIndex.for_store(store)
+    assert f"{NEW}/a" in index
+    assert f"{NEW}/b" not in index
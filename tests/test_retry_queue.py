@@ -0,0 +1,100 @@
+"""Retry queue behaviour."""
+
+from pathlib import Path
+
+from retry_queue import FailureKind, RetryQueue
+
+OLD: str = "https://web.archive.org/web/20200101000000/http://bodhicommons.org"
+NEW: str = "https://web.archive.org/web/20230101000000/https://www.bodhicommons.org"
+
+
+def test_failed_url_is_due_after_backoff(tmp_path: Path) -> None:
+    """A failed url waits out its backoff, then is due again."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3", base_delay=60.0)
+    queue.add(["a", "b"])
+    assert queue.fail("a", FailureKind.NETWORK, "timeout") == 60.0
+    assert queue.due() == ["b"]
+    assert queue.due(now=1e12) == ["b", "a"]
+
+
+def test_url_is_given_up_after_its_attempts(tmp_path: Path) -> None:
+    """An url that keeps failing ends in the dead letters."""
+    queue: RetryQueue = RetryQueue(
+        tmp_path / "queue.sqlite3", max_attempts={FailureKind.NETWORK: 2}
+    )
+    queue.add(["a"])
+    queue.fail("a", FailureKind.NETWORK, "timeout")
+    assert queue.fail("a", FailureKind.NETWORK, "timeout") is None
+    assert [url for url, *_ in queue.dead_letters()] == ["a"]
+    assert queue.due(now=1e12) == []
+
+
+def test_claimed_url_goes_to_one_worker(tmp_path: Path) -> None:
+    """A leased url is not claimed again until its lease runs out."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.add(["a"])
+    assert queue.claim("one", lease=60.0, now=0.0) == ["a"]
+    assert queue.claim("two", lease=60.0, now=30.0) == []
+    assert queue.claim("two", lease=60.0, now=61.0) == ["a"]
+
+
+def test_expired_lease_is_due_without_workers(tmp_path: Path) -> None:
+    """A run that is not a worker takes over the urls of a dead worker."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.add(["a", "b"])
+    queue.claim("dead", limit=2, lease=60.0, now=0.0)
+    assert queue.due(now=30.0) == []
+    assert queue.due(now=61.0) == ["a", "b"]
+    queue.complete("a")
+    assert queue.due(now=62.0) == ["b"]
+
+
+def test_article_is_queued_once(tmp_path: Path) -> None:
+    """Other captures of a queued article are not queued again."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    assert queue.add([f"{OLD}/a", f"{NEW}/a/", f"{NEW}/b"]) == 2
+    assert queue.add([f"{NEW}/a"]) == 0
+    assert queue.due() == [f"{OLD}/a", f"{NEW}/b"]
+
+
+def test_newer_capture_replaces_done_article(tmp_path: Path) -> None:
+    """A recrawl queues the newer capture of a finished article."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.add([f"{OLD}/a"])
+    queue.complete(f"{OLD}/a")
+    assert queue.replace([f"{NEW}/a"], priority=1) == 1
+    assert queue.due() == [f"{NEW}/a"]
+
+
+def test_leased_article_is_not_replaced(tmp_path: Path) -> None:
+    """A capture a worker is fetching stays queued."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.add([f"{OLD}/a"])
+    queue.claim("one", lease=60.0, now=0.0)
+    assert queue.replace([f"{NEW}/a"]) == 0
+    assert queue.claim("two", lease=60.0, now=61.0) == [f"{OLD}/a"]
+
+
+def test_worker_that_lost_its_lease_cannot_finish(tmp_path: Path) -> None:
+    """Only the worker holding an url's lease completes or fails it."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.add(["a", "b"])
+    assert queue.claim("one", limit=2, lease=60.0, now=0.0) == ["a", "b"]
+    assert queue.claim("two", limit=2, lease=60.0, now=61.0) == ["a", "b"]
+    assert not queue.complete("a", "one")
+    assert queue.fail("b", FailureKind.NETWORK, "timeout", "one") is None
+    assert queue.counts() == {"leased": 2}
+    assert queue.complete("a", "two")
+    assert queue.fail("b", FailureKind.NETWORK, "timeout", "two") == 60.0
+    assert queue.counts() == {"done": 1, "pending": 1}
+
+
+def test_failed_url_not_queued_is_keyed(tmp_path: Path) -> None:
+    """A failure of an unqueued url queues it under its article's key."""
+    queue: RetryQueue = RetryQueue(tmp_path / "queue.sqlite3")
+    queue.fail(OLD, FailureKind.NETWORK, "timeout")
+    assert queue.add([NEW]) == 0
+    assert queue.fail(NEW, FailureKind.NETWORK, "timeout") is None
+    assert [url for (url,) in queue.connection.execute("SELECT url FROM work")] == [
+        OLD
+    ]
@@ -0,0 +1,89 @@
+"""Snapshot resolver behaviour."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, cast
+
+import orjson
+import pytest
+import requests
+
+import snapshot_resolver
+
+from cdx_discovery import CDX_FIELDS
+from snapshot_resolver import SnapshotResolver
+from transport import Transport
+
+PINNED: str = "https://web.archive.org/web/20200601000000/http://bodhicommons.org/a"
+TIMESTAMPS: tuple[str, ...] = (
+    "20200101000000",
+    "20200601000000",
+    "20200701000000",
+    "20210101000000",
+)
+
+
+class _CdxTransport:
+    """Transport answering every CDX lookup with the same captures."""
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:  # noqa: ARG002
+        response: requests.Response = requests.Response()
+        response.status_code = 200
+        response._content = orjson.dumps(  # noqa: SLF001
+            [
+                list(CDX_FIELDS),
+                *(
+                    ["org,bodhicommons)/a", timestamp, "http://bodhicommons.org/a"]
+                    + ["text/html", "200"]
+                    for timestamp in TIMESTAMPS
+                ),
+            ]
+        )
+        return response
+
+
+def _resolver(winners_file: Path | None = None) -> SnapshotResolver:
+    """Open a resolver over the fake CDX index."""
+    return SnapshotResolver(
+        winners_file, concurrency=2, transport=cast(Transport, _CdxTransport())
+    )
+
+
+def test_candidates_are_nearest_first_without_the_pinned_capture() -> None:
+    """The pinned capture is left out and the others sorted by distance."""
+    timestamps: list[str] = [
+        capture.timestamp for capture in _resolver().candidates(PINNED)
+    ]
+    assert timestamps == ["20200701000000", "20200101000000", "20210101000000"]
+
+
+def test_nearest_working_capture_wins_and_is_remembered(tmp_path: Path) -> None:
+    """The nearest capture that works wins and later runs go straight to it."""
+    winners: Path = tmp_path / "winners.jsonl"
+    resolver: SnapshotResolver = _resolver(winners)
+    resolved = resolver.resolve(
+        PINNED, lambda url: url if "20200101" in url or "2021" in url else None
+    )
+    resolver.close()
+    assert resolved is not None
+    assert "20200101000000" in resolved[0]
+    assert "20200101000000" in _resolver(winners).preferred(PINNED)
+
+
+def test_concurrent_callers_share_one_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Callers resolving at once start a single pool of threads."""
+    pools: list[ThreadPoolExecutor] = []
+
+    class SlowPool(ThreadPoolExecutor):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(snapshot_resolver, "ThreadPoolExecutor", SlowPool)
+    resolver: SnapshotResolver = _resolver()
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        list(callers.map(lambda _: resolver.resolve(PINNED, lambda _: None), range(8)))
+    resolver.close()
+    assert len(pools) == 1
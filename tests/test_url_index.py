@@ -0,0 +1,39 @@
+"""Canonical url and url index behaviour."""
+
+from url_index import UrlIndex
+from wayback import canonical_url
+
+ARTICLE: str = "https://bodhicommons.org/a?x=1&y=2"
+
+
+def test_captures_of_an_article_share_a_canonical_url() -> None:
+    """Archive prefix, scheme, host, slash and query order are normalized."""
+    for url in (
+        "https://web.archive.org/web/20200101000000/http://bodhicommons.org/a/?y=2&x=1",
+        "https://web.archive.org/web/20230101000000id_/https://www.bodhicommons.org/a?x=1&y=2",
+        "http://bodhicommons.org:80/a/?x=1&utm_source=feed&y=2#top",
+        "www.bodhicommons.org/a?fbclid=1&x=1&y=2",
+    ):
+        assert canonical_url(url) == ARTICLE
+
+
+def test_other_articles_keep_their_own_canonical_url() -> None:
+    """Paths, ports and remaining query parameters still tell articles apart."""
+    assert canonical_url("http://bodhicommons.org/b?x=1&y=2") != ARTICLE
+    assert canonical_url("http://bodhicommons.org:8080/a?x=1&y=2") != ARTICLE
+    assert canonical_url("http://bodhicommons.org/a?x=1") != ARTICLE
+
+
+def test_first_url_of_each_article_is_let_through() -> None:
+    """Later captures of an article are counted as duplicates."""
+    index: UrlIndex = UrlIndex(["http://bodhicommons.org/stored"])
+    urls: list[str] = [
+        "https://web.archive.org/web/20200101000000/http://bodhicommons.org/a",
+        "",
+        "https://web.archive.org/web/20230101000000/https://bodhicommons.org/a/",
+        "https://web.archive.org/web/20230101000000/http://bodhicommons.org/stored/",
+        "https://web.archive.org/web/20230101000000/http://bodhicommons.org/b",
+    ]
+    assert list(index.unique(urls)) == [urls[0], urls[4]]
+    assert index.duplicates == 2
+    assert len(index) == 3
@@ -0,0 +1,126 @@
+"""Wayback url helper behaviour."""
+
+import pytest
+
+from wayback import canonical_url, raw_url, rewrite_link
+
+ARCHIVE: str = "https://web.archive.org"
+PAGE: str = f"{ARCHIVE}/web/20230101000000/http://bodhicommons.org/articles/a"
+RAW_PAGE: str = f"{ARCHIVE}/web/20230101000000id_/http://bodhicommons.org/articles/a"
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        (PAGE, RAW_PAGE),
+        (RAW_PAGE, RAW_PAGE),
+        (
+            f"{ARCHIVE}/web/20230101000000im_/http://bodhicommons.org/a.png",
+            f"{ARCHIVE}/web/20230101000000id_/http://bodhicommons.org/a.png",
+        ),
+        (
+            "http://web.archive.org/web/20230101000000/http://bodhicommons.org/a",
+            f"{ARCHIVE}/web/20230101000000id_/http://bodhicommons.org/a",
+        ),
+        ("http://bodhicommons.org/a", "http://bodhicommons.org/a"),
+    ],
+)
+def test_raw_url(url: str, expected: str) -> None:
+    """Replay urls get ``id_`` once; other urls are left alone."""
+    assert raw_url(url) == expected
+
+
+@pytest.mark.parametrize("page_url", [PAGE, RAW_PAGE])
+@pytest.mark.parametrize(
+    ("link", "expected"),
+    [
+        (
+            "/web/20220101000000/http://bodhicommons.org/b",
+            f"{ARCHIVE}/web/20220101000000im_/http://bodhicommons.org/b",
+        ),
+        (
+            "/web/20220101000000im_/http://bodhicommons.org/b.png",
+            f"{ARCHIVE}/web/20220101000000im_/http://bodhicommons.org/b.png",
+        ),
+        (
+            f"{ARCHIVE}/web/20220101000000/http://bodhicommons.org/b",
+            f"{ARCHIVE}/web/20220101000000im_/http://bodhicommons.org/b",
+        ),
+        (
+            "//web.archive.org/web/20220101000000/http://bodhicommons.org/b",
+            f"{ARCHIVE}/web/20220101000000im_/http://bodhicommons.org/b",
+        ),
+        (
+            "b.png",
+            f"{ARCHIVE}/web/20230101000000im_/http://bodhicommons.org/articles/b.png",
+        ),
+        (
+            "../b.png",
+            f"{ARCHIVE}/web/20230101000000im_/http://bodhicommons.org/b.png",
+        ),
+        (
+            "/files/b.png",
+            f"{ARCHIVE}/web/20230101000000im_/http://bodhicommons.org/files/b.png",
+        ),
+        (
+            "//cdn.bodhicommons.org/b.png",
+            f"{ARCHIVE}/web/20230101000000im_/http://cdn.bodhicommons.org/b.png",
+        ),
+        (
+            " https://bodhicommons.org/b.png ",
+            f"{ARCHIVE}/web/20230101000000im_/https://bodhicommons.org/b.png",
+        ),
+    ],
+)
+def test_rewrite_link(page_url: str, link: str, expected: str) -> None:
+    """Links of replayed and raw pages point at an absolute capture."""
+    assert rewrite_link(page_url, link, "im_") == expected
+
+
+def test_rewrite_link_keeps_no_modifier_by_default() -> None:
+    """Without a modifier, links point at the plain replay of a capture."""
+    link: str = "/web/20220101000000im_/http://bodhicommons.org/b"
+    assert rewrite_link(RAW_PAGE, link) == (
+        f"{ARCHIVE}/web/20220101000000/http://bodhicommons.org/b"
+    )
+
+
+@pytest.mark.parametrize(
+    ("page_url", "link", "expected"),
+    [
+        (
+            "http://bodhicommons.org/articles/a",
+            "b.png",
+            "http://bodhicommons.org/articles/b.png",
+        ),
+        (
+            "http://bodhicommons.org/articles/a",
+            "/files/b.png",
+            "http://bodhicommons.org/files/b.png",
+        ),
+        (
+            "https://bodhicommons.org/articles/a",
+            "//cdn.bodhicommons.org/b.png",
+            "https://cdn.bodhicommons.org/b.png",
+        ),
+    ],
+)
+def test_rewrite_link_of_a_live_page(page_url: str, link: str, expected: str) -> None:
+    """Links of a page that is not a replay are only resolved against it."""
+    assert rewrite_link(page_url, link, "im_") == expected
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        PAGE,
+        RAW_PAGE,
+        f"{ARCHIVE}/web/20230101000000im_/https://www.bodhicommons.org/articles/a/",
+        "http://web.archive.org/web/2023/http://bodhicommons.org/articles/a",
+        "https://bodhicommons.org/articles/a",
+        "//bodhicommons.org/articles/a",
+    ],
+)
+def test_canonical_url(url: str) -> None:
+    """Every capture and form of an article share one canonical url."""
+    assert canonical_url(url) == "https://bodhicommons.org/articles/a"
@@ -0,0 +1,205 @@
+"""Shared HTTP transport."""
+
+import atexit
+import importlib.util
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Metrics, get_metrics
+from rate_limiter import AdaptiveRateLimiter, TokenBucket
+
+DEFAULT_USER_AGENT: str = (
+    "Mozilla/5.0 (X11; Linux x86_64; rv:130.0) Gecko/20100101 Firefox/130.0"
+)
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """Connection and request policy shared by every scraper."""
+
+    user_agent: str = DEFAULT_USER_AGENT
+    timeout: float = 10.0
+    pool_connections: int = 4
+    pool_maxsize: int = 8
+    http2: bool = True
+
+
+@dataclass
+class HostStats:
+    """Connection reuse statistics for one host."""
+
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def reused(self) -> int:
+        """Requests served over an already open connection."""
+        return max(0, self.requests - self.connections)
+
+
+class Transport:
+    """Pooled keep-alive HTTP sessions.
+
+    Blocking callers share one ``requests.Session`` whose connection pools
+    keep connections to web.archive.org alive between pages. Async callers
+    get an ``httpx.AsyncClient`` that speaks HTTP/2 when ``h2`` is
+    installed. Both count requests and new connections per host, and both
+    feed the outcome of every request back to ``rate_limiter`` and to the
+    run metrics.
+    """
+
+    def __init__(
+        self,
+        config: TransportConfig | None = None,
+        rate_limiter: TokenBucket | None = None,
+    ) -> None:
+        """Initialize transport."""
+        self.config: TransportConfig = config or TransportConfig()
+        self.rate_limiter: TokenBucket = rate_limiter or AdaptiveRateLimiter()
+        self.metrics: Metrics = get_metrics()
+        self.headers: dict[str, str] = {"User-Agent": self.config.user_agent}
+        self.adapter: HTTPAdapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+        )
+        self.session: requests.Session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self._async_stats: defaultdict[str, HostStats] = defaultdict(HostStats)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        """Send a rate limited GET request over the pooled session.
+
+        Returns:
+            requests.Response: Response.
+
+        """
+        kwargs.setdefault("timeout", self.config.timeout)
+        with self.metrics.stage("rate_limit_wait"):
+            self.rate_limiter.acquire()
+        started: float = time.perf_counter()
+        try:
+            response: requests.Response = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            self.record(None, time.perf_counter() - started)
+            raise
+        self.record(
+            response.status_code,
+            time.perf_counter() - started,
+            response.headers.get("Retry-After"),
+            int(response.headers.get("Content-Length") or 0)
+            if kwargs.get("stream")
+            else len(response.content),
+        )
+        return response
+
+    def record(
+        self,
+        status: int | None,
+        latency: float,
+        retry_after: str | None = None,
+        size: int = 0,
+    ) -> None:
+        """Feed the outcome of a request to the rate limiter and the metrics."""
+        self.rate_limiter.record(status, latency, retry_after)
+        self.metrics.observe("stage_seconds", latency, stage="fetch")
+        self.metrics.inc("requests_total", status=str(status or "error"))
+        self.metrics.inc("bytes_fetched_total", size)
+
+    @property
+    def http2(self) -> bool:
+        """Whether async clients negotiate HTTP/2."""
+        return self.config.http2 and importlib.util.find_spec("h2") is not None
+
+    def async_client(self, max_connections: int | None = None) -> httpx.AsyncClient:
+        """Create an async client sharing this transport's policy.
+
+        Returns:
+            httpx.AsyncClient: Client, to be used as an async context manager.
+
+        """
+        max_connections = max_connections or self.config.pool_maxsize
+
+        def tracer(host: str) -> Callable[[str, dict[str, Any]], Awaitable[None]]:
+            async def trace(event_name: str, _info: dict[str, Any]) -> None:
+                if event_name == "connection.connect_tcp.complete":
+                    self._async_stats[host].connections += 1
+
+            return trace
+
+        async def count_request(request: httpx.Request) -> None:
+            self._async_stats[request.url.host].requests += 1
+            request.extensions["trace"] = tracer(request.url.host)
+
+        return httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.config.timeout,
+            follow_redirects=True,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            event_hooks={"request": [count_request]},
+        )
+
+    def connection_stats(self) -> dict[str, HostStats]:
+        """Collect per host connection reuse statistics.
+
+        Returns:
+            dict[str, HostStats]: Statistics keyed by host.
+
+        """
+        stats: defaultdict[str, HostStats] = defaultdict(HostStats)
+        for host, async_stats in self._async_stats.items():
+            stats[host].requests += async_stats.requests
+            stats[host].connections += async_stats.connections
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():  # noqa: SIM118
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats[pool.host].requests += pool.num_requests
+            stats[pool.host].connections += pool.num_connections
+        return dict(stats)
+
+    def report(self) -> str:
+        """Summarize connection reuse per host.
+
+        Returns:
+            str: One line per host.
+
+        """
+        return "\n".join(
+            f"{host}: {host_stats.requests} requests over "
+            f"{host_stats.connections} connections "
+            f"({host_stats.reused} reused)"
+            for host, host_stats in sorted(self.connection_stats().items())
+        )
+
+
+_shared_transport: Transport | None = None
+
+
+def get_transport() -> Transport:
+    """Return the process wide transport.
+
+    Returns:
+        Transport: Shared transport.
+
+    """
+    global _shared_transport  # noqa: PLW0603
+    if _shared_transport is None:
+        _shared_transport = Transport()
+        if isinstance(_shared_transport.rate_limiter, AdaptiveRateLimiter):
+            atexit.register(_shared_transport.rate_limiter.save)
+    return _shared_transport
+
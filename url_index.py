@@ -0,0 +1,66 @@
+"""Streaming deduplication of article urls by canonical article key."""
+
+from collections.abc import Iterable, Iterator
+
+from metrics import get_metrics
+from resume_index import article_hash
+
+
+class UrlIndex:
+    """Canonical keys of the article urls seen so far.
+
+    Url lists name the same article many times over: listing pages are
+    written cumulatively, and captures of an article differ in timestamp,
+    scheme, ``www.``, trailing slash or query order. Each url is reduced to
+    its ``article_key`` and only the first url of every key is let
+    through, so an article is fetched once whichever capture urls name
+    it. Keys are kept as 64 bit hashes, 8 bytes per article however long
+    its url.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()) -> None:
+        """Initialize url index.
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+            Urls seen before, such as those already stored, whose articles
+            are let through no more.
+
+        """
+        self._keys: set[int] = {article_hash(url) for url in urls}
+        self.duplicates: int = 0
+
+    def __len__(self) -> int:
+        """Count the articles seen."""
+        return len(self._keys)
+
+    def __contains__(self, url: str) -> bool:
+        """Check whether the article of an url was seen."""
+        return article_hash(url) in self._keys
+
+    def add(self, url: str) -> bool:
+        """Mark the article of an url as seen.
+
+        Returns:
+            bool: True if the article was not seen before.
+
+        """
+        key: int = article_hash(url)
+        if key in self._keys:
+            self.duplicates += 1
+            get_metrics().inc("duplicate_urls_total")
+            return False
+        self._keys.add(key)
+        return True
+
+    def unique(self, urls: Iterable[str]) -> Iterator[str]:
+        """Let the first url of every article through, as urls stream in.
+
+        Yields:
+            str: Url of an article not seen before.
+
+        """
+        for url in urls:
+            if url and self.add(url):
+                yield url
@@ -1,13 +1,16 @@
 """URL scraper."""
 
-import time
+import sys
 from pathlib import Path
 
-import requests
 import requests.exceptions
 from bs4 import BeautifulSoup as bs
 from bs4 import NavigableString, Tag
 
+from cdx_discovery import MAIN_ARTICLE_PATTERN, CdxDiscovery
+from layouts import MAIN_SITE
+from transport import Transport, get_transport
+
 
 class BodhiSnapShot:
     """IA snapshot."""
@@ -18,9 +21,7 @@ class BodhiSnapShot:
         time_stamp: str = "20230331041108",
     ) -> None:
         """Initialize bodhi snapshot."""
-        self.headers: dict[str, str] = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:130.0) Gecko/20100101 Firefox/130.0"
-        }
+        self.transport: Transport = get_transport()
         self.url: str = url
         self.time_stamp: str = time_stamp
         self.output_format: str = "json"
@@ -31,11 +32,7 @@ class BodhiSnapShot:
 
     def fire_request(self) -> None:
         """Fire request."""
-        self.request: str = requests.get(
-            self.web_archive_url,
-            headers=self.headers,
-            timeout=10,
-        ).text
+        self.request: str = self.transport.get(self.web_archive_url).text
 
     def make_soup(self) -> None:
         """Make soup."""
@@ -64,7 +61,8 @@ class BodhiSnapShot:
         self.article_list = self.main_block.find_all(class_="views-row")
 
     def get_article_urls(self) -> None:
-        """Get article urls."""
+        """Get the article urls of the current page."""
+        self.article_urls.clear()
         for article in self.article_list:
             a_ = article.find("a")
             if a_ is not None:
@@ -79,11 +77,9 @@ class BodhiSnapShot:
     def __pageinate_url(self, page_number: int) -> None:
         self.web_archive_url = f"https://web.archive.org/web/{self.time_stamp}/{self.url}?page={page_number}"
 
-    def scrape_urls(self) -> None:
-        """Scrape urls."""
-        start_page = 22
-        end_page = 65
-        for page_number in range(start_page, end_page + 1):
+    def scrape_urls(self, pages: range = MAIN_SITE.listing_pages) -> None:
+        """Scrape urls from the listing pages in ``pages``."""
+        for page_number in pages:
             self.__pageinate_url(page_number=page_number)
             try:
                 self.fire_request()
@@ -97,9 +93,28 @@ class BodhiSnapShot:
             except TypeError:
                 print(f"Failed to find main block on page {page_number}.")
                 continue
-        time.sleep(10)
+        print(self.transport.report())
+
+    def scrape_urls_from_cdx(self) -> None:
+        """Discover article urls from the CDX index instead of listing pages."""
+        discovery: CdxDiscovery = CdxDiscovery(
+            url="bodhicommons.org/",
+            article_pattern=MAIN_ARTICLE_PATTERN,
+            before=self.time_stamp,
+            state_file="cdx_state.json",
+            transport=self.transport,
+        )
+        try:
+            total_urls: int = discovery.write_urls("page_cdx_urls.txt")
+            print(f"Found {total_urls} articles in the CDX index.")
+        except requests.exceptions.RequestException as e:
+            print(e)
+        print(self.transport.report())
 
 
 if __name__ == "__main__":
     bodhi_snapshot = BodhiSnapShot()
-    bodhi_snapshot.scrape_urls()
+    if "--cdx" in sys.argv:
+        bodhi_snapshot.scrape_urls_from_cdx()
+    else:
+        bodhi_snapshot.scrape_urls()
@@ -0,0 +1,139 @@
+"""Wayback Machine url helpers."""
+
+import re
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urljoin, urlsplit
+
+WAYBACK_URL: str = "https://web.archive.org"
+CDX_ENDPOINT: str = f"{WAYBACK_URL}/cdx/search/cdx"
+# Replay modifiers: the capture's original bytes, and an image.
+RAW_MODIFIER: str = "id_"
+IMAGE_MODIFIER: str = "im_"
+
+# Query parameters that only track where a visitor came from.
+_TRACKING_PARAMETERS: frozenset[str] = frozenset({"fbclid", "gclid"})
+_DEFAULT_PORTS: frozenset[int] = frozenset({80, 443})
+_PATH_SAFE: str = "/:@!$&'()*+,;=~"
+
+_ARCHIVE_URL_PATTERN: re.Pattern[str] = re.compile(
+    r"^https?://web\.archive\.org(?:/web)+/(?P<timestamp>\d{1,14})(?P<modifier>[a-z]{2}_)?/(?P<original>.+)$"
+)
+
+
+def archive_url(original: str, timestamp: str, modifier: str = "") -> str:
+    """Build the replay url of a capture.
+
+    Returns:
+        str: Wayback replay url.
+
+    """
+    return f"{WAYBACK_URL}/web/{timestamp}{modifier}/{original}"
+
+
+def split_archive_url(url: str) -> tuple[str, str]:
+    """Split a replay url into its timestamp and original url.
+
+    Returns:
+        tuple[str, str]: Capture timestamp and original url.
+
+    Raises:
+        ValueError: If the url is not a Wayback replay url.
+
+    """
+    match: re.Match[str] | None = _ARCHIVE_URL_PATTERN.match(url.strip())
+    if match is None:
+        message: str = f"Not a Wayback url: {url}"
+        raise ValueError(message)
+    return match["timestamp"], match["original"]
+
+
+def original_url(url: str) -> str:
+    """Get the original url behind a replay url.
+
+    Returns:
+        str: Original url, or url itself if it is not a replay url.
+
+    """
+    try:
+        return split_archive_url(url)[1]
+    except ValueError:
+        return url
+
+
+def canonical_url(url: str) -> str:
+    """Reduce an article url to one form, whatever capture it came from.
+
+    The Wayback prefix and timestamp are stripped, the scheme becomes
+    https, ``www.`` and default ports are dropped from the host, the path
+    is percent-encoded the same way and loses its trailing slash, and the
+    query is sorted without tracking parameters or a fragment.
+
+    Returns:
+        str: Canonical url.
+
+    """
+    original: str = original_url(url).strip()
+    if original.startswith("//"):
+        original = f"http:{original}"
+    elif "://" not in original:
+        original = f"http://{original}"
+    parts = urlsplit(original)
+    host: str = (parts.hostname or "").removeprefix("www.")
+    try:
+        port: int | None = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port not in _DEFAULT_PORTS:
+        host = f"{host}:{port}"
+    path: str = quote(unquote(parts.path), safe=_PATH_SAFE).rstrip("/")
+    query: str = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name not in _TRACKING_PARAMETERS and not name.startswith("utm_")
+        )
+    )
+    return f"https://{host}{path}{'?' if query else ''}{query}"
+
+
+def raw_url(url: str) -> str:
+    """Point a replay url at the original bytes of its capture.
+
+    A raw capture comes without the archive's toolbar and with its links
+    as the site wrote them, see ``rewrite_link``.
+
+    Returns:
+        str: ``id_`` replay url, or url itself if it is not a replay url.
+
+    """
+    try:
+        timestamp, original = split_archive_url(url)
+    except ValueError:
+        return url
+    return archive_url(original, timestamp, RAW_MODIFIER)
+
+
+def rewrite_link(page_url: str, link: str, modifier: str = "") -> str:
+    """Point a link found on a replayed page at the capture it refers to.
+
+    Links the archive already rewrote keep their capture; links of a raw
+    page are resolved against the page's original url and replayed at the
+    page's timestamp, where the archive redirects to the nearest capture.
+
+    Returns:
+        str: Absolute replay url with the given modifier, or the link
+        resolved against ``page_url`` if that is not a replay url.
+
+    """
+    link = link.strip()
+    try:
+        page_timestamp, page_original = split_archive_url(page_url)
+    except ValueError:
+        return urljoin(page_url, link)
+    replayed: str = (
+        urljoin(f"{WAYBACK_URL}/", link) if link.startswith(("//", "/web/")) else link
+    )
+    try:
+        timestamp, original = split_archive_url(replayed)
+    except ValueError:
+        timestamp, original = page_timestamp, urljoin(page_original, link)
+    return archive_url(original, timestamp, modifier)